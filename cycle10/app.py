@@ -5,8 +5,10 @@ Enhanced Flask application with improved architecture
 import os
 from flask import Flask
 from dotenv import load_dotenv
+from werkzeug.middleware.proxy_fix import ProxyFix
 from config import config
 from routes import RouteManager
+from utils.sessions import build_session_interface
 
 
 def create_app(config_name='default'):
@@ -23,6 +25,16 @@ def create_app(config_name='default'):
     app_config = config[config_name]
     app.config.from_object(app_config)
 
+    # Behind a load balancer, take the client address from the trusted proxy headers
+    if app_config.PROXY_FIX_X_FOR or app_config.PROXY_FIX_X_PROTO:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app_config.PROXY_FIX_X_FOR,
+                                x_proto=app_config.PROXY_FIX_X_PROTO)
+
+    # Keep session data server-side so any worker can serve any request
+    session_interface = build_session_interface(app_config)
+    if session_interface is not None:
+        app.session_interface = session_interface
+
     # Ensure required directories exist
     ensure_directories(app)
 
@@ -61,6 +73,7 @@ if __name__ == '__main__':
     print("Starting server...")
     print(f"Debug mode: {app.config['DEBUG']}")
     print(f"Database: {app.config['DB_NAME']}@{app.config['DB_HOST']}")
+    print(f"Connection pool: {app.config['DB_POOL_MIN_SIZE']}-{app.config['DB_POOL_MAX_SIZE']} connections")
     print("=" * 50)
 
     app.run(
@@ -17,9 +17,72 @@ class Config:
     DB_USER = os.environ.get('DB_USER', 'root')
     DB_PASSWORD = os.environ.get('DB_PASSWORD', 'mysql')
 
+    # Connection pool configuration
+    DB_POOL_MIN_SIZE = int(os.environ.get('DB_POOL_MIN_SIZE', '1'))
+    DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '10'))
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '30'))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', '3600'))  # seconds
+
+    # Access log writer configuration
+    ACCESS_LOG_QUEUE_SIZE = int(os.environ.get('ACCESS_LOG_QUEUE_SIZE', '10000'))
+    ACCESS_LOG_BATCH_SIZE = int(os.environ.get('ACCESS_LOG_BATCH_SIZE', '100'))
+    ACCESS_LOG_FLUSH_INTERVAL = float(os.environ.get('ACCESS_LOG_FLUSH_INTERVAL', '1.0'))  # seconds
+
+    # Seconds a user's role stays cached for permission checks
+    ROLE_CACHE_TTL = int(os.environ.get('ROLE_CACHE_TTL', '300'))
+
+    # Recipient autocomplete: seconds before a sender's index is rebuilt,
+    # seconds between incremental top-ups, and results per search
+    RECIPIENT_CACHE_TTL = int(os.environ.get('RECIPIENT_CACHE_TTL', '600'))
+    RECIPIENT_REFRESH_INTERVAL = int(os.environ.get('RECIPIENT_REFRESH_INTERVAL', '30'))
+    RECIPIENT_SEARCH_LIMIT = int(os.environ.get('RECIPIENT_SEARCH_LIMIT', '10'))
+
+    # Messages per user center inbox page
+    INBOX_PAGE_SIZE = int(os.environ.get('INBOX_PAGE_SIZE', '20'))
+
+    # Rows fetched per chunk when streaming data exports
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '1000'))
+
+    # access_logs partition maintenance (manage_partitions.py)
+    ACCESS_LOG_PARTITIONS_AHEAD = int(os.environ.get('ACCESS_LOG_PARTITIONS_AHEAD', '3'))  # months
+    ACCESS_LOG_RETENTION_MONTHS = int(os.environ.get('ACCESS_LOG_RETENTION_MONTHS', '12'))
+    ACCESS_LOG_ARCHIVE_DIR = os.environ.get('ACCESS_LOG_ARCHIVE_DIR') or \
+        os.path.join(os.path.dirname(__file__), '..', 'archive')
+
+    # Password hashing: scheme ('scrypt', 'pbkdf2' or 'bcrypt'), cost and worker pool
+    PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'scrypt')
+    PASSWORD_SCRYPT_LOG_N = int(os.environ.get('PASSWORD_SCRYPT_LOG_N', '14'))
+    PASSWORD_PBKDF2_ITERATIONS = int(os.environ.get('PASSWORD_PBKDF2_ITERATIONS', '600000'))
+    PASSWORD_BCRYPT_ROUNDS = int(os.environ.get('PASSWORD_BCRYPT_ROUNDS', '12'))
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', '4'))
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', '32'))
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', '5'))  # seconds
+
+    # Login storm protection: token buckets per client IP and per email
+    # (capacity = burst size, refill in attempts per minute)
+    LOGIN_RATE_IP_CAPACITY = int(os.environ.get('LOGIN_RATE_IP_CAPACITY', '60'))
+    LOGIN_RATE_IP_PER_MINUTE = float(os.environ.get('LOGIN_RATE_IP_PER_MINUTE', '60'))
+    LOGIN_RATE_EMAIL_CAPACITY = int(os.environ.get('LOGIN_RATE_EMAIL_CAPACITY', '5'))
+    LOGIN_RATE_EMAIL_PER_MINUTE = float(os.environ.get('LOGIN_RATE_EMAIL_PER_MINUTE', '1'))
+    # Number of trusted reverse proxies setting X-Forwarded-For / X-Forwarded-Proto
+    # (0 = none); the login IP bucket keys on the client address they report
+    PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR', '0'))
+    PROXY_FIX_X_PROTO = int(os.environ.get('PROXY_FIX_X_PROTO', '0'))
+    # Seconds a login credential lookup is cached
+    LOGIN_CREDENTIAL_CACHE_TTL = int(os.environ.get('LOGIN_CREDENTIAL_CACHE_TTL', '30'))
+    # Deferred users.last_login updates
+    LAST_LOGIN_BATCH_SIZE = int(os.environ.get('LAST_LOGIN_BATCH_SIZE', '500'))
+    LAST_LOGIN_FLUSH_INTERVAL = float(os.environ.get('LAST_LOGIN_FLUSH_INTERVAL', '5.0'))  # seconds
+
     # Session configuration
     SESSION_PERMANENT = False
-    PERMANENT_SESSION_LIFETIME = 3600  # 1 hour
+    PERMANENT_SESSION_LIFETIME = 3600  # 1 hour, also the idle timeout of server-side sessions
+    # Session storage: 'sqlite' (shared by all workers on a host), 'memory' or 'cookie'
+    SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'sqlite')
+    SESSION_SQLITE_PATH = os.environ.get('SESSION_SQLITE_PATH') or \
+        os.path.join(os.path.dirname(__file__), '..', 'instance', 'sessions.db')
+    SESSION_MEMORY_MAXSIZE = int(os.environ.get('SESSION_MEMORY_MAXSIZE', '10000'))
+    SESSION_SWEEP_INTERVAL = int(os.environ.get('SESSION_SWEEP_INTERVAL', '300'))  # seconds
 
     # File upload configuration
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
@@ -47,6 +110,8 @@ class TestingConfig(Config):
     TESTING = True
     DEBUG = True
     DB_NAME = os.environ.get('TEST_DB_NAME', 'komodo_test')
+    PASSWORD_SCRYPT_LOG_N = 10  # cheap hashes keep tests fast
+    SESSION_BACKEND = 'memory'
 
 
 config: Dict[str, Any] = {
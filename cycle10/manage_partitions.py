@@ -0,0 +1,47 @@
+"""
+Komodo Hub - access_logs partition maintenance
+
+Run daily (e.g. from cron) to keep monthly partitions ahead of the clock
+and retire expired months to compressed archives:
+
+    python manage_partitions.py [--dry-run] [--no-archive]
+"""
+import argparse
+from dotenv import load_dotenv
+from config import config
+from models import DatabaseManager
+from utils.partitions import PartitionManager
+
+
+def main():
+    """Parse arguments and run partition maintenance"""
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Maintain monthly access_logs partitions")
+    parser.add_argument('--config', default='default', choices=sorted(config))
+    parser.add_argument('--months-ahead', type=int, help="future months to keep partitioned")
+    parser.add_argument('--retention-months', type=int, help="months of logs to keep online")
+    parser.add_argument('--archive-dir', help="directory for archived partitions")
+    parser.add_argument('--no-archive', action='store_true',
+                        help="drop expired partitions without archiving them")
+    parser.add_argument('--dry-run', action='store_true', help="only print the planned actions")
+    args = parser.parse_args()
+
+    app_config = config[args.config]
+    db_manager = DatabaseManager(app_config)
+    manager = PartitionManager(
+        db_manager,
+        months_ahead=args.months_ahead or app_config.ACCESS_LOG_PARTITIONS_AHEAD,
+        retention_months=args.retention_months or app_config.ACCESS_LOG_RETENTION_MONTHS,
+        archive_dir=args.archive_dir or app_config.ACCESS_LOG_ARCHIVE_DIR
+    )
+
+    try:
+        actions = manager.run(archive=not args.no_archive, dry_run=args.dry_run)
+        for action in actions or ["nothing to do"]:
+            print(("[dry run] " if args.dry_run else "") + action)
+    finally:
+        db_manager.close()
+
+
+if __name__ == '__main__':
+    main()
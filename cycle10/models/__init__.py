@@ -1,43 +1,308 @@
 """
 Database models and connection management
 """
+import base64
+import json
+import threading
+import time
 import pymysql
-from typing import Optional, List, Dict, Any
+from collections import deque
+from datetime import datetime, date
+from decimal import Decimal
+from typing import Optional, List, Dict, Any, Callable, Iterator, Union
 from contextlib import contextmanager
 from config import Config
 
 
+class PoolTimeoutError(pymysql.err.OperationalError):
+    """Raised when no pooled connection becomes available in time"""
+
+
+class ConnectionPool:
+    """Thread-safe bounded pool of database connections"""
+
+    def __init__(self, connect: Callable[[], Any], min_size: int = 1,
+                 max_size: int = 10, timeout: float = 30.0,
+                 recycle: int = 3600, ping_interval: float = 30.0):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        if min_size < 0 or min_size > max_size:
+            raise ValueError("min_size must be between 0 and max_size")
+
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_interval = ping_interval
+
+        self._lock = threading.Condition()
+        # Idle connections as (connection, created_at, last_used) tuples
+        self._idle = deque()
+        # Creation time of every connection owned by the pool, keyed by id()
+        self._created: Dict[int, float] = {}
+        self._in_use = 0
+        # Slots claimed by threads that are currently opening a connection
+        self._reserved = 0
+        self._closed = False
+        # Background thread topping the pool back up after a discard (one at a time)
+        self._refill_thread: Optional[threading.Thread] = None
+
+        # Counters exposed through stats()
+        self._checkouts = 0
+        self._timeouts = 0
+        self._recycled = 0
+        self._discarded = 0
+        self._wait_time = 0.0
+
+    @property
+    def size(self) -> int:
+        """Number of connections currently owned by the pool"""
+        return len(self._created)
+
+    def _open(self):
+        """Open a new connection (called without holding the lock)"""
+        conn = self._connect()
+        with self._lock:
+            self._created[id(conn)] = time.monotonic()
+        return conn
+
+    def _discard(self, conn):
+        """Close a connection, forget about it and top the pool back up in the background"""
+        with self._lock:
+            self._created.pop(id(conn), None)
+            self._discarded += 1
+            self._lock.notify()
+        try:
+            if conn.open:
+                conn.close()
+        except Exception:
+            pass
+        self._refill_in_background()
+
+    def _refill_in_background(self):
+        """Start a refill thread when below min_size, so no request waits on connect()"""
+        with self._lock:
+            if self._closed or len(self._created) + self._reserved >= self.min_size:
+                return
+            if self._refill_thread is not None and self._refill_thread.is_alive():
+                return
+            self._refill_thread = threading.Thread(target=self.prewarm, name='pool-refill',
+                                                   daemon=True)
+            self._refill_thread.start()
+
+    def _is_healthy(self, conn, created_at: float, last_used: float) -> bool:
+        """Health check performed on borrow"""
+        now = time.monotonic()
+        if self.recycle and now - created_at > self.recycle:
+            with self._lock:
+                self._recycled += 1
+            return False
+        if not conn.open:
+            return False
+        if self.ping_interval is not None and now - last_used > self.ping_interval:
+            try:
+                conn.ping(reconnect=False)
+            except Exception:
+                return False
+        return True
+
+    def acquire(self, timeout: Optional[float] = None):
+        """Check out a connection, waiting up to timeout seconds"""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        while True:
+            candidate = None
+            reserve = False
+            with self._lock:
+                while True:
+                    if self._closed:
+                        raise pymysql.err.InterfaceError("Connection pool is closed")
+                    if self._idle:
+                        candidate = self._idle.pop()
+                        break
+                    if len(self._created) + self._reserved < self.max_size:
+                        self._reserved += 1
+                        reserve = True
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeoutError(
+                            f"Timed out after {timeout}s waiting for a database connection "
+                            f"(pool size {self.max_size})"
+                        )
+                    self._lock.wait(remaining)
+                self._in_use += 1
+
+            if reserve:
+                try:
+                    conn = self._open()
+                except Exception:
+                    with self._lock:
+                        self._in_use -= 1
+                        self._reserved -= 1
+                        self._lock.notify()
+                    raise
+                with self._lock:
+                    self._reserved -= 1
+                    self._checkouts += 1
+                    self._wait_time += time.monotonic() - started
+                return conn
+
+            conn, created_at, last_used = candidate
+            if self._is_healthy(conn, created_at, last_used):
+                with self._lock:
+                    self._checkouts += 1
+                    self._wait_time += time.monotonic() - started
+                return conn
+
+            # Unhealthy or expired: drop it and try again
+            with self._lock:
+                self._in_use -= 1
+            self._discard(conn)
+
+    def release(self, conn, discard: bool = False):
+        """Return a checked-out connection to the pool"""
+        with self._lock:
+            self._in_use -= 1
+            created_at = self._created.get(id(conn))
+            keep = (not discard and not self._closed and created_at is not None
+                    and getattr(conn, 'open', False))
+            if keep:
+                self._idle.append((conn, created_at, time.monotonic()))
+                self._lock.notify()
+                return
+        self._discard(conn)
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """Context manager that checks a connection out and back in"""
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+            # The connection may be broken, never hand it out again
+            self.release(conn, discard=True)
+            raise
+        except BaseException:
+            self.release(conn)
+            raise
+        else:
+            self.release(conn)
+
+    def prewarm(self):
+        """Open connections up to min_size, leaving failures to the next acquire()"""
+        try:
+            self.fill()
+        except Exception as e:
+            print(f"Connection pool refill failed: {e}")
+
+    def fill(self):
+        """Open connections until min_size connections are idle or in use"""
+        while True:
+            with self._lock:
+                if self._closed or len(self._created) + self._reserved >= self.min_size:
+                    return
+                self._reserved += 1
+            try:
+                conn = self._open()
+            finally:
+                with self._lock:
+                    self._reserved -= 1
+            with self._lock:
+                self._idle.append((conn, self._created[id(conn)], time.monotonic()))
+                self._lock.notify()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get pool statistics"""
+        with self._lock:
+            return {
+                'size': len(self._created),
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'recycled': self._recycled,
+                'discarded': self._discarded,
+                'avg_wait_ms': (self._wait_time / self._checkouts * 1000) if self._checkouts else 0.0,
+            }
+
+    def close(self):
+        """Close all idle connections and refuse further checkouts"""
+        with self._lock:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._lock.notify_all()
+        for conn, _, _ in idle:
+            self._discard(conn)
+
+
 class DatabaseManager:
     """Database connection manager with connection pooling"""
 
     def __init__(self, config: Config):
         self.config = config
-        self._connection = None
+        self.pool = ConnectionPool(
+            self._create_connection,
+            min_size=config.DB_POOL_MIN_SIZE,
+            max_size=config.DB_POOL_MAX_SIZE,
+            timeout=config.DB_POOL_TIMEOUT,
+            recycle=config.DB_POOL_RECYCLE
+        )
+        # Pre-warm min_size connections; an unreachable database only fails on first use
+        self.pool.prewarm()
+
+    def _create_connection(self):
+        """Open a new database connection"""
+        return pymysql.connect(
+            host=self.config.DB_HOST,
+            port=self.config.DB_PORT,
+            user=self.config.DB_USER,
+            password=self.config.DB_PASSWORD,
+            database=self.config.DB_NAME,
+            charset='utf8mb4',
+            cursorclass=pymysql.cursors.DictCursor,
+            autocommit=True
+        )
 
     def get_connection(self):
-        """Get database connection"""
-        if self._connection is None or not self._connection.open:
-            self._connection = pymysql.connect(
-                host=self.config.DB_HOST,
-                port=self.config.DB_PORT,
-                user=self.config.DB_USER,
-                password=self.config.DB_PASSWORD,
-                database=self.config.DB_NAME,
-                charset='utf8mb4',
-                cursorclass=pymysql.cursors.DictCursor,
-                autocommit=True
-            )
-        return self._connection
+        """Check out a pooled connection (return it with release_connection)"""
+        return self.pool.acquire()
+
+    def release_connection(self, connection, discard: bool = False):
+        """Return a connection obtained from get_connection to the pool"""
+        self.pool.release(connection, discard)
 
     @contextmanager
     def cursor(self):
         """Context manager for database cursor"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        try:
-            yield cursor
-        finally:
-            cursor.close()
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
+    @contextmanager
+    def transaction(self):
+        """Cursor whose statements are committed together (rolled back on error)"""
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            conn.begin()
+            try:
+                yield cursor
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
 
     def execute_query(self, query: str, params: Optional[tuple] = None) -> List[Dict[str, Any]]:
         """Execute a query and return results"""
@@ -45,6 +310,36 @@ class DatabaseManager:
             cursor.execute(query, params or ())
             return cursor.fetchall()
 
+    def iter_query(self, query: str, params: Optional[tuple] = None,
+                   batch_size: Optional[int] = None
+                   ) -> Iterator[Union[Dict[str, Any], List[Dict[str, Any]]]]:
+        """Execute a query and yield rows one by one (or lists of batch_size rows)
+
+        Rows are streamed with an unbuffered server-side cursor, so memory use
+        does not depend on the size of the result. The connection stays checked
+        out until the generator is exhausted; if it is abandoned early the
+        connection is discarded rather than drained.
+        """
+        conn = self.pool.acquire()
+        cursor = conn.cursor(pymysql.cursors.SSDictCursor)
+        finished = False
+        try:
+            cursor.execute(query, params or ())
+            if batch_size:
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield rows
+            else:
+                for row in cursor:
+                    yield row
+            finished = True
+        finally:
+            if finished:
+                cursor.close()
+            self.pool.release(conn, discard=not finished)
+
     def execute_update(self, query: str, params: Optional[tuple] = None) -> int:
         """Execute an update query and return affected rows"""
         with self.cursor() as cursor:
@@ -57,11 +352,58 @@ class DatabaseManager:
             cursor.execute(query, params or ())
             return cursor.lastrowid
 
+    def execute_many(self, query: str, params_list: List[tuple]) -> int:
+        """Execute a batch query (multi-row insert) and return affected rows"""
+        with self.cursor() as cursor:
+            cursor.executemany(query, params_list)
+            return cursor.rowcount
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Get connection pool statistics"""
+        return self.pool.stats()
+
     def close(self):
-        """Close database connection"""
-        if self._connection and self._connection.open:
-            self._connection.close()
-            self._connection = None
+        """Close all pooled database connections"""
+        self.pool.close()
+
+
+def _cursor_default(value):
+    if isinstance(value, datetime):
+        return {'$dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'$d': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'$dec': str(value)}
+    raise TypeError(f"Cannot encode {type(value).__name__} in a cursor")
+
+
+def _cursor_object_hook(obj):
+    if '$dt' in obj:
+        return datetime.fromisoformat(obj['$dt'])
+    if '$d' in obj:
+        return date.fromisoformat(obj['$d'])
+    if '$dec' in obj:
+        return Decimal(obj['$dec'])
+    return obj
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """Encode the (sort_key, primary_key) of the last row as an opaque cursor"""
+    raw = json.dumps(values, default=_cursor_default, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """Decode a cursor produced by encode_cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')),
+                            object_hook=_cursor_object_hook)
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise ValueError("Invalid pagination cursor") from e
+    if not isinstance(values, list) or len(values) != 2:
+        raise ValueError("Invalid pagination cursor")
+    return values
 
 
 class BaseModel:
@@ -79,6 +421,15 @@ class BaseModel:
             print(f"Database error: {e}")
             raise
 
+    def _iter_query(self, query: str, params: Optional[tuple] = None,
+                    batch_size: Optional[int] = None) -> Iterator[Any]:
+        """Stream query rows with error handling"""
+        try:
+            yield from self.db.iter_query(query, params, batch_size)
+        except pymysql.Error as e:
+            print(f"Database error: {e}")
+            raise
+
     def _execute_update(self, query: str, params: Optional[tuple] = None) -> int:
         """Execute update with error handling"""
         try:
@@ -94,3 +445,46 @@ class BaseModel:
         except pymysql.Error as e:
             print(f"Database error: {e}")
             raise
+
+    def _execute_many(self, query: str, params_list: List[tuple]) -> int:
+        """Execute batch query with error handling"""
+        try:
+            return self.db.execute_many(query, params_list)
+        except pymysql.Error as e:
+            print(f"Database error: {e}")
+            raise
+
+    def _seek_page(self, select_sql: str, conditions: List[str], params: tuple,
+                   sort_column: str, pk_column: str, cursor: Optional[str],
+                   limit: int, descending: bool = True) -> Dict[str, Any]:
+        """Run a keyset (seek) paginated query ordered by (sort_column, pk_column)
+
+        Returns {'items': rows, 'next_cursor': str or None}. Pass next_cursor
+        back as cursor for the following page; None means there are no more
+        rows. Columns may be qualified (e.g. 'm.sent_at'); the rows must
+        expose the unqualified names.
+        """
+        conditions = list(conditions)
+        params = tuple(params)
+        op = '<' if descending else '>'
+        direction = 'DESC' if descending else 'ASC'
+
+        if cursor:
+            sort_value, pk_value = decode_cursor(cursor)
+            conditions.append(f"({sort_column} {op} %s OR "
+                              f"({sort_column} = %s AND {pk_column} {op} %s))")
+            params += (sort_value, sort_value, pk_value)
+
+        query = select_sql
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += f" ORDER BY {sort_column} {direction}, {pk_column} {direction} LIMIT %s"
+
+        rows = self._execute_query(query, params + (limit + 1,))
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor([last[sort_column.split('.')[-1]],
+                                         last[pk_column.split('.')[-1]]])
+        return {'items': rows, 'next_cursor': next_cursor}
@@ -1,8 +1,10 @@
 """
 Content-related models for content library and species sightings
 """
-from typing import Optional, List, Dict, Any
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Iterator
 from models import BaseModel
+from utils import geo
 
 
 class ContentModel(BaseModel):
@@ -23,15 +25,39 @@ class SightingModel(BaseModel):
     """Sighting model for species sighting operations"""
 
     def report_sighting(self, species_name: str, location: str, date_time: str,
-                       description: str, photo_path: Optional[str], reported_by: int) -> int:
-        """Report species sighting"""
+                       description: str, photo_path: Optional[str], reported_by: int,
+                       latitude: Optional[float] = None,
+                       longitude: Optional[float] = None) -> int:
+        """Report species sighting, optionally with coordinates (stored with their geohash)"""
+        geohash = None
+        if latitude is not None or longitude is not None:
+            if latitude is None or longitude is None:
+                raise ValueError("Latitude and longitude must be given together")
+            latitude, longitude = geo.validate_coordinates(latitude, longitude)
+            geohash = geo.encode(latitude, longitude)
         return self._execute_insert(
             """INSERT INTO species_sightings (species_name, location, date_time,
-                   description, photo_path, reported_by)
-               VALUES (%s, %s, %s, %s, %s, %s)""",
-            (species_name, location, date_time, description, photo_path, reported_by)
+                   description, photo_path, reported_by, latitude, longitude, geohash)
+               VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)""",
+            (species_name, location, date_time, description, photo_path, reported_by,
+             latitude, longitude, geohash)
         )
 
+    def iter_sightings(self, start: datetime, end: datetime,
+                       species_name: Optional[str] = None,
+                       batch_size: Optional[int] = None) -> Iterator[Any]:
+        """Stream sightings observed in [start, end), oldest first"""
+        query = """SELECT sighting_id, species_name, location, date_time, description,
+                          photo_path, reported_by, verified, latitude, longitude, created_at
+                   FROM species_sightings
+                   WHERE date_time >= %s AND date_time < %s"""
+        params = [start, end]
+        if species_name:
+            query += " AND species_name = %s"
+            params.append(species_name)
+        query += " ORDER BY date_time, sighting_id"
+        return self._iter_query(query, tuple(params), batch_size)
+
 
 class AnalyticsModel(BaseModel):
     """Analytics model for business analytics operations"""
@@ -45,6 +71,20 @@ class AnalyticsModel(BaseModel):
             (metric_type, metric_value, metric_data)
         )
 
+    def iter_access_logs(self, start: datetime, end: datetime,
+                         action: Optional[str] = None,
+                         batch_size: Optional[int] = None) -> Iterator[Any]:
+        """Stream access logs recorded in [start, end), oldest first"""
+        query = """SELECT log_id, user_id, action, target_type, target_id, timestamp, ip_address
+                   FROM access_logs
+                   WHERE timestamp >= %s AND timestamp < %s"""
+        params = [start, end]
+        if action:
+            query += " AND action = %s"
+            params.append(action)
+        query += " ORDER BY timestamp, log_id"
+        return self._iter_query(query, tuple(params), batch_size)
+
 
 class CanvasModel(BaseModel):
     """Canvas model for creative canvas operations"""
@@ -37,6 +37,22 @@ class ClassModel(BaseModel):
                JOIN organizations o ON c.org_id = o.org_id"""
         )
 
+    def get_class_teacher(self, class_id: int) -> Optional[int]:
+        """Get the teacher_id of a class"""
+        result = self._execute_query(
+            "SELECT teacher_id FROM classes WHERE class_id = %s", (class_id,)
+        )
+        return result[0]['teacher_id'] if result else None
+
+    def get_active_student_ids(self, class_id: int) -> List[int]:
+        """Get ids of students actively enrolled in a class"""
+        rows = self._execute_query(
+            """SELECT student_id FROM class_enrollments
+               WHERE class_id = %s AND status = 'active'""",
+            (class_id,)
+        )
+        return [row['student_id'] for row in rows]
+
     def get_teacher_classes(self, teacher_id: int) -> List[Dict[str, Any]]:
         """Get classes taught by teacher"""
         return self._execute_query(
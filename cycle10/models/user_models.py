@@ -22,6 +22,82 @@ class UserModel(BaseModel):
         )
         return result[0] if result else None
 
+    def get_credentials_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        """Get the columns needed to check a login"""
+        result = self._execute_query(
+            """SELECT user_id, username, email, user_type, password
+               FROM users WHERE email = %s""",
+            (email,)
+        )
+        return result[0] if result else None
+
+    def get_login_profile(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Get the columns a login puts in the session"""
+        result = self._execute_query(
+            "SELECT user_id, username, email, user_type FROM users WHERE user_id = %s",
+            (user_id,)
+        )
+        return result[0] if result else None
+
+    def get_reachable_users(self, user_id: int, since_membership_id: int = 0) -> List[Dict[str, Any]]:
+        """Get users sharing an organization with the user
+
+        Only pairs where either membership is newer than since_membership_id
+        are returned, so callers can fetch just what changed. Each row has
+        user_id, username, email and the newest membership_id involved (a
+        user may appear twice). Two queries each read only new rows: the
+        user's new memberships (every member of those organizations), then
+        new members of the user's older organizations, found by a
+        membership_id range on idx_org_membership.
+        """
+        rows = self._execute_query(
+            """SELECT u.user_id, u.username, u.email, MAX(mine.membership_id) AS membership_id
+               FROM organization_members mine
+               JOIN organization_members theirs
+                    ON theirs.org_id = mine.org_id AND theirs.user_id != mine.user_id
+               JOIN users u ON u.user_id = theirs.user_id
+               WHERE mine.user_id = %s AND mine.membership_id > %s
+               GROUP BY u.user_id, u.username, u.email""",
+            (user_id, since_membership_id)
+        )
+        if since_membership_id:
+            rows += self._execute_query(
+                """SELECT u.user_id, u.username, u.email, MAX(theirs.membership_id) AS membership_id
+                   FROM organization_members mine
+                   JOIN organization_members theirs
+                        ON theirs.org_id = mine.org_id AND theirs.membership_id > %s
+                           AND theirs.user_id != mine.user_id
+                   JOIN users u ON u.user_id = theirs.user_id
+                   WHERE mine.user_id = %s AND mine.membership_id <= %s
+                   GROUP BY u.user_id, u.username, u.email""",
+                (since_membership_id, user_id, since_membership_id)
+            )
+        return rows
+
+    def shares_organization(self, user_id: int, other_id: int) -> bool:
+        """Check whether two different users are members of a common organization"""
+        result = self._execute_query(
+            """SELECT 1 FROM organization_members mine
+               JOIN organization_members theirs ON theirs.org_id = mine.org_id
+               WHERE mine.user_id = %s AND theirs.user_id = %s AND mine.user_id != theirs.user_id
+               LIMIT 1""",
+            (user_id, other_id)
+        )
+        return bool(result)
+
+    def get_user_type(self, user_id: int) -> Optional[str]:
+        """Get only the user's type (used for permission checks)"""
+        result = self._execute_query(
+            "SELECT user_type FROM users WHERE user_id = %s", (user_id,)
+        )
+        return result[0]['user_type'] if result else None
+
+    def update_user_type(self, user_id: int, user_type: str) -> int:
+        """Change user's type"""
+        return self._execute_update(
+            "UPDATE users SET user_type = %s WHERE user_id = %s", (user_type, user_id)
+        )
+
     def create_user(self, username: str, email: str, password_hash: str,
                    user_type: str, user_image: str = '1') -> int:
         """Create a new user"""
@@ -38,6 +114,12 @@ class UserModel(BaseModel):
 
         return user_id
 
+    def update_password(self, user_id: int, password_hash: str) -> int:
+        """Replace user's stored password hash"""
+        return self._execute_update(
+            "UPDATE users SET password = %s WHERE user_id = %s", (password_hash, user_id)
+        )
+
     def update_last_login(self, user_id: int):
         """Update user's last login time"""
         self._execute_update(
@@ -83,6 +165,23 @@ class OrganizationModel(BaseModel):
         except Exception:
             return False
 
+    def get_member_role(self, org_id: int, user_id: int) -> Optional[str]:
+        """Get the user's role in an organization"""
+        result = self._execute_query(
+            "SELECT role FROM organization_members WHERE org_id = %s AND user_id = %s",
+            (org_id, user_id)
+        )
+        return result[0]['role'] if result else None
+
+    def get_member_ids(self, org_id: int, role: Optional[str] = None) -> List[int]:
+        """Get ids of an organization's members, optionally only one role"""
+        query = "SELECT user_id FROM organization_members WHERE org_id = %s"
+        params = (org_id,)
+        if role:
+            query += " AND role = %s"
+            params += (role,)
+        return [row['user_id'] for row in self._execute_query(query, params)]
+
     def get_user_organizations(self, user_id: int) -> List[Dict[str, Any]]:
         """Get organizations user belongs to"""
         return self._execute_query(
@@ -97,13 +196,107 @@ class OrganizationModel(BaseModel):
 class MessageModel(BaseModel):
     """Message model for message-related operations"""
 
+    INCREMENT_UNREAD_QUERY = """INSERT INTO user_message_counters (user_id, unread_count)
+               VALUES (%s, %s)
+               ON DUPLICATE KEY UPDATE unread_count = unread_count + VALUES(unread_count)"""
+
+    # LAST_INSERT_ID(expr) makes the existing id the insert id on duplicates
+    CONVERSATION_QUERY = """INSERT INTO conversations (user_low, user_high) VALUES (%s, %s)
+               ON DUPLICATE KEY UPDATE conversation_id = LAST_INSERT_ID(conversation_id)"""
+
+    CONVERSATION_MEMBERS_QUERY = """INSERT INTO conversation_members
+                   (conversation_id, user_id, unread_count, last_message_at)
+               VALUES (%s, %s, 0, NOW()), (%s, %s, 1, NOW())
+               ON DUPLICATE KEY UPDATE unread_count = unread_count + VALUES(unread_count),
+                                       last_message_at = VALUES(last_message_at)"""
+
     def send_message(self, sender_id: int, recipient_id: int, message_text: str) -> int:
-        """Send a message"""
-        return self._execute_insert(
-            """INSERT INTO messages (sender_id, recipient_id, message_text)
-               VALUES (%s, %s, %s)""",
-            (sender_id, recipient_id, message_text)
-        )
+        """Send a message, filing it under the pair's conversation
+
+        The conversation's last message, the recipient's per-conversation
+        and total unread counters are updated in the same transaction.
+        """
+        pair = (min(sender_id, recipient_id), max(sender_id, recipient_id))
+        with self.db.transaction() as cursor:
+            cursor.execute(self.CONVERSATION_QUERY, pair)
+            conversation_id = cursor.lastrowid
+            cursor.execute(
+                """INSERT INTO messages (conversation_id, sender_id, recipient_id, message_text)
+                   VALUES (%s, %s, %s, %s)""",
+                (conversation_id, sender_id, recipient_id, message_text)
+            )
+            message_id = cursor.lastrowid
+            cursor.execute(
+                """UPDATE conversations SET last_message_id = %s, last_message_at = NOW()
+                   WHERE conversation_id = %s""",
+                (message_id, conversation_id)
+            )
+            cursor.execute(self.CONVERSATION_MEMBERS_QUERY,
+                           (conversation_id, sender_id, conversation_id, recipient_id))
+            cursor.execute(self.INCREMENT_UNREAD_QUERY, (recipient_id, 1))
+        return message_id
+
+    def broadcast(self, sender_id: int, recipient_ids: List[int], message_text: str) -> int:
+        """Send the same message to many users in one transaction
+
+        Every table is written with one batched multi-row statement (all
+        values are placeholders so executemany can batch them), whatever the
+        number of recipients. Returns the number of messages inserted.
+        """
+        recipient_ids = sorted(set(recipient_ids) - {sender_id})
+        if not recipient_ids:
+            return 0
+        pairs = [(min(sender_id, rid), max(sender_id, rid)) for rid in recipient_ids]
+
+        with self.db.transaction() as cursor:
+            # One database clock for sent_at and last_message_at, as send_message uses NOW()
+            cursor.execute("SELECT NOW() AS now")
+            now = cursor.fetchone()['now']
+            cursor.executemany(
+                """INSERT INTO conversations (user_low, user_high) VALUES (%s, %s)
+                   ON DUPLICATE KEY UPDATE user_low = user_low""",
+                pairs
+            )
+            placeholders = ', '.join(['%s'] * len(recipient_ids))
+            cursor.execute(
+                f"""SELECT conversation_id, user_low, user_high FROM conversations
+                    WHERE (user_low = %s AND user_high IN ({placeholders}))
+                       OR (user_high = %s AND user_low IN ({placeholders}))""",
+                (sender_id, *recipient_ids, sender_id, *recipient_ids)
+            )
+            conversations = {
+                row['user_high'] if row['user_low'] == sender_id else row['user_low']:
+                    row['conversation_id']
+                for row in cursor.fetchall()
+            }
+
+            cursor.executemany(
+                """INSERT INTO messages (conversation_id, sender_id, recipient_id, message_text, sent_at)
+                   VALUES (%s, %s, %s, %s, %s)""",
+                [(conversations[rid], sender_id, rid, message_text, now) for rid in recipient_ids]
+            )
+            sent = cursor.rowcount
+
+            conversation_ids = list(conversations.values())
+            cursor.execute(
+                f"""UPDATE conversations c
+                    JOIN (SELECT conversation_id, MAX(message_id) AS last_id FROM messages
+                          WHERE conversation_id IN ({', '.join(['%s'] * len(conversation_ids))})
+                          GROUP BY conversation_id) t ON t.conversation_id = c.conversation_id
+                    SET c.last_message_id = t.last_id, c.last_message_at = %s""",
+                (*conversation_ids, now)
+            )
+            cursor.executemany(
+                """INSERT INTO conversation_members
+                       (conversation_id, user_id, unread_count, last_message_at)
+                   VALUES (%s, %s, %s, %s)
+                   ON DUPLICATE KEY UPDATE unread_count = unread_count + VALUES(unread_count),
+                                           last_message_at = VALUES(last_message_at)""",
+                [row for rid in recipient_ids
+                 for row in ((conversations[rid], sender_id, 0, now), (conversations[rid], rid, 1, now))]
+            )
+            cursor.executemany(self.INCREMENT_UNREAD_QUERY, [(rid, 1) for rid in recipient_ids])
+        return sent
 
     def get_received_messages(self, user_id: int) -> List[Dict[str, Any]]:
         """Get messages received by user"""
@@ -115,4 +308,79 @@ class MessageModel(BaseModel):
                WHERE m.recipient_id = %s
                ORDER BY m.sent_at DESC""",
             (user_id,)
-        )
\ No newline at end of file
+        )
+
+    def get_inbox_page(self, user_id: int, cursor: Optional[str] = None,
+                       limit: int = 20, unread_only: bool = False) -> Dict[str, Any]:
+        """Get one page of received messages, newest first
+
+        Seeks along (recipient_id, sent_at) so every page costs the same
+        however many messages the user has. Returns {'items', 'next_cursor'}.
+        """
+        select_sql = """SELECT m.message_id, m.message_text, m.sent_at, m.read_at,
+                      u.username AS sender_name, u.user_id AS sender_id
+               FROM messages m
+               LEFT JOIN users u ON m.sender_id = u.user_id"""
+        conditions = ["m.recipient_id = %s"]
+        if unread_only:
+            conditions.append("m.read_at IS NULL")
+        return self._seek_page(select_sql, conditions, (user_id,), 'm.sent_at',
+                               'm.message_id', cursor, limit)
+
+    def get_unread_count(self, user_id: int) -> int:
+        """Get the user's maintained unread message count"""
+        result = self._execute_query(
+            "SELECT unread_count FROM user_message_counters WHERE user_id = %s",
+            (user_id,)
+        )
+        return result[0]['unread_count'] if result else 0
+
+    def mark_read(self, user_id: int, message_ids: Optional[List[int]] = None) -> int:
+        """Mark the user's messages read (all unread ones if no ids given)
+
+        Returns the number of messages that changed; the unread counters
+        (total and per conversation) are decreased in the same transaction.
+        """
+        if message_ids is not None and not message_ids:
+            return 0
+        where = "recipient_id = %s AND read_at IS NULL"
+        params = (user_id,)
+        if message_ids:
+            where += f" AND message_id IN ({', '.join(['%s'] * len(message_ids))})"
+            params += tuple(message_ids)
+
+        with self.db.transaction() as cursor:
+            cursor.execute(
+                f"""SELECT conversation_id, COUNT(*) AS unread FROM messages
+                    WHERE {where} GROUP BY conversation_id FOR UPDATE""",
+                params
+            )
+            per_conversation = cursor.fetchall()
+            cursor.execute(f"UPDATE messages SET read_at = NOW() WHERE {where}", params)
+            changed = cursor.rowcount
+            if changed:
+                cursor.execute(
+                    """UPDATE user_message_counters
+                       SET unread_count = GREATEST(unread_count - %s, 0)
+                       WHERE user_id = %s""",
+                    (changed, user_id)
+                )
+                cursor.executemany(
+                    """UPDATE conversation_members
+                       SET unread_count = GREATEST(unread_count - %s, 0)
+                       WHERE conversation_id = %s AND user_id = %s""",
+                    [(row['unread'], row['conversation_id'], user_id) for row in per_conversation]
+                )
+        return changed
+
+    def rebuild_unread_counters(self):
+        """Recompute every user's unread counter from the messages table"""
+        with self.db.transaction() as cursor:
+            cursor.execute("UPDATE user_message_counters SET unread_count = 0")
+            cursor.execute(
+                """INSERT INTO user_message_counters (user_id, unread_count)
+                   SELECT recipient_id, COUNT(*) FROM messages
+                   WHERE read_at IS NULL
+                   GROUP BY recipient_id
+                   ON DUPLICATE KEY UPDATE unread_count = VALUES(unread_count)"""
+            )
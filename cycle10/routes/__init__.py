@@ -1,11 +1,19 @@
 """
 Route definitions for the Flask application
 """
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash
+import atexit
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, Response, abort, stream_with_context, jsonify
 from typing import Optional
 from models import DatabaseManager
-from services import AuthService, UserService, OrganizationService, EducationService, ContentService
-from utils import log_access, require_role, get_user_types, get_program_types, get_activity_types, get_content_types
+from models.user_models import UserModel
+from services import AuthService, UserService, OrganizationService, EducationService, ContentService, ExportService
+from utils import AccessLogWriter, LastLoginWriter, RoleCache, TTLCache, log_access, require_role, get_user_types, get_program_types, get_activity_types, get_content_types
+from utils.exporters import EXPORT_FORMATS
+from utils.passwords import HashingBusyError, build_password_manager
+from utils.ratelimit import build_login_rate_limiter
+from utils.geo import parse_coordinates
+from utils.recipients import RecipientDirectory
+from utils.sessions import regenerate_session
 
 
 class RouteManager:
@@ -15,11 +23,39 @@ class RouteManager:
         self.app = app
         self.config = config
         self.db_manager = DatabaseManager(config)
-        self.auth_service = AuthService(self.db_manager)
-        self.user_service = UserService(self.db_manager)
+        self.role_cache = RoleCache(UserModel(self.db_manager), ttl=config.ROLE_CACHE_TTL)
+        self.passwords = build_password_manager(config)
+        self.login_limiter = build_login_rate_limiter(config)
+        self.last_login_writer = LastLoginWriter(
+            self.db_manager,
+            batch_size=config.LAST_LOGIN_BATCH_SIZE,
+            flush_interval=config.LAST_LOGIN_FLUSH_INTERVAL
+        )
+        self.credential_cache = TTLCache(ttl=config.LOGIN_CREDENTIAL_CACHE_TTL)
+        self.auth_service = AuthService(
+            self.db_manager, self.passwords,
+            last_login_writer=self.last_login_writer,
+            credential_cache=self.credential_cache
+        )
+        self.user_service = UserService(self.db_manager, self.role_cache, self.credential_cache)
+        self.recipients = RecipientDirectory(
+            self.user_service.user_model,
+            ttl=config.RECIPIENT_CACHE_TTL,
+            refresh_interval=config.RECIPIENT_REFRESH_INTERVAL
+        )
         self.org_service = OrganizationService(self.db_manager)
         self.education_service = EducationService(self.db_manager)
         self.content_service = ContentService(self.db_manager)
+        self.export_service = ExportService(self.db_manager, batch_size=config.EXPORT_BATCH_SIZE)
+        self.access_log_writer = AccessLogWriter(
+            self.db_manager,
+            max_queue=config.ACCESS_LOG_QUEUE_SIZE,
+            batch_size=config.ACCESS_LOG_BATCH_SIZE,
+            flush_interval=config.ACCESS_LOG_FLUSH_INTERVAL
+        )
+        # Write out buffered access logs when the process exits
+        atexit.register(self.access_log_writer.close)
+        atexit.register(self.last_login_writer.close)
 
     def register_routes(self):
         """Register all application routes"""
@@ -34,13 +70,25 @@ class RouteManager:
                 email = request.form['email']
                 password = request.form['password']
 
-                user = self.auth_service.authenticate_user(email, password)
+                retry_after = self.login_limiter.check(request.remote_addr, email)
+                if retry_after:
+                    flash(f"Too many login attempts, please try again in {int(retry_after) + 1} seconds")
+                    return render_template('login.html'), 429, {'Retry-After': str(int(retry_after) + 1)}
+
+                try:
+                    user = self.auth_service.authenticate_user(email, password)
+                except HashingBusyError:
+                    flash("Server is busy, please try again in a moment")
+                    return render_template('login.html'), 503
                 if user:
+                    self.login_limiter.reset_email(email)
+                    regenerate_session(session)
                     session['user_id'] = user['user_id']
                     session['username'] = user['username']
                     session['user_type'] = user['user_type']
+                    self.role_cache.set_role(user['user_id'], user['user_type'])
 
-                    log_access(self.db_manager, user['user_id'], "login")
+                    log_access(self.access_log_writer, user['user_id'], "login")
                     flash(f"Login successful! Welcome {user['username']} ({user['user_type']})")
                     return redirect(url_for('main_menu'))
                 else:
@@ -61,12 +109,16 @@ class RouteManager:
                 user_type = request.form['user_type']
                 user_image = request.form.get('avatar', '1')
 
-                user_id = self.auth_service.register_user(
-                    username, email, password, user_type, user_image
-                )
+                try:
+                    user_id = self.auth_service.register_user(
+                        username, email, password, user_type, user_image
+                    )
+                except HashingBusyError:
+                    flash("Server is busy, please try again in a moment")
+                    return render_template('register.html', user_types=get_user_types()), 503
 
                 if user_id:
-                    log_access(self.db_manager, None, "register", "user", user_id)
+                    log_access(self.access_log_writer, None, "register", "user", user_id)
                     flash("Registration successful! Please login")
                     return redirect(url_for('login'))
                 else:
@@ -91,11 +143,26 @@ class RouteManager:
                 return redirect(url_for('login'))
 
             user_profile = self.user_service.get_user_profile(session['user_id'])
-            received_messages = self.user_service.get_received_messages(session['user_id'])
+            inbox = self.user_service.get_inbox(
+                session['user_id'], request.args.get('cursor'),
+                per_page=self.config.INBOX_PAGE_SIZE
+            )
 
             return render_template('user_center.html',
                                    user=user_profile,
-                                   received_messages=received_messages)
+                                   received_messages=inbox['messages'],
+                                   unread_count=inbox['unread_count'],
+                                   cursor=inbox['cursor'],
+                                   next_cursor=inbox['next_cursor'])
+
+        @self.app.route('/messages/read', methods=['POST'])
+        def mark_messages_read():
+            """Mark all received messages as read"""
+            if 'user_id' not in session:
+                return redirect(url_for('login'))
+
+            self.user_service.mark_messages_read(session['user_id'])
+            return redirect(url_for('user_center'))
 
         @self.app.route('/create_organization', methods=['GET', 'POST'])
         def create_organization():
@@ -103,7 +170,7 @@ class RouteManager:
             if 'user_id' not in session:
                 return redirect(url_for('login'))
 
-            if not require_role(self.db_manager, session['user_id'],
+            if not require_role(self.role_cache, session['user_id'],
                               ['admin', 'principal', 'community_chair']):
                 flash("Insufficient permissions!")
                 return redirect(url_for('main_menu'))
@@ -119,7 +186,7 @@ class RouteManager:
                 )
 
                 if org_id:
-                    log_access(self.db_manager, session['user_id'], "create_organization", "organization", org_id)
+                    log_access(self.access_log_writer, session['user_id'], "create_organization", "organization", org_id)
                     flash("Organization created successfully!")
                     return redirect(url_for('main_menu'))
                 else:
@@ -139,7 +206,7 @@ class RouteManager:
 
                 success = self.org_service.join_organization(org_id, session['user_id'], code)
                 if success:
-                    log_access(self.db_manager, session['user_id'], "join_organization", "organization", org_id)
+                    log_access(self.access_log_writer, session['user_id'], "join_organization", "organization", org_id)
                     flash("Successfully joined!")
                     return redirect(url_for('main_menu'))
                 else:
@@ -153,7 +220,7 @@ class RouteManager:
             if 'user_id' not in session:
                 return redirect(url_for('login'))
 
-            if not require_role(self.db_manager, session['user_id'], ['teacher', 'school_admin']):
+            if not require_role(self.role_cache, session['user_id'], ['teacher', 'school_admin']):
                 flash("Insufficient permissions!")
                 return redirect(url_for('main_menu'))
 
@@ -172,7 +239,7 @@ class RouteManager:
 
                 class_id = self.education_service.create_class(org_id, session['user_id'], name, syllabus)
                 if class_id:
-                    log_access(self.db_manager, session['user_id'], "create_class", "class", class_id)
+                    log_access(self.access_log_writer, session['user_id'], "create_class", "class", class_id)
                     flash("Course created successfully!")
                     return redirect(url_for('main_menu'))
                 else:
@@ -191,7 +258,7 @@ class RouteManager:
 
                 success = self.education_service.enroll_in_class(class_id, session['user_id'])
                 if success:
-                    log_access(self.db_manager, session['user_id'], "enroll_class", "class", class_id)
+                    log_access(self.access_log_writer, session['user_id'], "enroll_class", "class", class_id)
                     flash("Successfully enrolled!")
                 else:
                     flash("Already enrolled in this course!")
@@ -205,7 +272,7 @@ class RouteManager:
             if 'user_id' not in session:
                 return redirect(url_for('login'))
 
-            if not require_role(self.db_manager, session['user_id'],
+            if not require_role(self.role_cache, session['user_id'],
                               ['admin', 'principal', 'community_chair']):
                 flash("Insufficient permissions!")
                 return redirect(url_for('main_menu'))
@@ -217,7 +284,7 @@ class RouteManager:
 
                 program_id = self.education_service.create_program(name, desc, ptype)
                 if program_id:
-                    log_access(self.db_manager, session['user_id'], "create_program", "program", program_id)
+                    log_access(self.access_log_writer, session['user_id'], "create_program", "program", program_id)
                     flash("Program created successfully!")
                     return redirect(url_for('main_menu'))
                 else:
@@ -243,7 +310,7 @@ class RouteManager:
                     program_id, session['user_id'] if not is_org else None, org_id
                 )
                 if success:
-                    log_access(self.db_manager, session['user_id'], "enroll_program", "program", program_id)
+                    log_access(self.access_log_writer, session['user_id'], "enroll_program", "program", program_id)
                     flash("Successfully enrolled!")
                     return redirect(url_for('main_menu'))
                 else:
@@ -257,7 +324,7 @@ class RouteManager:
             if 'user_id' not in session:
                 return redirect(url_for('login'))
 
-            if not require_role(self.db_manager, session['user_id'], ['teacher', 'admin']):
+            if not require_role(self.role_cache, session['user_id'], ['teacher', 'admin']):
                 flash("Insufficient permissions!")
                 return redirect(url_for('main_menu'))
 
@@ -275,7 +342,7 @@ class RouteManager:
                     program_id, class_id, name, atype, desc, session['user_id']
                 )
                 if activity_id:
-                    log_access(self.db_manager, session['user_id'], "create_activity", "activity", activity_id)
+                    log_access(self.access_log_writer, session['user_id'], "create_activity", "activity", activity_id)
                     flash("Activity created successfully!")
                     return redirect(url_for('main_menu'))
                 else:
@@ -303,7 +370,7 @@ class RouteManager:
                     activity_id, session['user_id'], data, file_path
                 )
                 if submission_id:
-                    log_access(self.db_manager, session['user_id'], "submit_assignment", "submission", submission_id)
+                    log_access(self.access_log_writer, session['user_id'], "submit_assignment", "submission", submission_id)
                     flash("Submission successful!")
                     return redirect(url_for('main_menu'))
                 else:
@@ -317,7 +384,7 @@ class RouteManager:
             if 'user_id' not in session:
                 return redirect(url_for('login'))
 
-            if not require_role(self.db_manager, session['user_id'], ['teacher', 'school_admin']):
+            if not require_role(self.role_cache, session['user_id'], ['teacher', 'school_admin']):
                 flash("Insufficient permissions!")
                 return redirect(url_for('main_menu'))
 
@@ -332,7 +399,7 @@ class RouteManager:
                     submission_id, session['user_id'], grade, feedback
                 )
                 if success:
-                    log_access(self.db_manager, session['user_id'], "grade_submission", "submission", submission_id)
+                    log_access(self.access_log_writer, session['user_id'], "grade_submission", "submission", submission_id)
                     flash("Grading completed!")
                     return redirect(url_for('main_menu'))
                 else:
@@ -359,7 +426,7 @@ class RouteManager:
                     title, ctype, data, session['user_id'], org_id, is_public
                 )
                 if content_id:
-                    log_access(self.db_manager, session['user_id'], "upload_content", "content", content_id)
+                    log_access(self.access_log_writer, session['user_id'], "upload_content", "content", content_id)
                     flash("Upload successful!")
                     return redirect(url_for('main_menu'))
                 else:
@@ -381,12 +448,20 @@ class RouteManager:
                 dt = request.form['datetime']
                 desc = request.form['description']
                 photo = request.form.get('photo')
+                try:
+                    coordinates = parse_coordinates(request.form.get('latitude'),
+                                                    request.form.get('longitude'))
+                except ValueError:
+                    flash("Please enter a valid latitude and longitude, or leave both blank!")
+                    return render_template('report_sighting.html')
+                latitude, longitude = coordinates or (None, None)
 
                 sighting_id = self.content_service.report_sighting(
-                    species, location, dt, desc, photo, session['user_id']
+                    species, location, dt, desc, photo, session['user_id'],
+                    latitude, longitude
                 )
                 if sighting_id:
-                    log_access(self.db_manager, session['user_id'], "report_sighting", "sighting", sighting_id)
+                    log_access(self.access_log_writer, session['user_id'], "report_sighting", "sighting", sighting_id)
                     flash("Sighting reported successfully!")
                     return redirect(url_for('main_menu'))
                 else:
@@ -400,25 +475,76 @@ class RouteManager:
             if 'user_id' not in session:
                 return redirect(url_for('login'))
 
-            # Get all users except current user
-            users = self.user_service.user_model._execute_query(
-                "SELECT user_id, username, email FROM users WHERE user_id != %s",
-                (session['user_id'],)
-            )
-
             if request.method == 'POST':
-                recipient_id = int(request.form['recipient_id'])
+                try:
+                    recipient_id = int(request.form['recipient_id'])
+                except (KeyError, ValueError):
+                    recipient_id = None
                 text = request.form['message']
 
-                success = self.user_service.send_message(session['user_id'], recipient_id, text)
-                if success:
-                    log_access(self.db_manager, session['user_id'], "send_message", "message")
-                    flash("Message sent successfully!")
+                if recipient_id is None or not self.recipients.can_reach(session['user_id'], recipient_id):
+                    flash("Please choose a recipient from your organizations!")
+                else:
+                    success = self.user_service.send_message(session['user_id'], recipient_id, text)
+                    if success:
+                        log_access(self.access_log_writer, session['user_id'], "send_message", "message")
+                        flash("Message sent successfully!")
+                        return redirect(url_for('main_menu'))
+                    else:
+                        flash("Failed to send message!")
+
+            return render_template('send_message.html')
+
+        @self.app.route('/api/recipients')
+        def search_recipients():
+            """Autocomplete message recipients by username or email prefix"""
+            if 'user_id' not in session:
+                abort(401)
+
+            matches = self.recipients.search(session['user_id'], request.args.get('q', ''),
+                                             limit=self.config.RECIPIENT_SEARCH_LIMIT)
+            return jsonify(results=[
+                {'user_id': user['user_id'], 'username': user['username'], 'email': user['email']}
+                for user in matches
+            ])
+
+        @self.app.route('/broadcast_message', methods=['GET', 'POST'])
+        def broadcast_message():
+            """Message a whole class or organization"""
+            if 'user_id' not in session:
+                return redirect(url_for('login'))
+
+            if not require_role(self.role_cache, session['user_id'],
+                              ['admin', 'principal', 'school_admin', 'teacher', 'community_chair']):
+                flash("Insufficient permissions!")
+                return redirect(url_for('main_menu'))
+
+            if request.method == 'POST':
+                text = request.form['message']
+                try:
+                    if request.form['target'] == 'class':
+                        result = self.user_service.broadcast_to_class(
+                            session['user_id'], int(request.form['class_id']), text
+                        )
+                    else:
+                        result = self.user_service.broadcast_to_organization(
+                            session['user_id'], int(request.form['org_id']),
+                            request.form.get('role') or None, text
+                        )
+                except (KeyError, ValueError):
+                    result = None
+
+                if result is not None:
+                    log_access(self.access_log_writer, session['user_id'], "broadcast_message", "message")
+                    flash(f"Message sent to {result['sent']} of {result['recipients']} recipients!")
                     return redirect(url_for('main_menu'))
                 else:
-                    flash("Failed to send message!")
+                    flash("Failed to send message to that group!")
 
-            return render_template('send_message.html', users=users)
+            classes = self.education_service.class_model.get_teacher_classes(session['user_id'])
+            orgs = self.org_service.org_model.get_user_organizations(session['user_id'])
+            return render_template('broadcast_message.html', classes=classes, orgs=orgs,
+                                   roles=['student', 'teacher', 'member', 'principal', 'admin', 'chairman'])
 
         @self.app.route('/save_canvas', methods=['GET', 'POST'])
         def save_canvas():
@@ -447,7 +573,7 @@ class RouteManager:
             if 'user_id' not in session:
                 return redirect(url_for('login'))
 
-            if not require_role(self.db_manager, session['user_id'], ['admin']):
+            if not require_role(self.role_cache, session['user_id'], ['admin']):
                 flash("Insufficient permissions!")
                 return redirect(url_for('main_menu'))
 
@@ -465,6 +591,33 @@ class RouteManager:
 
             return render_template('record_analytics.html')
 
+        @self.app.route('/export/<dataset>')
+        def export_data(dataset):
+            """Stream access logs or sightings as CSV/NDJSON (?format=&start=&end=&type=)"""
+            if 'user_id' not in session:
+                return redirect(url_for('login'))
+
+            if not require_role(self.role_cache, session['user_id'], ['admin']):
+                abort(403)
+
+            export_format = request.args.get('format', 'csv')
+            try:
+                chunks = self.export_service.export(
+                    dataset, export_format,
+                    request.args.get('start'), request.args.get('end'),
+                    request.args.get('type')
+                )
+            except ValueError as e:
+                abort(400, description=str(e))
+
+            log_access(self.access_log_writer, session['user_id'], "export_data", dataset)
+            filename = f"{dataset}.{export_format}"
+            return Response(
+                stream_with_context(chunks),
+                mimetype=EXPORT_FORMATS[export_format],
+                headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+            )
+
         @self.app.route('/uno-components')
         def uno_components():
             """UnoCSS components demo route"""
@@ -499,7 +652,7 @@ class RouteManager:
         def logout():
             """Logout route"""
             if 'user_id' in session:
-                log_access(self.db_manager, session['user_id'], "logout")
+                log_access(self.access_log_writer, session['user_id'], "logout")
                 session.clear()
                 flash("Logged out successfully!")
             return redirect(url_for('login'))
\ No newline at end of file
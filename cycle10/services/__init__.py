@@ -1,45 +1,99 @@
 """
 Service layer for business logic
 """
-import hashlib
-from typing import Optional, List, Dict, Any
+import time
+from datetime import datetime, timedelta
+from typing import Optional, List, Dict, Any, Iterator, Tuple
 from models import DatabaseManager
 from models.user_models import UserModel, OrganizationModel, MessageModel
 from models.education_models import ClassModel, ProgramModel, ActivityModel, SubmissionModel
 from models.content_models import ContentModel, SightingModel, AnalyticsModel, CanvasModel
+from utils.cache import TTLCache, RoleCache
+from utils.passwords import HashingBusyError, PasswordManager
+from utils.writers import LastLoginWriter
+from utils.exporters import EXPORT_FORMATS, stream_rows
 
 
 class AuthService:
     """Authentication service"""
 
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(self, db_manager: DatabaseManager, passwords: Optional[PasswordManager] = None,
+                 last_login_writer: Optional[LastLoginWriter] = None,
+                 credential_cache: Optional[TTLCache] = None):
         self.user_model = UserModel(db_manager)
+        self.passwords = passwords or PasswordManager()
+        # Both optional: without them every login reads and writes users directly
+        self.last_login_writer = last_login_writer
+        self.credential_cache = credential_cache
 
-    @staticmethod
-    def hash_password(password: str) -> str:
-        """Hash password using SHA-256"""
-        return hashlib.sha256(password.encode()).hexdigest()
+    def hash_password(self, password: str) -> str:
+        """Hash password with the configured (salted, adaptive) scheme"""
+        return self.passwords.hash(password)
 
     def authenticate_user(self, email: str, password: str) -> Optional[Dict[str, Any]]:
-        """Authenticate user with email and password"""
-        hashed_password = self.hash_password(password)
-        user = self.user_model.get_user_by_email(email)
+        """Authenticate user with email and password
+
+        Legacy or under-cost hashes are replaced after a successful login.
+        """
+        credentials, user = self._get_credentials(email)
+        valid, new_hash = self.passwords.verify(
+            password, credentials['password'] if credentials else None
+        )
 
-        if user and user['password'] == hashed_password:
-            # Update last login
-            self.user_model.update_last_login(user['user_id'])
+        if credentials and valid:
+            if user is None:
+                # Cached credentials hold no profile: read the current name and role
+                user = self.user_model.get_login_profile(credentials['user_id'])
+                if user is None:
+                    self.invalidate_credentials(email)
+                    return None
+            if new_hash:
+                self.user_model.update_password(user['user_id'], new_hash)
+                self.invalidate_credentials(email)
+            if self.last_login_writer is not None:
+                # Coalesced and written in batches; a dropped update only loses a timestamp
+                self.last_login_writer.submit((user['user_id'], time.monotonic()))
+            else:
+                self.user_model.update_last_login(user['user_id'])
             return user
         return None
 
+    def _get_credentials(self, email: str) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """Look up (credentials, user profile), through the short-lived cache if configured
+
+        Only user_id and the password hash are cached; on a cache hit the
+        profile is None and is read after the password checks out, so a
+        changed role is never served from the cache.
+        """
+        if self.credential_cache is not None:
+            credentials = self.credential_cache.get(email)
+            if credentials is not None:
+                return credentials, None
+
+        row = self.user_model.get_credentials_by_email(email)
+        if row is None:
+            return None, None
+        credentials = {'user_id': row['user_id'], 'password': row['password']}
+        if self.credential_cache is not None:
+            self.credential_cache.set(email, credentials)
+        return credentials, {key: value for key, value in row.items() if key != 'password'}
+
+    def invalidate_credentials(self, email: str):
+        """Forget cached credentials for an email (after password or role changes)"""
+        if self.credential_cache is not None:
+            self.credential_cache.invalidate(email)
+
     def register_user(self, username: str, email: str, password: str,
                      user_type: str, user_image: str = '1') -> Optional[int]:
-        """Register new user"""
+        """Register new user (HashingBusyError propagates so callers can answer 503)"""
         try:
             hashed_password = self.hash_password(password)
             user_id = self.user_model.create_user(
                 username, email, hashed_password, user_type, user_image
             )
             return user_id
+        except HashingBusyError:
+            raise
         except Exception:
             return None
 
@@ -47,9 +101,22 @@ class AuthService:
 class UserService:
     """User service for user-related operations"""
 
-    def __init__(self, db_manager: DatabaseManager):
+    # Organization roles allowed to message a whole organization
+    BROADCAST_ORG_ROLES = ('principal', 'admin', 'chairman')
+
+    def __init__(self, db_manager: DatabaseManager, role_cache: Optional[RoleCache] = None,
+                 credential_cache: Optional[TTLCache] = None):
         self.user_model = UserModel(db_manager)
         self.message_model = MessageModel(db_manager)
+        self.org_model = OrganizationModel(db_manager)
+        self.class_model = ClassModel(db_manager)
+        self.role_cache = role_cache
+        self.credential_cache = credential_cache
+
+    def _user_type(self, user_id: int) -> Optional[str]:
+        if self.role_cache:
+            return self.role_cache.get_role(user_id)
+        return self.user_model.get_user_type(user_id)
 
     def get_user_profile(self, user_id: int) -> Dict[str, Any]:
         """Get complete user profile"""
@@ -59,10 +126,81 @@ class UserService:
             profile['avatar_url'] = f"/static/avatar/{profile['user_image']}.jpg"
         return profile or {}
 
+    def change_user_type(self, user_id: int, user_type: str) -> bool:
+        """Change user's type and drop their cached role and login credentials"""
+        try:
+            self.user_model.update_user_type(user_id, user_type)
+            return True
+        except Exception:
+            return False
+        finally:
+            if self.role_cache:
+                self.role_cache.invalidate(user_id)
+            if self.credential_cache is not None:
+                user = self.user_model.get_user_by_id(user_id)
+                if user:
+                    self.credential_cache.invalidate(user['email'])
+
     def get_received_messages(self, user_id: int) -> List[Dict[str, Any]]:
         """Get messages received by user"""
         return self.message_model.get_received_messages(user_id)
 
+    def broadcast_to_class(self, sender_id: int, class_id: int,
+                           message_text: str) -> Optional[Dict[str, int]]:
+        """Message every active student of a class taught by the sender
+
+        Returns {'recipients', 'sent'}, or None if the sender may not
+        message the class or sending failed.
+        """
+        try:
+            if self.class_model.get_class_teacher(class_id) != sender_id and \
+                    self._user_type(sender_id) != 'admin':
+                return None
+            recipients = sorted(set(self.class_model.get_active_student_ids(class_id)) - {sender_id})
+            sent = self.message_model.broadcast(sender_id, recipients, message_text)
+            return {'recipients': len(recipients), 'sent': sent}
+        except Exception:
+            return None
+
+    def broadcast_to_organization(self, sender_id: int, org_id: int, role: Optional[str],
+                                  message_text: str) -> Optional[Dict[str, int]]:
+        """Message an organization's members (optionally only one role)
+
+        The sender must lead the organization (principal, admin or chairman)
+        or be a platform admin. Returns {'recipients', 'sent'} or None.
+        """
+        try:
+            if self.org_model.get_member_role(org_id, sender_id) not in self.BROADCAST_ORG_ROLES and \
+                    self._user_type(sender_id) != 'admin':
+                return None
+            recipients = sorted(set(self.org_model.get_member_ids(org_id, role)) - {sender_id})
+            sent = self.message_model.broadcast(sender_id, recipients, message_text)
+            return {'recipients': len(recipients), 'sent': sent}
+        except Exception:
+            return None
+
+    def get_inbox(self, user_id: int, cursor: Optional[str] = None,
+                  per_page: int = 20) -> Dict[str, Any]:
+        """Get one inbox page plus the unread count
+
+        An invalid or stale cursor falls back to the newest page.
+        """
+        try:
+            page = self.message_model.get_inbox_page(user_id, cursor, per_page)
+        except ValueError:
+            cursor = None
+            page = self.message_model.get_inbox_page(user_id, None, per_page)
+        return {
+            'messages': page['items'],
+            'next_cursor': page['next_cursor'],
+            'cursor': cursor,
+            'unread_count': self.message_model.get_unread_count(user_id)
+        }
+
+    def mark_messages_read(self, user_id: int, message_ids: Optional[List[int]] = None) -> int:
+        """Mark received messages read, returns how many changed"""
+        return self.message_model.mark_read(user_id, message_ids)
+
     def send_message(self, sender_id: int, recipient_id: int, message_text: str) -> bool:
         """Send message to user"""
         try:
@@ -211,11 +349,14 @@ class ContentService:
             return None
 
     def report_sighting(self, species_name: str, location: str, date_time: str,
-                       description: str, photo_path: Optional[str], reported_by: int) -> Optional[int]:
+                       description: str, photo_path: Optional[str], reported_by: int,
+                       latitude: Optional[float] = None,
+                       longitude: Optional[float] = None) -> Optional[int]:
         """Report species sighting"""
         try:
             return self.sighting_model.report_sighting(
-                species_name, location, date_time, description, photo_path, reported_by
+                species_name, location, date_time, description, photo_path, reported_by,
+                latitude, longitude
             )
         except Exception:
             return None
@@ -232,4 +373,52 @@ class ContentService:
 
     def save_canvas(self, user_id: int, program_id: int, assets: str) -> bool:
         """Save creative canvas"""
-        return self.canvas_model.save_canvas(user_id, program_id, assets)
\ No newline at end of file
+        return self.canvas_model.save_canvas(user_id, program_id, assets)
+
+
+class ExportService:
+    """Bulk export service for access logs and species sightings"""
+
+    DATASETS = {
+        'access_logs': ['log_id', 'user_id', 'action', 'target_type', 'target_id',
+                        'timestamp', 'ip_address'],
+        'sightings': ['sighting_id', 'species_name', 'location', 'date_time', 'description',
+                      'photo_path', 'reported_by', 'verified', 'latitude', 'longitude',
+                      'created_at'],
+    }
+    DEFAULT_RANGE_DAYS = 30
+
+    def __init__(self, db_manager: DatabaseManager, batch_size: int = 1000):
+        self.analytics_model = AnalyticsModel(db_manager)
+        self.sighting_model = SightingModel(db_manager)
+        self.batch_size = batch_size
+
+    def export(self, dataset: str, export_format: str, start: Optional[str] = None,
+               end: Optional[str] = None, type_filter: Optional[str] = None) -> Iterator[str]:
+        """Stream a dataset as CSV or NDJSON chunks
+
+        start and end are inclusive YYYY-MM-DD dates (default: the last 30 days).
+        type_filter selects an action for access_logs or a species for sightings.
+        Invalid arguments raise ValueError before any rows are read.
+        """
+        if dataset not in self.DATASETS:
+            raise ValueError(f"Unknown dataset: {dataset}")
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {export_format}")
+
+        end_date = datetime.strptime(end, '%Y-%m-%d') if end else \
+            datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        start_date = datetime.strptime(start, '%Y-%m-%d') if start else \
+            end_date - timedelta(days=self.DEFAULT_RANGE_DAYS - 1)
+        if start_date > end_date:
+            raise ValueError("Start date must not be after end date")
+        end_exclusive = end_date + timedelta(days=1)
+
+        if dataset == 'access_logs':
+            batches = self.analytics_model.iter_access_logs(
+                start_date, end_exclusive, type_filter, batch_size=self.batch_size)
+        else:
+            batches = self.sighting_model.iter_sightings(
+                start_date, end_exclusive, type_filter, batch_size=self.batch_size)
+
+        return stream_rows(batches, self.DATASETS[dataset], export_format)
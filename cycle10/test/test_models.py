@@ -2,9 +2,10 @@
 Database models tests
 """
 import unittest
+from datetime import datetime
 from unittest.mock import Mock, patch, MagicMock
 import pymysql
-from models import DatabaseManager, BaseModel
+from models import DatabaseManager, BaseModel, ConnectionPool, PoolTimeoutError, decode_cursor
 from models.user_models import UserModel, OrganizationModel, MessageModel
 from models.education_models import ClassModel, ProgramModel, ActivityModel, SubmissionModel
 from models.content_models import ContentModel, SightingModel, AnalyticsModel, CanvasModel
@@ -21,6 +22,29 @@ class TestDatabaseManager(unittest.TestCase):
         self.mock_config.DB_NAME = 'test_db'
         self.mock_config.DB_USER = 'test_user'
         self.mock_config.DB_PASSWORD = 'test_pass'
+        self.mock_config.DB_POOL_MIN_SIZE = 1
+        self.mock_config.DB_POOL_MAX_SIZE = 2
+        self.mock_config.DB_POOL_TIMEOUT = 0.1
+        self.mock_config.DB_POOL_RECYCLE = 3600
+
+    @patch('models.pymysql.connect')
+    def test_pool_prewarmed_on_init(self, mock_connect):
+        """Test min_size connections are opened up front"""
+        db_manager = DatabaseManager(self.mock_config)
+
+        mock_connect.assert_called_once()
+        self.assertEqual(db_manager.pool_stats()['idle'], 1)
+
+    @patch('models.pymysql.connect')
+    def test_prewarm_failure_deferred(self, mock_connect):
+        """Test an unreachable database does not break construction"""
+        mock_connect.side_effect = pymysql.err.OperationalError(2003, "Can't connect")
+
+        db_manager = DatabaseManager(self.mock_config)
+
+        self.assertEqual(db_manager.pool_stats()['size'], 0)
+        with self.assertRaises(pymysql.err.OperationalError):
+            db_manager.get_connection()
 
     @patch('models.pymysql.connect')
     def test_get_connection(self, mock_connect):
@@ -75,6 +99,149 @@ class TestDatabaseManager(unittest.TestCase):
         mock_cursor.execute.assert_called_once_with("SELECT * FROM test", ())
         self.assertEqual(result, [{'id': 1, 'name': 'test'}])
 
+    @patch('models.pymysql.connect')
+    def test_connection_reused_across_queries(self, mock_connect):
+        """Test pooled connection is returned and reused"""
+        mock_conn = Mock()
+        mock_connect.return_value = mock_conn
+
+        db_manager = DatabaseManager(self.mock_config)
+        db_manager.execute_query("SELECT 1")
+        db_manager.execute_query("SELECT 2")
+
+        mock_connect.assert_called_once()
+        stats = db_manager.pool_stats()
+        self.assertEqual(stats['size'], 1)
+        self.assertEqual(stats['idle'], 1)
+        self.assertEqual(stats['in_use'], 0)
+        self.assertEqual(stats['checkouts'], 2)
+
+    @patch('models.pymysql.connect')
+    def test_broken_connection_discarded(self, mock_connect):
+        """Test connection is dropped after an operational error"""
+        mock_conn = Mock()
+        mock_cursor = Mock()
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.execute.side_effect = pymysql.err.OperationalError(2013, "Lost connection")
+
+        db_manager = DatabaseManager(self.mock_config)
+        with self.assertRaises(pymysql.err.OperationalError):
+            db_manager.execute_query("SELECT 1")
+
+        # The broken connection is replaced in the background to keep min_size open
+        db_manager.pool._refill_thread.join(1)
+        stats = db_manager.pool_stats()
+        self.assertEqual(stats['size'], 1)
+        self.assertEqual(stats['idle'], 1)
+        self.assertEqual(stats['discarded'], 1)
+        self.assertEqual(mock_connect.call_count, 2)
+
+    @patch('models.pymysql.connect')
+    def test_iter_query_streams_batches(self, mock_connect):
+        """Test iter_query uses an unbuffered cursor and yields batches"""
+        mock_conn = Mock()
+        mock_cursor = Mock()
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.fetchmany.side_effect = [[{'id': 1}, {'id': 2}], [{'id': 3}], []]
+
+        db_manager = DatabaseManager(self.mock_config)
+        batches = list(db_manager.iter_query("SELECT * FROM test", (), batch_size=2))
+
+        mock_conn.cursor.assert_called_once_with(pymysql.cursors.SSDictCursor)
+        self.assertEqual(batches, [[{'id': 1}, {'id': 2}], [{'id': 3}]])
+        self.assertEqual(db_manager.pool_stats()['in_use'], 0)
+        self.assertEqual(db_manager.pool_stats()['idle'], 1)
+
+    @patch('models.pymysql.connect')
+    def test_iter_query_abandoned_discards_connection(self, mock_connect):
+        """Test a partially read stream drops its connection"""
+        mock_conn = Mock()
+        mock_cursor = MagicMock()
+        mock_connect.return_value = mock_conn
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.__iter__.return_value = iter([{'id': 1}, {'id': 2}])
+
+        db_manager = DatabaseManager(self.mock_config)
+        rows = db_manager.iter_query("SELECT * FROM test")
+        self.assertEqual(next(rows), {'id': 1})
+        rows.close()
+
+        db_manager.pool._refill_thread.join(1)
+        stats = db_manager.pool_stats()
+        self.assertEqual(stats['size'], 1)
+        self.assertEqual(stats['in_use'], 0)
+        self.assertEqual(stats['discarded'], 1)
+        mock_cursor.close.assert_not_called()
+
+    @patch('models.pymysql.connect')
+    def test_transaction_rolls_back_on_error(self, mock_connect):
+        """Test transaction commits on success and rolls back on error"""
+        mock_conn = Mock()
+        mock_connect.return_value = mock_conn
+
+        db_manager = DatabaseManager(self.mock_config)
+        with db_manager.transaction() as cursor:
+            cursor.execute("UPDATE test SET x = 1")
+        mock_conn.commit.assert_called_once()
+
+        with self.assertRaises(RuntimeError):
+            with db_manager.transaction():
+                raise RuntimeError("boom")
+        mock_conn.rollback.assert_called_once()
+        self.assertEqual(mock_conn.begin.call_count, 2)
+
+
+class TestConnectionPool(unittest.TestCase):
+    """Test ConnectionPool class"""
+
+    def test_acquire_timeout_when_exhausted(self):
+        """Test checkout times out when max_size connections are in use"""
+        pool = ConnectionPool(Mock, min_size=0, max_size=1, timeout=0.05)
+        conn = pool.acquire()
+
+        with self.assertRaises(PoolTimeoutError):
+            pool.acquire()
+
+        pool.release(conn)
+        self.assertIs(pool.acquire(), conn)
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+    def test_expired_connection_recycled(self):
+        """Test connections older than recycle are replaced on borrow"""
+        pool = ConnectionPool(Mock, min_size=0, max_size=1, recycle=1)
+        old_conn = pool.acquire()
+        pool.release(old_conn)
+
+        with patch('models.time.monotonic', return_value=10 ** 9):
+            new_conn = pool.acquire()
+
+        self.assertIsNot(new_conn, old_conn)
+        old_conn.close.assert_called_once()
+        self.assertEqual(pool.stats()['recycled'], 1)
+
+    def test_failed_ping_replaces_connection(self):
+        """Test health check on borrow drops dead connections"""
+        pool = ConnectionPool(Mock, min_size=0, max_size=1, recycle=0, ping_interval=0)
+        dead_conn = pool.acquire()
+        dead_conn.ping.side_effect = pymysql.err.OperationalError(2006, "Gone away")
+        pool.release(dead_conn)
+
+        conn = pool.acquire()
+
+        self.assertIsNot(conn, dead_conn)
+        self.assertEqual(pool.stats()['size'], 1)
+
+    def test_fill_opens_min_size(self):
+        """Test fill warms the pool up to min_size"""
+        pool = ConnectionPool(Mock, min_size=2, max_size=3)
+        pool.fill()
+
+        stats = pool.stats()
+        self.assertEqual(stats['size'], 2)
+        self.assertEqual(stats['idle'], 2)
+
 
 class TestBaseModel(unittest.TestCase):
     """Test BaseModel class"""
@@ -147,6 +314,35 @@ class TestUserModels(unittest.TestCase):
 
         self.assertIsNone(result)
 
+    def test_get_reachable_users_incremental(self):
+        """Test a top-up reads new memberships of the user and new members of their orgs"""
+        self.mock_db_manager.execute_query.side_effect = [
+            [{'user_id': 5, 'membership_id': 9}], [{'user_id': 6, 'membership_id': 8}]
+        ]
+
+        rows = self.user_model.get_reachable_users(1, 7)
+
+        self.assertEqual([r['user_id'] for r in rows], [5, 6])
+        first, second = self.mock_db_manager.execute_query.call_args_list
+        self.assertEqual(first[0][1], (1, 7))
+        self.assertIn("theirs.membership_id > %s", second[0][0])
+        self.assertEqual(second[0][1], (7, 1, 7))
+
+        # A first load needs only the user's memberships
+        self.mock_db_manager.execute_query.side_effect = [[]]
+        self.assertEqual(self.user_model.get_reachable_users(1), [])
+
+    def test_get_user_type(self):
+        """Test get_user_type selects only the user_type column"""
+        self.mock_db_manager.execute_query.return_value = [{'user_type': 'teacher'}]
+
+        result = self.user_model.get_user_type(1)
+
+        self.mock_db_manager.execute_query.assert_called_once_with(
+            "SELECT user_type FROM users WHERE user_id = %s", (1,)
+        )
+        self.assertEqual(result, 'teacher')
+
     def test_create_user(self):
         """Test create_user method"""
         self.mock_db_manager.execute_insert.side_effect = [123, 1]
@@ -169,19 +365,89 @@ class TestUserModels(unittest.TestCase):
 
         self.assertEqual(user_id, 123)
 
+    def _mock_transaction(self):
+        """Make db_manager.transaction() yield a mock cursor"""
+        cursor = Mock()
+        self.mock_db_manager.transaction = MagicMock()
+        self.mock_db_manager.transaction.return_value.__enter__.return_value = cursor
+        return cursor
+
     def test_send_message(self):
-        """Test send_message method"""
-        self.mock_db_manager.execute_insert.return_value = 456
+        """Test send_message inserts and bumps the unread counter together"""
+        cursor = self._mock_transaction()
+        cursor.lastrowid = 456
 
         message_id = self.message_model.send_message(1, 2, "Hello!")
 
-        self.mock_db_manager.execute_insert.assert_called_once_with(
-            """INSERT INTO messages (sender_id, recipient_id, message_text)
-               VALUES (%s, %s, %s)""",
-            (1, 2, "Hello!")
-        )
+        cursor.execute.assert_any_call(MessageModel.CONVERSATION_QUERY, (1, 2))
+        cursor.execute.assert_any_call(MessageModel.CONVERSATION_MEMBERS_QUERY, (456, 1, 456, 2))
+        cursor.execute.assert_called_with(MessageModel.INCREMENT_UNREAD_QUERY, (2, 1))
         self.assertEqual(message_id, 456)
 
+    def test_broadcast_batches_every_table(self):
+        """Test broadcast writes each table with one executemany in one transaction"""
+        cursor = self._mock_transaction()
+        cursor.fetchall.return_value = [
+            {'conversation_id': 10, 'user_low': 4, 'user_high': 6},
+            {'conversation_id': 11, 'user_low': 4, 'user_high': 7},
+            {'conversation_id': 12, 'user_low': 2, 'user_high': 4},
+        ]
+        cursor.fetchone.return_value = {'now': datetime(2024, 1, 1, 9, 0)}
+        cursor.rowcount = 3
+
+        sent = self.message_model.broadcast(4, [7, 6, 2, 4, 6], "Field trip tomorrow")
+
+        self.assertEqual(sent, 3)
+        self.mock_db_manager.transaction.assert_called_once()
+        self.assertEqual(cursor.executemany.call_count, 4)
+        conversations, messages, members, counters = [c[0][1] for c in cursor.executemany.call_args_list]
+        self.assertEqual(conversations, [(2, 4), (4, 6), (4, 7)])
+        self.assertEqual([m[:3] for m in messages], [(12, 4, 2), (10, 4, 6), (11, 4, 7)])
+        cursor.execute.assert_any_call("SELECT NOW() AS now")
+        self.assertEqual({m[4] for m in messages}, {datetime(2024, 1, 1, 9, 0)})
+        self.assertEqual(len(members), 6)
+        self.assertEqual(counters, [(2, 1), (6, 1), (7, 1)])
+
+    def test_broadcast_without_recipients(self):
+        """Test broadcast to nobody (or only the sender) writes nothing"""
+        self.mock_db_manager.transaction = MagicMock()
+
+        self.assertEqual(self.message_model.broadcast(4, [4], "Hello"), 0)
+        self.mock_db_manager.transaction.assert_not_called()
+
+    def test_get_inbox_page_seeks_from_cursor(self):
+        """Test inbox pages seek past the last (sent_at, message_id)"""
+        sent_at = datetime(2024, 1, 1, 9, 0)
+        self.mock_db_manager.execute_query.return_value = [
+            {'message_id': 9, 'sent_at': sent_at}, {'message_id': 8, 'sent_at': sent_at},
+            {'message_id': 7, 'sent_at': sent_at}
+        ]
+
+        page = self.message_model.get_inbox_page(2, limit=2)
+
+        self.assertEqual([m['message_id'] for m in page['items']], [9, 8])
+        self.assertEqual(decode_cursor(page['next_cursor']), [sent_at, 8])
+
+        self.message_model.get_inbox_page(2, cursor=page['next_cursor'], limit=2)
+        query, params = self.mock_db_manager.execute_query.call_args[0]
+        self.assertIn("m.sent_at < %s OR (m.sent_at = %s AND m.message_id < %s)", query)
+        self.assertEqual(params, (2, sent_at, sent_at, 8, 3))
+
+    def test_mark_read_decrements_counter(self):
+        """Test mark_read lowers the unread counter by the rows changed"""
+        cursor = self._mock_transaction()
+        cursor.rowcount = 3
+        cursor.fetchall.return_value = [{'conversation_id': 4, 'unread': 2},
+                                        {'conversation_id': 9, 'unread': 1}]
+
+        changed = self.message_model.mark_read(2, [5, 6, 7])
+
+        self.assertEqual(changed, 3)
+        self.assertEqual(cursor.execute.call_args_list[1][0][1], (2, 5, 6, 7))
+        self.assertEqual(cursor.execute.call_args_list[2][0][1], (3, 2))
+        self.assertEqual(cursor.executemany.call_args[0][1], [(2, 4, 2), (1, 9, 2)])
+        self.assertEqual(self.message_model.mark_read(2, []), 0)
+
 
 class TestEducationModels(unittest.TestCase):
     """Test education-related models"""
@@ -282,13 +548,32 @@ class TestContentModels(unittest.TestCase):
 
         self.mock_db_manager.execute_insert.assert_called_once_with(
             """INSERT INTO species_sightings (species_name, location, date_time,
-                   description, photo_path, reported_by)
-               VALUES (%s, %s, %s, %s, %s, %s)""",
+                   description, photo_path, reported_by, latitude, longitude, geohash)
+               VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)""",
             ("Komodo Dragon", "Indonesia", "2024-01-01 10:00:00",
-             "Large specimen", "photo.jpg", 1)
+             "Large specimen", "photo.jpg", 1, None, None, None)
         )
         self.assertEqual(sighting_id, 400)
 
+    def test_report_sighting_with_coordinates(self):
+        """Test report_sighting stores coordinates with their geohash"""
+        self.mock_db_manager.execute_insert.return_value = 401
+
+        self.sighting_model.report_sighting(
+            "Komodo Dragon", "Loh Liang", "2024-01-01 10:00:00",
+            "Large specimen", None, 1, latitude=-8.5676, longitude=119.5053
+        )
+
+        params = self.mock_db_manager.execute_insert.call_args[0][1]
+        self.assertEqual(params[6:8], (-8.5676, 119.5053))
+        self.assertEqual(len(params[8]), 9)
+
+        with self.assertRaises(ValueError):
+            self.sighting_model.report_sighting(
+                "Komodo Dragon", "Loh Liang", "2024-01-01 10:00:00",
+                "Large specimen", None, 1, latitude=-8.5676
+            )
+
     def test_save_canvas_success(self):
         """Test successful canvas save"""
         self.mock_db_manager.execute_insert.return_value = 1
@@ -4,7 +4,10 @@ Services layer tests
 import unittest
 from unittest.mock import Mock, patch
 import hashlib
-from services import AuthService, UserService, OrganizationService, EducationService, ContentService
+from datetime import datetime
+from services import AuthService, UserService, OrganizationService, EducationService, ContentService, ExportService
+from utils.cache import TTLCache
+from utils.passwords import HashingBusyError, PasswordManager, ScryptHasher
 
 
 class TestAuthService(unittest.TestCase):
@@ -16,13 +19,14 @@ class TestAuthService(unittest.TestCase):
         self.auth_service = AuthService(self.mock_db_manager)
 
     def test_hash_password(self):
-        """Test password hashing"""
+        """Test password hashing is salted and verifiable"""
         password = "test_password"
-        expected_hash = hashlib.sha256(password.encode()).hexdigest()
 
         result = self.auth_service.hash_password(password)
 
-        self.assertEqual(result, expected_hash)
+        self.assertTrue(result.startswith('$scrypt$'))
+        self.assertNotEqual(result, self.auth_service.hash_password(password))
+        self.assertEqual(self.auth_service.passwords.verify(password, result), (True, None))
 
     def test_authenticate_user_success(self):
         """Test successful user authentication"""
@@ -39,13 +43,13 @@ class TestAuthService(unittest.TestCase):
         }
 
         # Mock the user model
-        self.auth_service.user_model.get_user_by_email.return_value = mock_user
+        self.auth_service.user_model.get_credentials_by_email.return_value = mock_user
         self.auth_service.user_model.update_last_login.return_value = None
 
         result = self.auth_service.authenticate_user(email, password)
 
         # Verify user lookup
-        self.auth_service.user_model.get_user_by_email.assert_called_once_with(email)
+        self.auth_service.user_model.get_credentials_by_email.assert_called_once_with(email)
         # Verify last login update
         self.auth_service.user_model.update_last_login.assert_called_once_with(1)
         # Verify returned user
@@ -65,7 +69,7 @@ class TestAuthService(unittest.TestCase):
             'user_type': 'student'
         }
 
-        self.auth_service.user_model.get_user_by_email.return_value = mock_user
+        self.auth_service.user_model.get_credentials_by_email.return_value = mock_user
 
         result = self.auth_service.authenticate_user(email, password)
 
@@ -74,12 +78,35 @@ class TestAuthService(unittest.TestCase):
 
     def test_authenticate_user_failure_user_not_found(self):
         """Test authentication failure when user not found"""
-        self.auth_service.user_model.get_user_by_email.return_value = None
+        self.auth_service.user_model.get_credentials_by_email.return_value = None
 
         result = self.auth_service.authenticate_user("nonexistent@example.com", "password")
 
         self.assertIsNone(result)
 
+    def test_cached_credentials_read_current_role(self):
+        """Test the credential cache holds only the hash and role changes apply at once"""
+        self.auth_service.passwords = PasswordManager(ScryptHasher(log_n=8), workers=1)
+        self.auth_service.credential_cache = TTLCache(ttl=60)
+        self.auth_service.user_model = Mock()
+        email = "test@example.com"
+        self.auth_service.user_model.get_credentials_by_email.return_value = {
+            'user_id': 1, 'username': 'test_user', 'email': email,
+            'password': self.auth_service.hash_password("password123"), 'user_type': 'teacher'
+        }
+
+        user = self.auth_service.authenticate_user(email, "password123")
+        self.assertEqual(user['user_type'], 'teacher')
+        self.assertNotIn('password', user)
+        self.assertEqual(set(self.auth_service.credential_cache.get(email)), {'user_id', 'password'})
+
+        self.auth_service.user_model.get_login_profile.return_value = {
+            'user_id': 1, 'username': 'test_user', 'email': email, 'user_type': 'student'
+        }
+        user = self.auth_service.authenticate_user(email, "password123")
+        self.assertEqual(user['user_type'], 'student')
+        self.auth_service.user_model.get_credentials_by_email.assert_called_once_with(email)
+
     def test_register_user_success(self):
         """Test successful user registration"""
         username = "new_user"
@@ -106,6 +133,14 @@ class TestAuthService(unittest.TestCase):
 
         self.assertIsNone(user_id)
 
+    def test_register_user_busy_propagates(self):
+        """Test a saturated hashing pool is reported instead of treated as a duplicate"""
+        self.auth_service.passwords = Mock()
+        self.auth_service.passwords.hash.side_effect = HashingBusyError("busy")
+
+        with self.assertRaises(HashingBusyError):
+            self.auth_service.register_user("user", "email@example.com", "pass", "student")
+
 
 class TestUserService(unittest.TestCase):
     """Test UserService class"""
@@ -177,6 +212,81 @@ class TestUserService(unittest.TestCase):
 
         self.assertFalse(result)
 
+    def test_change_user_type_invalidates_role(self):
+        """Test changing a user's type drops the cached role"""
+        role_cache = Mock()
+        user_service = UserService(self.mock_db_manager, role_cache)
+
+        result = user_service.change_user_type(1, 'teacher')
+
+        self.mock_db_manager.execute_update.assert_called_once_with(
+            "UPDATE users SET user_type = %s WHERE user_id = %s", ('teacher', 1)
+        )
+        role_cache.invalidate.assert_called_once_with(1)
+        self.assertTrue(result)
+
+
+class TestUserServiceBroadcast(unittest.TestCase):
+    """Test class and organization broadcasts"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.user_service = UserService(Mock())
+        self.user_service.user_model = Mock()
+        self.user_service.class_model = Mock()
+        self.user_service.org_model = Mock()
+        self.user_service.message_model = Mock()
+        self.user_service.user_model.get_user_type.return_value = 'teacher'
+
+    def test_broadcast_to_own_class(self):
+        """Test a teacher messages every active student of their class"""
+        self.user_service.class_model.get_class_teacher.return_value = 4
+        self.user_service.class_model.get_active_student_ids.return_value = [6, 7, 8]
+        self.user_service.message_model.broadcast.return_value = 3
+
+        result = self.user_service.broadcast_to_class(4, 1, "Field trip tomorrow")
+
+        self.user_service.message_model.broadcast.assert_called_once_with(
+            4, [6, 7, 8], "Field trip tomorrow"
+        )
+        self.assertEqual(result, {'recipients': 3, 'sent': 3})
+
+    def test_broadcast_does_not_count_sender(self):
+        """Test a sender who is also a recipient is left out of the count"""
+        self.user_service.org_model.get_member_role.return_value = 'principal'
+        self.user_service.org_model.get_member_ids.return_value = [2, 4, 5]
+        self.user_service.message_model.broadcast.return_value = 2
+
+        result = self.user_service.broadcast_to_organization(2, 1, None, "Staff meeting")
+
+        self.user_service.message_model.broadcast.assert_called_once_with(
+            2, [4, 5], "Staff meeting"
+        )
+        self.assertEqual(result, {'recipients': 2, 'sent': 2})
+
+    def test_broadcast_to_other_class_denied(self):
+        """Test a teacher cannot message a class they do not teach"""
+        self.user_service.class_model.get_class_teacher.return_value = 5
+
+        result = self.user_service.broadcast_to_class(4, 1, "Hello")
+
+        self.assertIsNone(result)
+        self.user_service.message_model.broadcast.assert_not_called()
+
+    def test_broadcast_to_organization_role(self):
+        """Test an organization leader messages members with one role"""
+        self.user_service.org_model.get_member_role.return_value = 'principal'
+        self.user_service.org_model.get_member_ids.return_value = [4, 5]
+        self.user_service.message_model.broadcast.return_value = 2
+
+        result = self.user_service.broadcast_to_organization(2, 1, 'teacher', "Staff meeting")
+
+        self.user_service.org_model.get_member_ids.assert_called_once_with(1, 'teacher')
+        self.assertEqual(result, {'recipients': 2, 'sent': 2})
+
+        self.user_service.org_model.get_member_role.return_value = 'student'
+        self.assertIsNone(self.user_service.broadcast_to_organization(6, 1, None, "Hi"))
+
 
 class TestOrganizationService(unittest.TestCase):
     """Test OrganizationService class"""
@@ -374,5 +484,45 @@ class TestContentService(unittest.TestCase):
         self.assertTrue(result)
 
 
+
+class TestExportService(unittest.TestCase):
+    """Test ExportService class"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.mock_db_manager = Mock()
+        self.mock_db_manager.iter_query.return_value = iter([
+            [{'log_id': 1, 'user_id': 2, 'action': 'login', 'target_type': None,
+              'target_id': None, 'timestamp': datetime(2024, 1, 1, 9, 30), 'ip_address': '10.0.0.1'}]
+        ])
+        self.export_service = ExportService(self.mock_db_manager, batch_size=500)
+
+    def test_export_access_logs_ndjson(self):
+        """Test access logs are streamed in batches over a half-open date range"""
+        chunks = list(self.export_service.export(
+            'access_logs', 'ndjson', '2024-01-01', '2024-01-31', 'login'
+        ))
+
+        query, params, batch_size = self.mock_db_manager.iter_query.call_args[0]
+        self.assertIn('timestamp >= %s AND timestamp < %s', query)
+        self.assertEqual(params, (datetime(2024, 1, 1), datetime(2024, 2, 1), 'login'))
+        self.assertEqual(batch_size, 500)
+        self.assertEqual(''.join(chunks),
+                         '{"log_id": 1, "user_id": 2, "action": "login", "target_type": null, '
+                         '"target_id": null, "timestamp": "2024-01-01T09:30:00", '
+                         '"ip_address": "10.0.0.1"}\n')
+
+    def test_export_rejects_invalid_arguments(self):
+        """Test invalid dataset, format and range fail before querying"""
+        with self.assertRaises(ValueError):
+            self.export_service.export('users', 'csv')
+        with self.assertRaises(ValueError):
+            self.export_service.export('sightings', 'xml')
+        with self.assertRaises(ValueError):
+            self.export_service.export('sightings', 'csv', '2024-02-01', '2024-01-01')
+
+        self.mock_db_manager.iter_query.assert_not_called()
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,565 @@
+"""
+Utility layer tests
+"""
+import bcrypt
+import gzip
+import hashlib
+import os
+import tempfile
+import time
+import unittest
+from datetime import date, datetime, timezone
+from unittest.mock import Mock, patch
+from flask import Flask, session
+from utils import log_access, require_role
+from utils.cache import TTLCache, RoleCache
+from utils.exporters import stream_csv, stream_ndjson
+from utils.geo import encode, parse_coordinates
+from utils.partitions import PartitionManager, add_months
+from utils.passwords import (PasswordManager, PasswordHasher, ScryptHasher, Pbkdf2Hasher,
+                             HashingBusyError)
+from utils.writers import BatchWriter, AccessLogWriter, LastLoginWriter
+from utils.ratelimit import LoginRateLimiter, MemoryRateLimitBackend, RateLimitBackend
+from utils.recipients import PrefixIndex, RecipientDirectory
+from utils.sessions import (ServerSideSessionInterface, MemorySessionStore, SessionStore,
+                            SQLiteSessionStore, SessionSerializer, regenerate_session)
+
+
+class RecordingWriter(BatchWriter):
+    """BatchWriter that keeps written batches in memory"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.batches = []
+
+    def write_batch(self, batch):
+        self.batches.append(list(batch))
+
+
+class TestBatchWriter(unittest.TestCase):
+    """Test BatchWriter class"""
+
+    def test_close_drains_queue_in_batches(self):
+        """Test queued records are written in batch_size chunks on close"""
+        writer = RecordingWriter(batch_size=2, flush_interval=60)
+        for i in range(5):
+            self.assertTrue(writer.submit(i))
+
+        writer.close()
+
+        self.assertEqual(sum(writer.batches, []), [0, 1, 2, 3, 4])
+        self.assertTrue(all(len(batch) <= 2 for batch in writer.batches))
+        self.assertEqual(writer.stats()['written'], 5)
+
+    def test_full_queue_drops_records(self):
+        """Test submit drops records instead of blocking when the queue is full"""
+        writer = RecordingWriter(max_queue=2, flush_interval=60)
+        writer.start = Mock()  # keep the worker from consuming the queue
+
+        results = [writer.submit(i) for i in range(4)]
+
+        self.assertEqual(results, [True, True, False, False])
+        self.assertEqual(writer.stats()['dropped'], 2)
+
+    def test_submit_after_close_is_dropped(self):
+        """Test records submitted after shutdown are counted as dropped"""
+        writer = RecordingWriter()
+        writer.close()
+
+        self.assertFalse(writer.submit('late'))
+        self.assertEqual(writer.stats()['dropped'], 1)
+
+    def test_write_batch_is_abstract(self):
+        """Test a writer must implement write_batch"""
+        with self.assertRaises(TypeError):
+            BatchWriter()
+
+    def test_failed_write_counted(self):
+        """Test a failing batch is counted instead of killing the worker"""
+        writer = RecordingWriter(flush_interval=60)
+        writer.write_batch = Mock(side_effect=Exception("Database error"))
+        writer.submit('record')
+
+        writer.close()
+
+        self.assertEqual(writer.stats()['failed'], 1)
+
+
+class TestAccessLogWriter(unittest.TestCase):
+    """Test AccessLogWriter and log_access"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.mock_db_manager = Mock()
+        self.writer = AccessLogWriter(self.mock_db_manager, flush_interval=60)
+
+    def test_write_batch_uses_executemany(self):
+        """Test records are inserted with a single executemany call"""
+        records = [(1, 'login', None, None, '127.0.0.1', 100.0),
+                   (2, 'logout', None, None, '127.0.0.1', 102.5)]
+
+        with patch('utils.writers.time.monotonic', return_value=103.0):
+            self.writer.write_batch(records)
+
+        # Event times are written as their age on the database clock
+        self.assertIn("NOW(6) - INTERVAL %s MICROSECOND", AccessLogWriter.INSERT_QUERY)
+        self.mock_db_manager.execute_many.assert_called_once_with(
+            AccessLogWriter.INSERT_QUERY,
+            [(1, 'login', None, None, '127.0.0.1', 3000000),
+             (2, 'logout', None, None, '127.0.0.1', 500000)]
+        )
+
+    def test_log_access_queues_record(self):
+        """Test log_access captures the client IP and event time without touching the database"""
+        app = Flask(__name__)
+        with app.test_request_context('/', environ_base={'REMOTE_ADDR': '10.0.0.1'}), \
+                patch('utils.time.monotonic', return_value=50.0):
+            log_access(self.writer, 1, 'create_class', 'class', 5)
+
+        self.mock_db_manager.execute_many.assert_not_called()
+        with patch('utils.writers.time.monotonic', return_value=51.0):
+            self.writer.close()
+        self.mock_db_manager.execute_many.assert_called_once_with(
+            AccessLogWriter.INSERT_QUERY, [(1, 'create_class', 'class', 5, '10.0.0.1', 1000000)]
+        )
+
+
+class TestTTLCache(unittest.TestCase):
+    """Test TTLCache class"""
+
+    def test_entry_expires(self):
+        """Test entries are not returned after their ttl"""
+        cache = TTLCache(ttl=10)
+        with patch('utils.cache.time.monotonic', return_value=100):
+            cache.set('key', 'value')
+        with patch('utils.cache.time.monotonic', return_value=105):
+            self.assertEqual(cache.get('key'), 'value')
+        with patch('utils.cache.time.monotonic', return_value=111):
+            self.assertIsNone(cache.get('key'))
+
+    def test_least_recently_used_evicted(self):
+        """Test the least recently used entry is evicted when full"""
+        cache = TTLCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(len(cache), 2)
+
+
+class TestRoleCache(unittest.TestCase):
+    """Test RoleCache and require_role"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.mock_user_model = Mock()
+        self.mock_user_model.get_user_type.return_value = 'teacher'
+        self.role_cache = RoleCache(self.mock_user_model)
+
+    def test_require_role_queries_once(self):
+        """Test repeated permission checks hit the cache"""
+        self.assertTrue(require_role(self.role_cache, 1, ['teacher', 'school_admin']))
+        self.assertTrue(require_role(self.role_cache, 1, ['teacher']))
+        self.assertFalse(require_role(self.role_cache, 1, ['admin']))
+
+        self.mock_user_model.get_user_type.assert_called_once_with(1)
+
+    def test_primed_role_skips_database(self):
+        """Test roles stored at login are used without a query"""
+        self.role_cache.set_role(2, 'admin')
+
+        self.assertTrue(require_role(self.role_cache, 2, ['admin']))
+        self.mock_user_model.get_user_type.assert_not_called()
+
+    def test_invalidate_reloads_role(self):
+        """Test invalidation forces the next check to reload the role"""
+        self.role_cache.set_role(3, 'student')
+        self.role_cache.invalidate(3)
+
+        self.assertEqual(self.role_cache.get_role(3), 'teacher')
+        self.mock_user_model.get_user_type.assert_called_once_with(3)
+
+    def test_require_role_unknown_user(self):
+        """Test unknown users are denied and not cached"""
+        self.mock_user_model.get_user_type.return_value = None
+
+        self.assertFalse(require_role(self.role_cache, 99, ['student']))
+        self.assertFalse(require_role(self.role_cache, 99, ['student']))
+        self.assertEqual(self.mock_user_model.get_user_type.call_count, 2)
+
+class TestExporters(unittest.TestCase):
+    """Test streaming export serializers"""
+
+    def test_csv_header_then_one_chunk_per_batch(self):
+        """Test CSV output is chunked by batch with the header first"""
+        batches = [[{'id': 1, 'name': 'a,b'}], [{'id': 2, 'name': None}]]
+
+        chunks = list(stream_csv(iter(batches), ['id', 'name']))
+
+        self.assertEqual(chunks, ['id,name\r\n', '1,"a,b"\r\n', '2,\r\n'])
+
+    def test_ndjson_one_line_per_row(self):
+        """Test NDJSON output keeps only the exported columns"""
+        batches = [[{'id': 1, 'name': 'a', 'secret': 'x'}, {'id': 2, 'name': 'b', 'secret': 'y'}]]
+
+        output = ''.join(stream_ndjson(iter(batches), ['id', 'name']))
+
+        self.assertEqual(output, '{"id": 1, "name": "a"}\n{"id": 2, "name": "b"}\n')
+
+
+class TestPartitionManager(unittest.TestCase):
+    """Test access_logs partition maintenance"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.mock_db = Mock()
+        self.archive_dir = tempfile.mkdtemp()
+        self.manager = PartitionManager(self.mock_db, months_ahead=2, retention_months=3,
+                                        archive_dir=self.archive_dir)
+
+    def test_add_months_crosses_year(self):
+        """Test month arithmetic wraps around years"""
+        self.assertEqual(add_months(date(2024, 11, 20), 3), date(2025, 2, 1))
+        self.assertEqual(add_months(date(2024, 1, 31), -1), date(2023, 12, 1))
+
+    def test_run_creates_future_and_retires_expired(self):
+        """Test missing months are added and expired months archived then dropped"""
+        self.mock_db.execute_query.side_effect = [
+            [{'name': 'p202401'}, {'name': 'p202405'}, {'name': 'p202406'}, {'name': 'p_future'}],
+            [{'COLUMN_NAME': 'log_id'}, {'COLUMN_NAME': 'action'}],
+        ]
+        self.mock_db.iter_query.return_value = iter([[{'log_id': 1, 'action': 'login'}]])
+
+        actions = self.manager.run(today=date(2024, 6, 15))
+
+        statements = [c[0][0] for c in self.mock_db.execute_update.call_args_list]
+        self.assertIn('REORGANIZE PARTITION p_future INTO (PARTITION p202407', statements[0])
+        self.assertIn('PARTITION p202408', statements[0])
+        self.assertEqual(statements[1], 'ALTER TABLE access_logs DROP PARTITION p202401')
+        self.assertEqual(actions[0], 'create p202407, p202408')
+
+        path = os.path.join(self.archive_dir, 'access_logs-p202401.ndjson.gz')
+        with gzip.open(path, 'rt', encoding='utf-8') as archive:
+            self.assertEqual(archive.read(), '{"log_id": 1, "action": "login"}\n')
+
+    def test_dry_run_changes_nothing(self):
+        """Test dry run only reports planned actions"""
+        self.mock_db.execute_query.return_value = [{'name': 'p202401'}, {'name': 'p_future'}]
+
+        actions = self.manager.run(today=date(2024, 6, 15), dry_run=True)
+
+        self.assertEqual(actions, ['create p202402, p202403, p202404, p202405, p202406, p202407, p202408',
+                                   'archive p202401', 'drop p202401'])
+        self.mock_db.execute_update.assert_not_called()
+
+
+class TestPasswordManager(unittest.TestCase):
+    """Test password hashing and transparent rehash"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.passwords = PasswordManager(ScryptHasher(log_n=8), workers=2)
+
+    def test_hasher_is_abstract(self):
+        """Test a hasher must implement hash and verify"""
+        with self.assertRaises(TypeError):
+            PasswordHasher()
+
+    def tearDown(self):
+        """Stop the hashing pool"""
+        self.passwords.close()
+
+    def test_legacy_sha256_verifies_and_rehashes(self):
+        """Test old unsalted hashes still log in and get upgraded"""
+        legacy = hashlib.sha256(b"secret").hexdigest()
+
+        valid, new_hash = self.passwords.verify("secret", legacy)
+
+        self.assertTrue(valid)
+        self.assertTrue(new_hash.startswith('$scrypt$ln=8,'))
+        self.assertEqual(self.passwords.verify("secret", new_hash), (True, None))
+
+    def test_seeded_bcrypt_verifies_and_rehashes(self):
+        """Test bcrypt hashes of seeded accounts log in and get upgraded"""
+        seeded = bcrypt.hashpw(b"secret", bcrypt.gensalt(4)).decode('ascii')
+
+        valid, new_hash = self.passwords.verify("secret", seeded)
+
+        self.assertTrue(valid)
+        self.assertTrue(new_hash.startswith('$scrypt$'))
+        self.assertEqual(self.passwords.verify("guess", seeded), (False, None))
+
+    def test_wrong_password_rejected(self):
+        """Test wrong password and unknown hashes fail without rehash"""
+        encoded = self.passwords.hash("secret")
+
+        self.assertEqual(self.passwords.verify("guess", encoded), (False, None))
+        self.assertEqual(self.passwords.verify("secret", None), (False, None))
+        self.assertEqual(self.passwords.verify("secret", "not-a-hash"), (False, None))
+
+    def test_lower_cost_hash_rehashed(self):
+        """Test hashes below the configured cost are replaced"""
+        weak = ScryptHasher(log_n=4).hash("secret")
+        pbkdf2 = Pbkdf2Hasher(iterations=1000).hash("secret")
+
+        self.assertIsNotNone(self.passwords.verify("secret", weak)[1])
+        self.assertIsNotNone(self.passwords.verify("secret", pbkdf2)[1])
+
+    def test_saturated_pool_raises_busy(self):
+        """Test callers give up when no hashing slot frees up in time"""
+        passwords = PasswordManager(ScryptHasher(log_n=4), workers=1, max_pending=0, timeout=0.01)
+        passwords._slots.acquire()
+        try:
+            with self.assertRaises(HashingBusyError):
+                passwords.hash("secret")
+        finally:
+            passwords._slots.release()
+            passwords.close()
+
+
+class TestLastLoginWriter(unittest.TestCase):
+    """Test LastLoginWriter class"""
+
+    def test_batch_coalesced_into_one_update(self):
+        """Test repeated logins keep only the latest time per user"""
+        mock_db_manager = Mock()
+        writer = LastLoginWriter(mock_db_manager)
+        first, second = 10.0, 12.0
+
+        with patch('utils.writers.time.monotonic', return_value=15.0):
+            writer.write_batch([(1, first), (2, first), (1, second)])
+
+        mock_db_manager.execute_update.assert_called_once()
+        query, params = mock_db_manager.execute_update.call_args[0]
+        self.assertEqual(query.count('WHEN %s THEN NOW(6) - INTERVAL %s MICROSECOND'), 2)
+        self.assertEqual(params, (1, 3000000, 2, 5000000, 1, 2))
+
+
+class TestLoginRateLimiter(unittest.TestCase):
+    """Test token-bucket login rate limiting"""
+
+    def test_backend_is_abstract(self):
+        """Test a backend must implement take and reset"""
+        with self.assertRaises(TypeError):
+            RateLimitBackend()
+
+    def test_email_bucket_exhausted(self):
+        """Test an account is limited after its burst, other accounts are not"""
+        limiter = LoginRateLimiter(email_capacity=2, email_refill_rate=1)
+
+        self.assertEqual(limiter.check('10.0.0.1', 'a@example.com'), 0)
+        self.assertEqual(limiter.check('10.0.0.2', 'A@example.com '), 0)
+        self.assertGreater(limiter.check('10.0.0.3', 'a@example.com'), 0)
+        self.assertEqual(limiter.check('10.0.0.1', 'b@example.com'), 0)
+
+        limiter.reset_email('a@example.com')
+        self.assertEqual(limiter.check('10.0.0.1', 'a@example.com'), 0)
+
+    def test_ip_bucket_exhausted(self):
+        """Test one address is limited across many accounts"""
+        limiter = LoginRateLimiter(ip_capacity=3, ip_refill_rate=0.5)
+
+        for i in range(3):
+            self.assertEqual(limiter.check('10.0.0.1', f'user{i}@example.com'), 0)
+        self.assertAlmostEqual(limiter.check('10.0.0.1', 'other@example.com'), 2, places=1)
+        self.assertEqual(limiter.check('10.0.0.2', 'other@example.com'), 0)
+
+    def test_flood_of_keys_bounded(self):
+        """Test distinct drained keys evict the least recently used buckets"""
+        backend = MemoryRateLimitBackend(max_keys=100)
+        backend.take('victim', capacity=2, refill_rate=0)
+        for i in range(1000):
+            backend.take(f'spray{i}@example.com', capacity=1, refill_rate=0)
+            backend.take('victim', capacity=2, refill_rate=0)
+
+        self.assertEqual(len(backend), 100)
+        # The bucket kept in use survives the flood, still drained
+        self.assertFalse(backend.take('victim', capacity=2, refill_rate=0)[0])
+        self.assertTrue(backend.take('spray0@example.com', capacity=1, refill_rate=0)[0])
+
+
+class TestServerSideSessions(unittest.TestCase):
+    """Test server-side session interface and stores"""
+
+    def setUp(self):
+        """Set up a small app using server-side sessions"""
+        self.store = MemorySessionStore()
+        self.app = Flask(__name__)
+        self.app.secret_key = 'test-secret'
+        self.app.config['PERMANENT_SESSION_LIFETIME'] = 60
+        self.app.session_interface = ServerSideSessionInterface(self.store)
+
+        @self.app.route('/login/<name>')
+        def login(name):
+            session['username'] = name
+            return 'ok'
+
+        @self.app.route('/whoami')
+        def whoami():
+            return session.get('username', '')
+
+        @self.app.route('/logout')
+        def logout():
+            session.clear()
+            return 'ok'
+
+    def test_session_kept_server_side(self):
+        """Test the cookie holds only a signed id and data survives requests"""
+        client = self.app.test_client()
+
+        client.get('/login/alice')
+        cookie = client.get_cookie('session').value
+
+        self.assertNotIn('alice', cookie)
+        self.assertEqual(len(self.store), 1)
+        self.assertEqual(client.get('/whoami').data, b'alice')
+
+        client.get('/logout')
+        self.assertEqual(len(self.store), 0)
+        self.assertEqual(client.get('/whoami').data, b'')
+
+    def test_regenerate_rotates_session_id(self):
+        """Test a pre-login session id stops working once the session is regenerated"""
+        @self.app.route('/signin/<name>')
+        def signin(name):
+            regenerate_session(session)
+            session['username'] = name
+            return 'ok'
+
+        client = self.app.test_client()
+        client.get('/login/guest')
+        old_cookie = client.get_cookie('session').value
+
+        client.get('/signin/alice')
+        new_cookie = client.get_cookie('session').value
+
+        self.assertNotEqual(new_cookie, old_cookie)
+        self.assertEqual(len(self.store), 1)
+        self.assertEqual(client.get('/whoami').data, b'alice')
+        client.set_cookie('session', old_cookie)
+        self.assertEqual(client.get('/whoami').data, b'')
+
+    def test_store_is_abstract(self):
+        """Test a store must implement every operation"""
+        with self.assertRaises(TypeError):
+            SessionStore()
+
+    def test_tampered_or_expired_cookie_ignored(self):
+        """Test unsigned ids and idle-expired sessions start empty"""
+        client = self.app.test_client()
+        client.get('/login/alice')
+        sid = next(iter(self.store._data))
+
+        client.set_cookie('session', sid)
+        self.assertEqual(client.get('/whoami').data, b'')
+
+        client.get('/login/alice')
+        for key, (data, _) in list(self.store._data.items()):
+            self.store._data[key] = (data, time.time() - 1)
+        self.assertEqual(client.get('/whoami').data, b'')
+        # The session abandoned by the tampered cookie is left for the sweep
+        self.assertEqual(self.store.sweep(), 1)
+
+    def test_serializer_roundtrip_and_compression(self):
+        """Test tagged values survive and large sessions are compressed"""
+        serializer = SessionSerializer(compress_threshold=64)
+        data = {'when': datetime(2024, 1, 1, 9, 0, tzinfo=timezone.utc), 'ids': (1, 2), 'note': 'x' * 500}
+
+        payload = serializer.dumps(data)
+
+        self.assertEqual(payload[:1], b'z')
+        self.assertLess(len(payload), 200)
+        self.assertEqual(serializer.loads(payload), data)
+
+    def test_sqlite_store_sweep(self):
+        """Test the SQLite store shares sessions and sweeps expired ones"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'sessions.db')
+            store = SQLiteSessionStore(path)
+            store.set('live', b'j{}', time.time() + 60)
+            store.set('old', b'j{}', time.time() - 1)
+
+            self.assertEqual(SQLiteSessionStore(path).get('live')[0], b'j{}')
+            self.assertIsNone(store.get('old'))
+            self.assertEqual(store.sweep(), 1)
+
+
+class TestRecipientDirectory(unittest.TestCase):
+    """Test recipient prefix search"""
+
+    def test_prefix_index_search(self):
+        """Test matches by username or email prefix, each user once"""
+        index = PrefixIndex()
+        index.add({'user_id': 1, 'username': 'Alice', 'email': 'alice@school.org'})
+        index.add({'user_id': 2, 'username': 'albert', 'email': 'bert@school.org'})
+        index.add({'user_id': 3, 'username': 'bob', 'email': 'bob@school.org'})
+
+        self.assertEqual([u['user_id'] for u in index.search('al')], [2, 1])
+        self.assertEqual([u['user_id'] for u in index.search('BE')], [2])
+        self.assertEqual(len(index.search('b', limit=1)), 1)
+
+        index.add({'user_id': 2, 'username': 'zed', 'email': 'zed@school.org'})
+        self.assertEqual([u['user_id'] for u in index.search('al')], [1])
+        self.assertEqual(len(index), 3)
+
+    def test_directory_tops_up_incrementally(self):
+        """Test new memberships are fetched past the watermark"""
+        user_model = Mock()
+        user_model.get_reachable_users.side_effect = [
+            [{'user_id': 5, 'username': 'teacher', 'email': 't@school.org', 'membership_id': 7}],
+            [{'user_id': 6, 'username': 'student', 'email': 's@school.org', 'membership_id': 9}],
+        ]
+        directory = RecipientDirectory(user_model, refresh_interval=60)
+
+        self.assertEqual([u['user_id'] for u in directory.search(1, 'te')], [5])
+        self.assertEqual(directory.search(1, '  '), [])
+        with patch('utils.recipients.time.monotonic', return_value=time.monotonic() + 61):
+            self.assertEqual([u['user_id'] for u in directory.search(1, 'st')], [6])
+        user_model.get_reachable_users.assert_called_with(1, 7)
+        self.assertEqual(user_model.get_reachable_users.call_count, 2)
+
+    def test_can_reach_asks_database(self):
+        """Test sending is checked live and a removed recipient leaves the index"""
+        user_model = Mock()
+        user_model.get_reachable_users.return_value = [
+            {'user_id': 5, 'username': 'teacher', 'email': 't@school.org', 'membership_id': 7}
+        ]
+        directory = RecipientDirectory(user_model)
+        directory.search(1, 'te')
+
+        user_model.shares_organization.return_value = False
+        self.assertFalse(directory.can_reach(1, 5))
+        user_model.shares_organization.assert_called_with(1, 5)
+        user_model.get_reachable_users.return_value = []
+        self.assertEqual(directory.search(1, 'te'), [])
+
+        user_model.shares_organization.return_value = True
+        self.assertTrue(directory.can_reach(1, 6))
+
+
+class TestGeo(unittest.TestCase):
+    """Test sighting coordinate helpers"""
+
+    def test_encode(self):
+        """Test geohash matches the reference encoding and nests by precision"""
+        self.assertEqual(encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(encode(-8.55, 119.49), encode(-8.55, 119.49, 12)[:9])
+        self.assertEqual(len(encode(0, 0)), 9)
+
+    def test_parse_coordinates(self):
+        """Test optional form coordinates"""
+        self.assertIsNone(parse_coordinates('', ' '))
+        self.assertIsNone(parse_coordinates(None, None))
+        self.assertEqual(parse_coordinates(' -8.55', '119.49 '), (-8.55, 119.49))
+        for latitude, longitude in (('-8.55', ''), ('91', '0'), ('0', '-180.5'),
+                                    ('nan', '0'), ('north', '0')):
+            with self.assertRaises(ValueError):
+                parse_coordinates(latitude, longitude)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,34 +1,28 @@
 """
 Utility functions for the application
 """
+import time
 from typing import Optional, List
 from flask import request
-from models import DatabaseManager
-from models.user_models import UserModel
+from utils.writers import BatchWriter, AccessLogWriter, LastLoginWriter
+from utils.cache import TTLCache, RoleCache
 
 
-def log_access(db_manager: DatabaseManager, user_id: Optional[int],
+def log_access(writer: AccessLogWriter, user_id: Optional[int],
               action: str, target_type: Optional[str] = None,
               target_id: Optional[int] = None):
-    """Log user access to database"""
+    """Queue a user access record for the background access log writer"""
     try:
         ip = request.remote_addr
-        user_model = UserModel(db_manager)
-        user_model._execute_insert(
-            """INSERT INTO access_logs (user_id, action, target_type, target_id, ip_address)
-               VALUES (%s, %s, %s, %s, %s)""",
-            (user_id, action, target_type, target_id, ip)
-        )
+        writer.submit((user_id, action, target_type, target_id, ip, time.monotonic()))
     except Exception as e:
         print(f"Failed to log access: {e}")
 
 
-def require_role(db_manager: DatabaseManager, user_id: int, allowed_roles: List[str]) -> bool:
+def require_role(role_cache: RoleCache, user_id: int, allowed_roles: List[str]) -> bool:
     """Check if user has required role"""
     try:
-        user_model = UserModel(db_manager)
-        user = user_model.get_user_by_id(user_id)
-        return user and user['user_type'] in allowed_roles
+        return role_cache.get_role(user_id) in allowed_roles
     except Exception:
         return False
 
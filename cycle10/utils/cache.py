@@ -0,0 +1,88 @@
+"""
+In-process caches
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after ttl seconds"""
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Get a cached value, or default if missing or expired"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store a value, evicting the least recently used entry when full"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        """Remove a single entry"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+class RoleCache:
+    """Per-user cache of user_type used by permission checks
+
+    Misses fall back to a narrow SELECT user_type lookup. Entries are primed
+    at login and must be invalidated whenever a user's type changes.
+    """
+
+    def __init__(self, user_model, ttl: float = 300, maxsize: int = 10000):
+        self.user_model = user_model
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get_role(self, user_id: int) -> Optional[str]:
+        """Get user's type from cache or database"""
+        user_type = self._cache.get(user_id)
+        if user_type is None:
+            user_type = self.user_model.get_user_type(user_id)
+            if user_type is not None:
+                self._cache.set(user_id, user_type)
+        return user_type
+
+    def set_role(self, user_id: int, user_type: str):
+        """Prime the cache with a freshly loaded user_type"""
+        self._cache.set(user_id, user_type)
+
+    def invalidate(self, user_id: int):
+        """Forget a user's cached type"""
+        self._cache.invalidate(user_id)
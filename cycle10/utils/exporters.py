@@ -0,0 +1,65 @@
+"""
+Streaming serializers for bulk data export
+"""
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Iterator, List
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def _json_default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, bytes):
+        return value.decode('utf-8', 'replace')
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _csv_value(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def stream_csv(batches: Iterable[List[Dict[str, Any]]], columns: List[str]) -> Iterator[str]:
+    """Yield a CSV document one chunk per batch of rows (header first)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        for row in rows:
+            writer.writerow([_csv_value(row.get(column)) for column in columns])
+        yield buffer.getvalue()
+
+
+def stream_ndjson(batches: Iterable[List[Dict[str, Any]]], columns: List[str]) -> Iterator[str]:
+    """Yield newline-delimited JSON, one chunk per batch of rows"""
+    for rows in batches:
+        yield ''.join(
+            json.dumps({column: row.get(column) for column in columns},
+                       default=_json_default, ensure_ascii=False) + '\n'
+            for row in rows
+        )
+
+
+def stream_rows(batches: Iterable[List[Dict[str, Any]]], columns: List[str],
+                export_format: str) -> Iterator[str]:
+    """Serialize row batches in the requested export format"""
+    if export_format == 'csv':
+        return stream_csv(batches, columns)
+    if export_format == 'ndjson':
+        return stream_ndjson(batches, columns)
+    raise ValueError(f"Unsupported export format: {export_format}")
@@ -0,0 +1,62 @@
+"""
+Sighting coordinates: validation and geohash encoding
+"""
+import math
+from typing import Optional, Tuple
+
+# Precision of species_sightings.geohash (cells of roughly 4.8 m x 4.8 m)
+GEOHASH_PRECISION = 9
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def validate_coordinates(latitude, longitude) -> Tuple[float, float]:
+    """Return (latitude, longitude) as floats, raising ValueError when out of range"""
+    latitude, longitude = float(latitude), float(longitude)
+    if not (math.isfinite(latitude) and -90.0 <= latitude <= 90.0):
+        raise ValueError(f"Latitude out of range: {latitude}")
+    if not (math.isfinite(longitude) and -180.0 <= longitude <= 180.0):
+        raise ValueError(f"Longitude out of range: {longitude}")
+    return latitude, longitude
+
+
+def parse_coordinates(latitude: Optional[str],
+                      longitude: Optional[str]) -> Optional[Tuple[float, float]]:
+    """Parse optional form fields; None when both are blank
+
+    Raises ValueError when only one is given or either is not a valid
+    coordinate.
+    """
+    latitude = (latitude or '').strip()
+    longitude = (longitude or '').strip()
+    if not latitude and not longitude:
+        return None
+    if not latitude or not longitude:
+        raise ValueError("Latitude and longitude must be given together")
+    return validate_coordinates(latitude, longitude)
+
+
+def encode(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Geohash of a point; nearby points share a prefix, so a prefix is a cell"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = bit_count = 0
+    even = True
+
+    while len(chars) < precision:
+        value, bounds = (longitude, lng_range) if even else (latitude, lat_range)
+        mid = (bounds[0] + bounds[1]) / 2
+        if value >= mid:
+            bits = bits * 2 + 1
+            bounds[0] = mid
+        else:
+            bits = bits * 2
+            bounds[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = bit_count = 0
+
+    return ''.join(chars)
@@ -0,0 +1,174 @@
+"""
+Monthly RANGE partition maintenance for the access_logs table
+"""
+import gzip
+import os
+import re
+from datetime import date
+from typing import Optional, List, Dict, Any
+from models import DatabaseManager
+from utils.exporters import stream_ndjson
+
+FUTURE_PARTITION = 'p_future'
+_MONTH_PARTITION = re.compile(r'^p(\d{4})(\d{2})$')
+
+
+def month_start(day: date) -> date:
+    """First day of the month containing day"""
+    return day.replace(day=1)
+
+
+def add_months(day: date, months: int) -> date:
+    """First day of the month `months` after the month of day"""
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    """Partition holding rows of the given month, e.g. p202401"""
+    return f"p{month.year:04d}{month.month:02d}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    """Month of a pYYYYMM partition (None for p_future or unknown names)"""
+    match = _MONTH_PARTITION.match(name or '')
+    if not match:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+def partition_definition(month: date) -> str:
+    """PARTITION clause for one month: rows with timestamp before the next month"""
+    upper = add_months(month, 1)
+    return (f"PARTITION {partition_name(month)} "
+            f"VALUES LESS THAN (UNIX_TIMESTAMP('{upper.isoformat()} 00:00:00'))")
+
+
+def initial_partitions_sql(today: date, months_ahead: int = 3) -> str:
+    """PARTITION BY clause for CREATE TABLE access_logs
+
+    The first partition (the current month) also holds any older rows.
+    """
+    current = month_start(today)
+    parts = [partition_definition(add_months(current, i)) for i in range(months_ahead + 1)]
+    parts.append(f"PARTITION {FUTURE_PARTITION} VALUES LESS THAN MAXVALUE")
+    return "PARTITION BY RANGE (UNIX_TIMESTAMP(timestamp)) (\n    " + ",\n    ".join(parts) + "\n)"
+
+
+class PartitionManager:
+    """Create future monthly partitions and retire expired ones
+
+    Expired partitions are written to gzip-compressed NDJSON files (one per
+    month) before being dropped, so retention never runs a large DELETE.
+    """
+
+    def __init__(self, db_manager: DatabaseManager, table: str = 'access_logs',
+                 months_ahead: int = 3, retention_months: int = 12,
+                 archive_dir: Optional[str] = None, batch_size: int = 5000):
+        self.db = db_manager
+        self.table = table
+        self.months_ahead = months_ahead
+        self.retention_months = retention_months
+        self.archive_dir = archive_dir
+        self.batch_size = batch_size
+
+    def list_partitions(self) -> List[Dict[str, Any]]:
+        """Partitions of the table in range order"""
+        return self.db.execute_query(
+            """SELECT PARTITION_NAME as name, PARTITION_DESCRIPTION as bound, TABLE_ROWS as table_rows
+               FROM information_schema.PARTITIONS
+               WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+               ORDER BY PARTITION_ORDINAL_POSITION""",
+            (self.table,)
+        )
+
+    def missing_months(self, today: date, existing: List[str]) -> List[date]:
+        """Months up to months_ahead from today that have no partition yet"""
+        months = [partition_month(name) for name in existing]
+        latest = max([m for m in months if m], default=None)
+        first = add_months(latest, 1) if latest else month_start(today)
+        last = add_months(month_start(today), self.months_ahead)
+
+        missing = []
+        month = first
+        while month <= last:
+            missing.append(month)
+            month = add_months(month, 1)
+        return missing
+
+    def expired_partitions(self, today: date, existing: List[str]) -> List[str]:
+        """Monthly partitions entirely older than the retention window"""
+        cutoff = add_months(month_start(today), -self.retention_months)
+        return [name for name in existing
+                if partition_month(name) and partition_month(name) < cutoff]
+
+    def create_partitions(self, months: List[date]):
+        """Split the future partition to add the given months"""
+        if not months:
+            return
+        definitions = [partition_definition(month) for month in months]
+        definitions.append(f"PARTITION {FUTURE_PARTITION} VALUES LESS THAN MAXVALUE")
+        self.db.execute_update(
+            f"ALTER TABLE {self.table} REORGANIZE PARTITION {FUTURE_PARTITION} INTO "
+            f"({', '.join(definitions)})"
+        )
+
+    def archive_partition(self, name: str) -> str:
+        """Write all rows of a partition to <archive_dir>/<table>-<name>.ndjson.gz"""
+        if not partition_month(name):
+            raise ValueError(f"Not a monthly partition: {name}")
+        os.makedirs(self.archive_dir, exist_ok=True)
+        path = os.path.join(self.archive_dir, f"{self.table}-{name}.ndjson.gz")
+        tmp_path = path + '.tmp'
+
+        columns = [row['COLUMN_NAME'] for row in self.db.execute_query(
+            """SELECT COLUMN_NAME FROM information_schema.COLUMNS
+               WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+               ORDER BY ORDINAL_POSITION""",
+            (self.table,)
+        )]
+        batches = self.db.iter_query(
+            f"SELECT * FROM {self.table} PARTITION ({name}) ORDER BY log_id",
+            (), self.batch_size
+        )
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as archive:
+            for chunk in stream_ndjson(batches, columns):
+                archive.write(chunk)
+        os.replace(tmp_path, path)
+        return path
+
+    def drop_partition(self, name: str):
+        """Drop a monthly partition and its rows"""
+        if not partition_month(name):
+            raise ValueError(f"Not a monthly partition: {name}")
+        self.db.execute_update(f"ALTER TABLE {self.table} DROP PARTITION {name}")
+
+    def run(self, today: Optional[date] = None, archive: bool = True,
+            dry_run: bool = False) -> List[str]:
+        """Add upcoming partitions and retire expired ones, returns actions taken"""
+        today = today or date.today()
+        if archive and not self.archive_dir:
+            raise ValueError("archive_dir is required when archiving expired partitions")
+        existing = [row['name'] for row in self.list_partitions()]
+        if FUTURE_PARTITION not in existing:
+            raise RuntimeError(f"{self.table} is not partitioned by month "
+                               f"(no {FUTURE_PARTITION} partition)")
+
+        actions = []
+        missing = self.missing_months(today, existing)
+        if missing:
+            actions.append("create " + ", ".join(partition_name(m) for m in missing))
+            if not dry_run:
+                self.create_partitions(missing)
+
+        for name in self.expired_partitions(today, existing):
+            if archive:
+                actions.append(f"archive {name}")
+                if not dry_run:
+                    path = self.archive_partition(name)
+                    actions[-1] += f" -> {path}"
+            actions.append(f"drop {name}")
+            if not dry_run:
+                self.drop_partition(name)
+
+        return actions
@@ -0,0 +1,240 @@
+"""
+Password hashing with pluggable, versioned schemes and a bounded worker pool
+"""
+import base64
+import hashlib
+import hmac
+import os
+import re
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Tuple
+import bcrypt
+
+
+class HashingBusyError(RuntimeError):
+    """Raised when the hashing pool is saturated for longer than its timeout"""
+    pass
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode('ascii').rstrip('=')
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.b64decode(data + '=' * (-len(data) % 4))
+
+
+class PasswordHasher(ABC):
+    """Base class for one hashing scheme
+
+    Hashes are self-describing strings; identify() tells whether a stored hash
+    belongs to this scheme and needs_rehash() whether its cost parameters are
+    weaker than the current ones.
+    """
+
+    scheme = ''
+
+    @abstractmethod
+    def hash(self, password: str) -> str:
+        """Hash a password into a self-describing string"""
+
+    @abstractmethod
+    def verify(self, password: str, encoded: str) -> bool:
+        """Check a password against a stored hash of this scheme"""
+
+    def identify(self, encoded: str) -> bool:
+        return encoded.startswith(f"${self.scheme}$")
+
+    def needs_rehash(self, encoded: str) -> bool:
+        return False
+
+
+class ScryptHasher(PasswordHasher):
+    """scrypt (memory-hard): $scrypt$ln=<log2 N>,r=<r>,p=<p>$<salt>$<hash>"""
+
+    scheme = 'scrypt'
+
+    def __init__(self, log_n: int = 14, r: int = 8, p: int = 1):
+        self.log_n = log_n
+        self.r = r
+        self.p = p
+
+    def _derive(self, password: str, salt: bytes, log_n: int, r: int, p: int) -> bytes:
+        n = 1 << log_n
+        return hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p,
+                              maxmem=256 * n * r * p, dklen=32)
+
+    def _parse(self, encoded: str) -> Tuple[int, int, int, bytes, bytes]:
+        _, _, params, salt, digest = encoded.split('$')
+        values = dict(item.split('=') for item in params.split(','))
+        return int(values['ln']), int(values['r']), int(values['p']), _b64decode(salt), _b64decode(digest)
+
+    def hash(self, password: str) -> str:
+        salt = os.urandom(16)
+        digest = self._derive(password, salt, self.log_n, self.r, self.p)
+        return f"$scrypt$ln={self.log_n},r={self.r},p={self.p}${_b64encode(salt)}${_b64encode(digest)}"
+
+    def verify(self, password: str, encoded: str) -> bool:
+        log_n, r, p, salt, digest = self._parse(encoded)
+        return hmac.compare_digest(self._derive(password, salt, log_n, r, p), digest)
+
+    def needs_rehash(self, encoded: str) -> bool:
+        log_n, r, p, _, _ = self._parse(encoded)
+        return (log_n, r, p) < (self.log_n, self.r, self.p)
+
+
+class Pbkdf2Hasher(PasswordHasher):
+    """PBKDF2-HMAC-SHA256: $pbkdf2-sha256$i=<iterations>$<salt>$<hash>"""
+
+    scheme = 'pbkdf2-sha256'
+
+    def __init__(self, iterations: int = 600000):
+        self.iterations = iterations
+
+    def _parse(self, encoded: str) -> Tuple[int, bytes, bytes]:
+        _, _, params, salt, digest = encoded.split('$')
+        return int(params.split('=')[1]), _b64decode(salt), _b64decode(digest)
+
+    def hash(self, password: str) -> str:
+        salt = os.urandom(16)
+        digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, self.iterations)
+        return f"${self.scheme}$i={self.iterations}${_b64encode(salt)}${_b64encode(digest)}"
+
+    def verify(self, password: str, encoded: str) -> bool:
+        iterations, salt, digest = self._parse(encoded)
+        candidate = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+        return hmac.compare_digest(candidate, digest)
+
+    def needs_rehash(self, encoded: str) -> bool:
+        return self._parse(encoded)[0] < self.iterations
+
+
+class BcryptHasher(PasswordHasher):
+    """bcrypt in its native $2b$<rounds>$... format (the scheme of seeded accounts)"""
+
+    scheme = '2b'
+
+    def __init__(self, rounds: int = 12):
+        self.rounds = rounds
+
+    def identify(self, encoded: str) -> bool:
+        return encoded[:4] in ('$2a$', '$2b$', '$2y$')
+
+    def hash(self, password: str) -> str:
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(self.rounds)).decode('ascii')
+
+    def verify(self, password: str, encoded: str) -> bool:
+        return bcrypt.checkpw(password.encode('utf-8'), encoded.encode('ascii'))
+
+    def needs_rehash(self, encoded: str) -> bool:
+        return int(encoded.split('$')[2]) < self.rounds
+
+
+class LegacySha256Hasher(PasswordHasher):
+    """Unsalted hex SHA-256 used by earlier releases (verify only)"""
+
+    scheme = 'sha256'
+    _HEX64 = re.compile(r'^[0-9a-f]{64}$')
+
+    def identify(self, encoded: str) -> bool:
+        return bool(self._HEX64.match(encoded))
+
+    def hash(self, password: str) -> str:
+        raise RuntimeError("Legacy SHA-256 hashes must not be created")
+
+    def verify(self, password: str, encoded: str) -> bool:
+        return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), encoded)
+
+    def needs_rehash(self, encoded: str) -> bool:
+        return True
+
+
+class PasswordManager:
+    """Hash and verify passwords on a bounded thread pool
+
+    New hashes use the preferred hasher. Stored hashes of any known scheme
+    verify, and verify() returns a replacement hash when the stored one is
+    legacy or below the current cost. hashlib's scrypt/pbkdf2 and bcrypt
+    release the GIL, so threads run them in parallel; at most `workers`
+    hashes run at once and at most `max_pending` more may wait, for up to
+    `timeout` seconds, before HashingBusyError is raised.
+    """
+
+    def __init__(self, preferred: Optional[PasswordHasher] = None,
+                 legacy: Optional[List[PasswordHasher]] = None,
+                 workers: int = 4, max_pending: int = 32, timeout: float = 5.0):
+        self.preferred = preferred or ScryptHasher()
+        self.hashers = [self.preferred] + list(legacy if legacy is not None else self._default_legacy())
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        # Verified when the account does not exist, so lookups cost the same
+        self._dummy_hash = None
+
+    def _default_legacy(self) -> List[PasswordHasher]:
+        hashers = [BcryptHasher(), ScryptHasher(), Pbkdf2Hasher(), LegacySha256Hasher()]
+        return [h for h in hashers if type(h) is not type(self.preferred)]
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise HashingBusyError("Password hashing pool is saturated")
+        try:
+            return self._executor.submit(func, *args).result()
+        finally:
+            self._slots.release()
+
+    def _hasher_for(self, encoded: str) -> Optional[PasswordHasher]:
+        for hasher in self.hashers:
+            if hasher.identify(encoded):
+                return hasher
+        return None
+
+    def hash(self, password: str) -> str:
+        """Hash a password with the preferred scheme"""
+        return self._run(self.preferred.hash, password)
+
+    def verify(self, password: str, encoded: Optional[str]) -> Tuple[bool, Optional[str]]:
+        """Check a password, returns (valid, new hash to store or None)"""
+        hasher = self._hasher_for(encoded) if encoded else None
+        if hasher is None:
+            if self._dummy_hash is None:
+                self._dummy_hash = self.hash('')
+            self._run(self.preferred.verify, password, self._dummy_hash)
+            return False, None
+
+        try:
+            valid = self._run(hasher.verify, password, encoded)
+        except (ValueError, KeyError, IndexError):
+            return False, None
+        if not valid:
+            return False, None
+
+        if hasher is not self.preferred or hasher.needs_rehash(encoded):
+            return True, self.hash(password)
+        return True, None
+
+    def close(self):
+        """Stop the worker threads"""
+        self._executor.shutdown(wait=False)
+
+
+def build_password_manager(config) -> PasswordManager:
+    """Create the PasswordManager described by the application config"""
+    scheme = config.PASSWORD_HASHER
+    if scheme == 'scrypt':
+        preferred = ScryptHasher(log_n=config.PASSWORD_SCRYPT_LOG_N)
+    elif scheme == 'pbkdf2':
+        preferred = Pbkdf2Hasher(iterations=config.PASSWORD_PBKDF2_ITERATIONS)
+    elif scheme == 'bcrypt':
+        preferred = BcryptHasher(rounds=config.PASSWORD_BCRYPT_ROUNDS)
+    else:
+        raise ValueError(f"Unknown password hasher: {scheme}")
+
+    return PasswordManager(
+        preferred,
+        workers=config.PASSWORD_HASH_WORKERS,
+        max_pending=config.PASSWORD_HASH_MAX_PENDING,
+        timeout=config.PASSWORD_HASH_TIMEOUT
+    )
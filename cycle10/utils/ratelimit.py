@@ -0,0 +1,125 @@
+"""
+Token-bucket rate limiting for login attempts
+"""
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+
+class RateLimitBackend(ABC):
+    """Storage for token buckets
+
+    take() must atomically refill the bucket stored under key, then remove
+    cost tokens from it if enough are available. A backend shared between
+    processes (e.g. Redis running the same logic in a script) can be plugged
+    into LoginRateLimiter in place of the in-memory one.
+    """
+
+    @abstractmethod
+    def take(self, key: str, capacity: float, refill_rate: float,
+             cost: float = 1.0) -> Tuple[bool, float]:
+        """Take tokens, returns (allowed, seconds until enough tokens are available)"""
+
+    @abstractmethod
+    def reset(self, key: str):
+        """Forget a bucket (it starts full again)"""
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """Per-process token buckets kept in an LRU dict
+
+    At most max_keys buckets are kept; taking from a bucket makes it the
+    most recent and the least recently used ones are evicted (they start
+    full again), so a flood of distinct keys costs O(1) per attempt and
+    bounded memory.
+    """
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float, float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _level(bucket: Tuple[float, float, float, float], now: float) -> float:
+        tokens, updated_at, capacity, refill_rate = bucket
+        return min(capacity, tokens + (now - updated_at) * refill_rate)
+
+    def take(self, key: str, capacity: float, refill_rate: float,
+             cost: float = 1.0) -> Tuple[bool, float]:
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            tokens = self._level(bucket, now) if bucket else capacity
+
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now, capacity, refill_rate)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            if allowed:
+                return True, 0.0
+
+            retry_after = (cost - tokens) / refill_rate if refill_rate > 0 else float('inf')
+            return False, retry_after
+
+    def reset(self, key: str):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._buckets)
+
+
+class LoginRateLimiter:
+    """Limit login attempts per client IP and per account email
+
+    The IP bucket is sized for a whole classroom behind one address; the
+    email bucket is small so a single account cannot be brute forced from
+    many addresses. An attempt must fit in both buckets.
+    """
+
+    def __init__(self, backend: Optional[RateLimitBackend] = None,
+                 ip_capacity: float = 60, ip_refill_rate: float = 1.0,
+                 email_capacity: float = 5, email_refill_rate: float = 1 / 60):
+        self.backend = backend or MemoryRateLimitBackend()
+        self.ip_capacity = ip_capacity
+        self.ip_refill_rate = ip_refill_rate
+        self.email_capacity = email_capacity
+        self.email_refill_rate = email_refill_rate
+
+    @staticmethod
+    def _email_key(email: str) -> str:
+        return 'login:email:' + email.strip().lower()
+
+    def check(self, ip: Optional[str], email: str) -> float:
+        """Record an attempt, returns 0 if allowed or seconds to wait otherwise"""
+        allowed, retry_after = self.backend.take(
+            f"login:ip:{ip}", self.ip_capacity, self.ip_refill_rate
+        )
+        if not allowed:
+            return retry_after
+
+        allowed, retry_after = self.backend.take(
+            self._email_key(email), self.email_capacity, self.email_refill_rate
+        )
+        return 0.0 if allowed else retry_after
+
+    def reset_email(self, email: str):
+        """Clear the per-account bucket after a successful login"""
+        self.backend.reset(self._email_key(email))
+
+
+def build_login_rate_limiter(config, backend: Optional[RateLimitBackend] = None) -> LoginRateLimiter:
+    """Create the LoginRateLimiter described by the application config"""
+    return LoginRateLimiter(
+        backend,
+        ip_capacity=config.LOGIN_RATE_IP_CAPACITY,
+        ip_refill_rate=config.LOGIN_RATE_IP_PER_MINUTE / 60.0,
+        email_capacity=config.LOGIN_RATE_EMAIL_CAPACITY,
+        email_refill_rate=config.LOGIN_RATE_EMAIL_PER_MINUTE / 60.0
+    )
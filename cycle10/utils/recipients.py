@@ -0,0 +1,134 @@
+"""
+Recipient autocomplete: per-sender prefix index over reachable users
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+from typing import Any, Dict, List, Optional, Tuple
+from utils.cache import TTLCache
+
+
+class PrefixIndex:
+    """Sorted array of (lowercased key, user_id) searched with bisect
+
+    Each user is indexed under both username and email, so a prefix of
+    either finds them. Adding a user keeps the array sorted (insort).
+    """
+
+    def __init__(self):
+        self._keys: List[Tuple[str, int]] = []
+        self._users: Dict[int, Dict[str, Any]] = {}
+
+    def add(self, user: Dict[str, Any]):
+        """Index a user row with user_id, username and email (re-adding replaces it)"""
+        self.remove(user['user_id'])
+        self._users[user['user_id']] = user
+        for key in self._user_keys(user):
+            insort(self._keys, (key, user['user_id']))
+
+    def remove(self, user_id: int):
+        """Drop a user from the index"""
+        user = self._users.pop(user_id, None)
+        if user is None:
+            return
+        for key in self._user_keys(user):
+            position = bisect_left(self._keys, (key, user_id))
+            if position < len(self._keys) and self._keys[position] == (key, user_id):
+                del self._keys[position]
+
+    @staticmethod
+    def _user_keys(user: Dict[str, Any]) -> set:
+        return {value.lower() for value in (user.get('username'), user.get('email')) if value}
+
+    def search(self, prefix: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Users whose username or email starts with prefix (case-insensitive)"""
+        prefix = prefix.lower()
+        results = []
+        seen = set()
+        position = bisect_left(self._keys, (prefix, -1))
+        while position < len(self._keys) and len(results) < limit:
+            key, user_id = self._keys[position]
+            if not key.startswith(prefix):
+                break
+            if user_id not in seen:
+                seen.add(user_id)
+                results.append(self._users[user_id])
+            position += 1
+        return results
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._users
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+
+class RecipientDirectory:
+    """Who a user may message (members of their organizations), searchable by prefix
+
+    A sender's index is built on first use and kept for ttl seconds. At
+    most every refresh_interval seconds it is topped up with memberships
+    created since the last load (organization_members.membership_id only
+    grows); removals and renames are picked up by the full rebuild once
+    the entry expires. Index reads and top-ups share one lock. Only search
+    uses the index: can_reach, which guards sending, asks the database.
+    """
+
+    def __init__(self, user_model, ttl: float = 600, refresh_interval: float = 30,
+                 maxsize: int = 1000):
+        self.user_model = user_model
+        self.refresh_interval = refresh_interval
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def _load(self, user_id: int) -> Dict[str, Any]:
+        entry = self._cache.get(user_id)
+        now = time.monotonic()
+        if entry is None:
+            entry = {'index': PrefixIndex(), 'watermark': 0, 'checked_at': 0.0}
+            self._top_up(user_id, entry, now)
+            self._cache.set(user_id, entry)
+        elif now - entry['checked_at'] >= self.refresh_interval:
+            with self._lock:
+                if now - entry['checked_at'] >= self.refresh_interval:
+                    self._top_up(user_id, entry, now)
+        return entry
+
+    def _top_up(self, user_id: int, entry: Dict[str, Any], now: float):
+        for user in self.user_model.get_reachable_users(user_id, entry['watermark']):
+            entry['watermark'] = max(entry['watermark'], user.pop('membership_id'))
+            entry['index'].add(user)
+        entry['checked_at'] = now
+
+    def search(self, user_id: int, prefix: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Reachable users matching a username/email prefix"""
+        prefix = prefix.strip()
+        if not prefix:
+            return []
+        entry = self._load(user_id)
+        with self._lock:
+            return entry['index'].search(prefix, limit)
+
+    def can_reach(self, user_id: int, recipient_id: int) -> bool:
+        """Whether the user currently shares an organization with the recipient
+
+        Checked against the database so neither a new nor a removed
+        membership waits for the cache. A cached index still listing a
+        recipient that is no longer reachable is dropped.
+        """
+        if self.user_model.shares_organization(user_id, recipient_id):
+            return True
+        entry = self._cache.get(user_id)
+        if entry is not None:
+            with self._lock:
+                stale = recipient_id in entry['index']
+            if stale:
+                self.invalidate(user_id)
+        return False
+
+    def invalidate(self, user_id: Optional[int] = None):
+        """Forget one sender's index (or all of them)"""
+        if user_id is None:
+            self._cache.clear()
+        else:
+            self._cache.invalidate(user_id)
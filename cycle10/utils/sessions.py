@@ -0,0 +1,334 @@
+"""
+Server-side Flask sessions: the cookie carries only a signed session id
+"""
+import os
+import secrets
+import sqlite3
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+
+
+class SessionStore(ABC):
+    """Storage for serialized sessions
+
+    get() returns (data, expires_at) for a live session. Entries expire
+    expires_at seconds after the epoch; sweep() deletes expired entries in
+    bulk and returns how many were removed.
+    """
+
+    @abstractmethod
+    def get(self, sid: str) -> Optional[Tuple[bytes, float]]:
+        """Get (data, expires_at) of a live session"""
+
+    @abstractmethod
+    def set(self, sid: str, data: bytes, expires_at: float):
+        """Store a session"""
+
+    @abstractmethod
+    def touch(self, sid: str, expires_at: float):
+        """Extend a session without rewriting its data"""
+
+    @abstractmethod
+    def delete(self, sid: str):
+        """Remove a session"""
+
+    @abstractmethod
+    def sweep(self) -> int:
+        """Remove expired sessions, returns how many were removed"""
+
+
+class MemorySessionStore(SessionStore):
+    """Per-process LRU store (single worker or development only)"""
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sid: str) -> Optional[Tuple[bytes, float]]:
+        with self._lock:
+            entry = self._data.get(sid)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._data[sid]
+                return None
+            self._data.move_to_end(sid)
+            return entry
+
+    def set(self, sid: str, data: bytes, expires_at: float):
+        with self._lock:
+            self._data[sid] = (data, expires_at)
+            self._data.move_to_end(sid)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def touch(self, sid: str, expires_at: float):
+        with self._lock:
+            entry = self._data.get(sid)
+            if entry is not None:
+                self._data[sid] = (entry[0], expires_at)
+
+    def delete(self, sid: str):
+        with self._lock:
+            self._data.pop(sid, None)
+
+    def sweep(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [sid for sid, (_, expires_at) in self._data.items() if expires_at <= now]
+            for sid in expired:
+                del self._data[sid]
+        return len(expired)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions in a local SQLite file shared by all workers on the host
+
+    Uses WAL mode so readers in one worker do not block writers in another;
+    a shared cache service can replace it behind the same interface.
+    """
+
+    def __init__(self, path: str, timeout: float = 5.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS sessions (
+                   sid TEXT PRIMARY KEY,
+                   data BLOB NOT NULL,
+                   expires_at REAL NOT NULL
+               )"""
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread; autocommit so every statement is its own transaction
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, sid: str) -> Optional[Tuple[bytes, float]]:
+        row = self._connection().execute(
+            "SELECT data, expires_at FROM sessions WHERE sid = ? AND expires_at > ?",
+            (sid, time.time())
+        ).fetchone()
+        return (bytes(row[0]), row[1]) if row else None
+
+    def set(self, sid: str, data: bytes, expires_at: float):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO sessions (sid, data, expires_at) VALUES (?, ?, ?)",
+            (sid, data, expires_at)
+        )
+
+    def touch(self, sid: str, expires_at: float):
+        self._connection().execute(
+            "UPDATE sessions SET expires_at = ? WHERE sid = ?", (expires_at, sid)
+        )
+
+    def delete(self, sid: str):
+        self._connection().execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+
+    def sweep(self) -> int:
+        return self._connection().execute(
+            "DELETE FROM sessions WHERE expires_at <= ?", (time.time(),)
+        ).rowcount
+
+
+class SessionSerializer:
+    """TaggedJSON (keeps datetimes, bytes, tuples...) compressed when it pays off
+
+    The first byte marks the encoding: b'j' for plain JSON, b'z' for zlib.
+    """
+
+    def __init__(self, compress_threshold: int = 256):
+        self.compress_threshold = compress_threshold
+        self._json = TaggedJSONSerializer()
+
+    def dumps(self, data: Dict) -> bytes:
+        raw = self._json.dumps(dict(data)).encode('utf-8')
+        if len(raw) >= self.compress_threshold:
+            compressed = zlib.compress(raw)
+            if len(compressed) < len(raw):
+                return b'z' + compressed
+        return b'j' + raw
+
+    def loads(self, payload: bytes) -> Dict:
+        marker, body = payload[:1], payload[1:]
+        if marker == b'z':
+            body = zlib.decompress(body)
+        elif marker != b'j':
+            raise ValueError("Unknown session encoding")
+        return self._json.loads(body.decode('utf-8'))
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """Session dict that tracks modification and its store id"""
+
+    def __init__(self, initial=None, sid: Optional[str] = None,
+                 expires_at: Optional[float] = None):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.expires_at = expires_at
+        self.new = sid is None
+        self.modified = False
+        # Previous id to delete from the store when the session is saved
+        self.replaced_sid: Optional[str] = None
+
+    def regenerate(self):
+        """Keep the data but move it to a new id when the session is saved"""
+        if self.sid is not None:
+            self.replaced_sid = self.sid
+            self.sid = None
+        self.modified = True
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Keep session data in a SessionStore, keyed by a signed random id
+
+    Sessions expire after PERMANENT_SESSION_LIFETIME seconds without a
+    request. Unchanged sessions are only re-written (touched) once a
+    refresh_fraction of their lifetime has passed, and expired entries are
+    swept at most every sweep_interval seconds by whichever request comes
+    along.
+    """
+
+    salt = 'server-side-session'
+
+    def __init__(self, store: SessionStore, serializer: Optional[SessionSerializer] = None,
+                 refresh_fraction: float = 0.1, sweep_interval: float = 300):
+        self.store = store
+        self.serializer = serializer or SessionSerializer()
+        self.refresh_fraction = refresh_fraction
+        self.sweep_interval = sweep_interval
+        self._next_sweep = time.monotonic() + sweep_interval
+        self._sweep_lock = threading.Lock()
+
+    def _signer(self, app) -> Optional[Signer]:
+        if not app.secret_key:
+            return None
+        return Signer(app.secret_key, salt=self.salt)
+
+    def open_session(self, app, request) -> Optional[ServerSideSession]:
+        signer = self._signer(app)
+        if signer is None:
+            return None
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if not cookie:
+            return ServerSideSession()
+
+        try:
+            sid = signer.unsign(cookie).decode('ascii')
+        except BadSignature:
+            return ServerSideSession()
+
+        entry = self.store.get(sid)
+        if entry is None:
+            return ServerSideSession()
+        try:
+            data = self.serializer.loads(entry[0])
+        except ValueError:
+            self.store.delete(sid)
+            return ServerSideSession()
+        return ServerSideSession(data, sid=sid, expires_at=entry[1])
+
+    def save_session(self, app, session: ServerSideSession, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        self._maybe_sweep()
+
+        if session.replaced_sid is not None:
+            self.store.delete(session.replaced_sid)
+
+        if not session:
+            if session.sid is not None or session.replaced_sid is not None:
+                if session.sid is not None:
+                    self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path,
+                                       secure=self.get_cookie_secure(app),
+                                       samesite=self.get_cookie_samesite(app),
+                                       httponly=self.get_cookie_httponly(app))
+            return
+
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        now = time.time()
+        expires_at = now + lifetime
+
+        if session.sid is None:
+            session.sid = secrets.token_urlsafe(32)
+            self.store.set(session.sid, self.serializer.dumps(session), expires_at)
+        elif session.modified:
+            self.store.set(session.sid, self.serializer.dumps(session), expires_at)
+        elif session.expires_at - now < lifetime * (1 - self.refresh_fraction):
+            self.store.touch(session.sid, expires_at)
+        else:
+            return
+
+        response.vary.add('Cookie')
+        response.set_cookie(
+            name, self._signer(app).sign(session.sid).decode('ascii'),
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain, path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
+
+    def _maybe_sweep(self):
+        if time.monotonic() < self._next_sweep or not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_sweep = time.monotonic() + self.sweep_interval
+            self.store.sweep()
+        except Exception as e:
+            print(f"Session sweep failed: {e}")
+        finally:
+            self._sweep_lock.release()
+
+
+def regenerate_session(session):
+    """Issue a new id for the current session data (call on login and privilege changes)
+
+    An id handed out before authentication, e.g. with a failed-login flash,
+    stops working, which prevents session fixation. Cookie sessions have no
+    server-side id and are left as they are.
+    """
+    if isinstance(session, ServerSideSession):
+        session.regenerate()
+
+
+def build_session_interface(config) -> Optional[ServerSideSessionInterface]:
+    """Create the session interface described by the config (None keeps cookie sessions)"""
+    backend = config.SESSION_BACKEND
+    if backend == 'cookie':
+        return None
+    if backend == 'memory':
+        store = MemorySessionStore(maxsize=config.SESSION_MEMORY_MAXSIZE)
+    elif backend == 'sqlite':
+        store = SQLiteSessionStore(config.SESSION_SQLITE_PATH)
+    else:
+        raise ValueError(f"Unknown session backend: {backend}")
+    return ServerSideSessionInterface(store, sweep_interval=config.SESSION_SWEEP_INTERVAL)
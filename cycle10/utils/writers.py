@@ -0,0 +1,216 @@
+"""
+Background writers that batch database writes off the request path
+"""
+import queue
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+from models import DatabaseManager
+
+
+# Wakes the worker thread up when the writer is closed
+_WAKE = object()
+
+# Event times are time.monotonic() readings taken when the event happens. They
+# are written as their age subtracted from the database clock, so stored times
+# share the clock of NOW()-based rollups and partitions whatever the app host's
+# clock or time zone.
+DB_EVENT_TIME = "NOW(6) - INTERVAL %s MICROSECOND"
+
+
+def event_age(event_time: float, now: float) -> int:
+    """Microseconds elapsed between a monotonic event time and now"""
+    return max(int((now - event_time) * 1000000), 0)
+
+
+class BatchWriter(ABC):
+    """Buffer records in a bounded queue and write them in batches
+
+    Records are flushed by a daemon thread once batch_size records are
+    queued or flush_interval seconds have passed. When the queue is full,
+    submit() drops the record instead of blocking the caller and counts it
+    in the 'dropped' statistic. Subclasses implement write_batch().
+    """
+
+    def __init__(self, max_queue: int = 10000, batch_size: int = 100,
+                 flush_interval: float = 1.0, name: str = 'batch-writer'):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.name = name
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+        self._stats_lock = threading.Lock()
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    @abstractmethod
+    def write_batch(self, batch: List[Any]):
+        """Write a batch of records"""
+
+    def start(self):
+        """Start the background worker thread"""
+        with self._start_lock:
+            if self._thread is None and not self._stop.is_set():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def submit(self, record: Any) -> bool:
+        """Queue a record for writing, returns False if it was dropped"""
+        if self._thread is None:
+            self.start()
+        if self._stop.is_set():
+            with self._stats_lock:
+                self.dropped += 1
+            return False
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped += 1
+            return False
+        with self._stats_lock:
+            self.submitted += 1
+        return True
+
+    def _take_batch(self) -> List[Any]:
+        """Collect up to batch_size records, waiting at most flush_interval"""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                if self._stop.is_set():
+                    record = self._queue.get_nowait()
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    record = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if record is not _WAKE:
+                batch.append(record)
+        return batch
+
+    def _write(self, batch: List[Any]):
+        """Write a batch and update counters"""
+        try:
+            self.write_batch(batch)
+            with self._stats_lock:
+                self.written += len(batch)
+        except Exception as e:
+            with self._stats_lock:
+                self.failed += len(batch)
+            print(f"Failed to write {len(batch)} records ({self.name}): {e}")
+
+    def _run(self):
+        """Worker loop"""
+        while True:
+            batch = self._take_batch()
+            if batch:
+                self._write(batch)
+            elif self._stop.is_set() and self._queue.empty():
+                return
+
+    def flush(self):
+        """Synchronously write everything currently queued"""
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    record = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is not _WAKE:
+                    batch.append(record)
+            if not batch:
+                return
+            self._write(batch)
+
+    def close(self, timeout: float = 10.0):
+        """Stop accepting records and drain the queue"""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            try:
+                self._queue.put_nowait(_WAKE)
+            except queue.Full:
+                pass
+            thread.join(timeout)
+        if thread is None or not thread.is_alive():
+            self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        """Get writer statistics"""
+        with self._stats_lock:
+            return {
+                'queued': self._queue.qsize(),
+                'submitted': self.submitted,
+                'written': self.written,
+                'dropped': self.dropped,
+                'failed': self.failed
+            }
+
+
+class AccessLogWriter(BatchWriter):
+    """Asynchronous writer for access_logs rows
+
+    Records are (user_id, action, target_type, target_id, ip_address,
+    event_time) with event_time a time.monotonic() reading; the stored
+    timestamp is when the event happened on the database clock, not when
+    the batch is flushed.
+    """
+
+    INSERT_QUERY = f"""INSERT INTO access_logs (user_id, action, target_type, target_id, ip_address,
+                   timestamp)
+               VALUES (%s, %s, %s, %s, %s, {DB_EVENT_TIME})"""
+
+    def __init__(self, db_manager: DatabaseManager, **kwargs):
+        kwargs.setdefault('name', 'access-log-writer')
+        super().__init__(**kwargs)
+        self.db = db_manager
+
+    def write_batch(self, batch: List[tuple]):
+        """Insert all records with one multi-row INSERT"""
+        now = time.monotonic()
+        self.db.execute_many(self.INSERT_QUERY,
+                             [record[:5] + (event_age(record[5], now),) for record in batch])
+
+
+class LastLoginWriter(BatchWriter):
+    """Deferred writer for users.last_login
+
+    Records are (user_id, login_time), login_time a time.monotonic()
+    reading stored on the database clock. Repeated logins of a user within a
+    batch are coalesced to the latest time and the whole batch is applied
+    with a single UPDATE, so a burst of logins costs one write per flush.
+    """
+
+    def __init__(self, db_manager: DatabaseManager, **kwargs):
+        kwargs.setdefault('name', 'last-login-writer')
+        super().__init__(**kwargs)
+        self.db = db_manager
+
+    def write_batch(self, batch: List[tuple]):
+        """Update last_login for every user in the batch at once"""
+        latest: Dict[int, Any] = {}
+        for user_id, login_time in batch:
+            if user_id not in latest or login_time > latest[user_id]:
+                latest[user_id] = login_time
+
+        now = time.monotonic()
+        cases = ' '.join([f'WHEN %s THEN {DB_EVENT_TIME}'] * len(latest))
+        placeholders = ', '.join(['%s'] * len(latest))
+        params = [value for user_id, login_time in latest.items()
+                  for value in (user_id, event_age(login_time, now))]
+        self.db.execute_update(
+            f"""UPDATE users SET last_login = CASE user_id {cases} END
+               WHERE user_id IN ({placeholders})""",
+            tuple(params + list(latest))
+        )
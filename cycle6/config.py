@@ -24,6 +24,26 @@ class DatabaseConfig:
         self.max_overflow = 10
         self.pool_timeout = 30
 
+        # Content search backend: 'fulltext' (MySQL FULLTEXT index) or
+        # 'memory' (in-process inverted index, for databases without FULLTEXT)
+        self.search_backend = os.getenv('SEARCH_BACKEND', 'fulltext')
+
+        # Seconds between admin dashboard snapshot refreshes
+        self.dashboard_snapshot_interval = int(os.getenv('DASHBOARD_SNAPSHOT_INTERVAL', 300))
+
+        # Access logs younger than this many seconds are left out of the daily rollups;
+        # must exceed the longest insert-to-commit delay (batched writers, open transactions)
+        self.rollup_safety_lag = int(os.getenv('ROLLUP_SAFETY_LAG', 300))
+
+        # HyperLogLog day sketches: days kept stored by the snapshot job, and how long
+        # after a day ends sightings may still be reported for it (computed live until then)
+        self.sketch_history_days = int(os.getenv('SKETCH_HISTORY_DAYS', 90))
+        self.sketch_settle_days = int(os.getenv('SKETCH_SETTLE_DAYS', 7))
+
+        # business_analytics retention: raw points, then hourly buckets (daily buckets are kept)
+        self.metric_raw_retention_days = int(os.getenv('METRIC_RAW_RETENTION_DAYS', 7))
+        self.metric_hourly_retention_days = int(os.getenv('METRIC_HOURLY_RETENTION_DAYS', 90))
+
     def get_connection_string(self) -> str:
         """Get database connection string"""
         return f"mysql+pymysql://{self.user}:{self.password}@{self.host}:{self.port}/{self.database}?charset={self.charset}"
@@ -4,10 +4,18 @@ Database connection manager with connection pooling
 """
 
 import pymysql
-from pymysql.cursors import DictCursor
+from pymysql.cursors import DictCursor, SSDictCursor
 from contextlib import contextmanager
-from typing import Optional, Dict, Any, List, Tuple
+from datetime import datetime, date
+from decimal import Decimal
+from typing import Optional, Dict, Any, List, Tuple, Iterator, Union
+import base64
+import contextvars
+import json
 import logging
+import queue
+import threading
+import time
 from config import db_config
 
 # Configure logging
@@ -15,49 +23,203 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+class PoolTimeoutError(pymysql.err.OperationalError):
+    """Raised when the pool cannot hand out a connection within pool_timeout"""
+    pass
+
+
+class ConnectionPool:
+    """Connection pool with a fixed core size and overflow connections
+
+    Up to pool_size connections are kept open and reused. When all of them
+    are busy, up to max_overflow extra connections are opened and closed
+    again as soon as they are returned. Once pool_size + max_overflow
+    connections are checked out, callers wait up to pool_timeout seconds.
+    """
+
+    def __init__(self, connect_params: Dict[str, Any], pool_size: int = 5,
+                 max_overflow: int = 10, pool_timeout: float = 30):
+        self.connect_params = connect_params
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_timeout = pool_timeout
+
+        self._idle = queue.LifoQueue(maxsize=pool_size)
+        self._lock = threading.Lock()
+        self._checked_out = 0
+        self._total = 0
+
+    def _create_connection(self):
+        """Open a new database connection"""
+        return pymysql.connect(
+            **self.connect_params,
+            cursorclass=DictCursor,
+            autocommit=False
+        )
+
+    def acquire(self):
+        """Check out a connection from the pool"""
+        deadline = time.monotonic() + self.pool_timeout
+
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = None
+
+            if conn is None:
+                with self._lock:
+                    can_open = self._total < self.pool_size + self.max_overflow
+                    if can_open:
+                        self._total += 1
+                if can_open:
+                    try:
+                        conn = self._create_connection()
+                    except Exception:
+                        with self._lock:
+                            self._total -= 1
+                        raise
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeoutError(
+                            f"Connection pool exhausted: {self.pool_size} + {self.max_overflow} "
+                            f"connections in use after waiting {self.pool_timeout}s"
+                        )
+                    try:
+                        # Poll so waiters notice slots freed by discarded connections
+                        conn = self._idle.get(timeout=min(remaining, 0.05))
+                    except queue.Empty:
+                        continue
+
+            if not conn.open:
+                self._forget(conn)
+                continue
+
+            with self._lock:
+                self._checked_out += 1
+            return conn
+
+    def release(self, conn, discard: bool = False):
+        """Return a connection to the pool (overflow and discarded connections are closed)"""
+        with self._lock:
+            self._checked_out -= 1
+
+        if conn.open and not discard:
+            try:
+                self._idle.put_nowait(conn)
+                return
+            except queue.Full:
+                pass
+        self._forget(conn)
+
+    def _forget(self, conn):
+        """Close a connection that leaves the pool"""
+        with self._lock:
+            self._total -= 1
+        try:
+            if conn.open:
+                conn.close()
+        except pymysql.Error:
+            pass
+
+    def status(self) -> Dict[str, int]:
+        """Get pool status"""
+        with self._lock:
+            return {
+                'pool_size': self.pool_size,
+                'max_overflow': self.max_overflow,
+                'checked_out': self._checked_out,
+                'idle': self._idle.qsize(),
+                'overflow': max(self._total - self.pool_size, 0),
+                'total': self._total
+            }
+
+    def dispose(self):
+        """Close all idle connections"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._forget(conn)
+
+
 class DatabaseManager:
-    """Database connection manager"""
+    """Database connection manager
+
+    Connections come from a ConnectionPool sized by DatabaseConfig. Inside a
+    get_cursor() block the calling thread is pinned to one connection, so
+    nested get_cursor() calls (and transaction() blocks) on the same thread
+    share that connection and are committed or rolled back together.
+    """
 
     def __init__(self):
         self.config = db_config.get_connection_params()
-        self.connection = None
+        self.pool = ConnectionPool(
+            self.config,
+            pool_size=db_config.pool_size,
+            max_overflow=db_config.max_overflow,
+            pool_timeout=db_config.pool_timeout
+        )
+        self._local = threading.local()
 
     def connect(self):
-        """Establish database connection"""
+        """Verify that a database connection can be established"""
         try:
-            self.connection = pymysql.connect(
-                **self.config,
-                cursorclass=DictCursor,
-                autocommit=False
-            )
+            conn = self.pool.acquire()
+            self.pool.release(conn)
             logger.info("Database connection successful")
-            return self.connection
         except pymysql.Error as e:
             logger.error(f"Database connection failed: {e}")
             raise
 
     def close(self):
-        """Close database connection"""
-        if self.connection:
-            self.connection.close()
-            logger.info("Database connection closed")
+        """Close idle pooled connections"""
+        self.pool.dispose()
+        logger.info("Database connection closed")
+
+    @property
+    def connection(self):
+        """Connection pinned to the current thread, if any"""
+        return getattr(self._local, 'connection', None)
 
     @contextmanager
     def get_cursor(self):
-        """Get database cursor (context manager)"""
-        if not self.connection or not self.connection.open:
-            self.connect()
+        """Get database cursor (context manager)
+
+        The outermost block on a thread checks a connection out of the pool
+        and commits (or rolls back) when it exits; nested blocks reuse it.
+        """
+        outermost = self.connection is None
+        if outermost:
+            self._local.connection = self.pool.acquire()
+            self._local.depth = 0
+        self._local.depth += 1
+        connection = self._local.connection
 
-        cursor = self.connection.cursor()
+        cursor = connection.cursor()
         try:
             yield cursor
-            self.connection.commit()
+            if outermost:
+                connection.commit()
         except Exception as e:
-            self.connection.rollback()
-            logger.error(f"Database operation failed: {e}")
+            if outermost:
+                connection.rollback()
+                logger.error(f"Database operation failed: {e}")
             raise
         finally:
             cursor.close()
+            self._local.depth -= 1
+            if outermost:
+                self._local.connection = None
+                self.pool.release(connection)
+
+    @contextmanager
+    def transaction(self):
+        """Run several model operations on one connection and commit once"""
+        with self.get_cursor():
+            yield self
 
     def execute_query(self, query: str, params: Optional[Tuple] = None) -> List[Dict[str, Any]]:
         """Execute query and return results"""
@@ -65,6 +227,38 @@ class DatabaseManager:
             cursor.execute(query, params or ())
             return cursor.fetchall()
 
+    def iter_query(self, query: str, params: Optional[Tuple] = None,
+                   batch_size: Optional[int] = None
+                   ) -> Iterator[Union[Dict[str, Any], List[Dict[str, Any]]]]:
+        """Execute query and yield rows one by one (or lists of batch_size rows)
+
+        Rows are streamed with an unbuffered server-side cursor, so memory use
+        does not depend on the size of the result. The stream holds its own
+        pooled connection (not the thread-pinned one), so other queries may run
+        while iterating. A stream abandoned before the end closes its connection
+        instead of reading the remaining rows.
+        """
+        connection = self.pool.acquire()
+        cursor = connection.cursor(SSDictCursor)
+        finished = False
+        try:
+            cursor.execute(query, params or ())
+            if batch_size:
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield rows
+            else:
+                for row in cursor:
+                    yield row
+            finished = True
+        finally:
+            if finished:
+                cursor.close()
+                connection.rollback()
+            self.pool.release(connection, discard=not finished)
+
     def execute_update(self, query: str, params: Optional[Tuple] = None) -> int:
         """Execute update/insert/delete operation"""
         with self.get_cursor() as cursor:
@@ -83,30 +277,207 @@ class DatabaseManager:
             affected_rows = cursor.executemany(query, params_list)
             return affected_rows
 
+    def pool_status(self) -> Dict[str, int]:
+        """Get connection pool status"""
+        return self.pool.status()
+
 
 # Global database manager instance
 db = DatabaseManager()
 
 
+class IdentityMap:
+    """Rows loaded during one unit of work, keyed by (table, lookup key)"""
+
+    _NOT_FOUND = object()
+
+    def __init__(self):
+        self._rows: Dict[Tuple, Any] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, key: Tuple, loader):
+        """Return the remembered result for key, loading it on first use"""
+        value = self._rows.get(key, self._NOT_FOUND)
+        if value is not self._NOT_FOUND:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = loader()
+        self._rows[key] = value
+        return value
+
+    def invalidate_table(self, table_name: str):
+        """Forget every row loaded from a table"""
+        for key in [key for key in self._rows if key[0] == table_name]:
+            del self._rows[key]
+
+
+_identity_map: contextvars.ContextVar = contextvars.ContextVar('identity_map', default=None)
+
+
+def current_identity_map() -> Optional[IdentityMap]:
+    """Identity map of the active unit of work, if any"""
+    return _identity_map.get()
+
+
+@contextmanager
+def unit_of_work():
+    """Scope in which repeated lookups of the same key are served from memory
+
+    Can be used as a context manager or a decorator (@unit_of_work()). Nested
+    scopes share the outermost identity map. Writes through BaseModel drop
+    the cached rows of the written table.
+    """
+    identity_map = _identity_map.get()
+    if identity_map is not None:
+        yield identity_map
+        return
+
+    token = _identity_map.set(IdentityMap())
+    try:
+        yield _identity_map.get()
+    finally:
+        _identity_map.reset(token)
+
+
+def _cursor_default(value):
+    if isinstance(value, datetime):
+        return {'$dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'$d': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'$dec': str(value)}
+    raise TypeError(f"Cannot encode {type(value).__name__} in a cursor")
+
+
+def _cursor_object_hook(obj):
+    if '$dt' in obj:
+        return datetime.fromisoformat(obj['$dt'])
+    if '$d' in obj:
+        return date.fromisoformat(obj['$d'])
+    if '$dec' in obj:
+        return Decimal(obj['$dec'])
+    return obj
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """Encode the (sort_key, primary_key) or (primary_key,) of the last row as an opaque cursor"""
+    raw = json.dumps(values, default=_cursor_default, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """Decode a cursor produced by encode_cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')),
+                            object_hook=_cursor_object_hook)
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise ValueError("Invalid pagination cursor") from e
+    if not isinstance(values, list) or len(values) not in (1, 2):
+        raise ValueError("Invalid pagination cursor")
+    return values
+
+
 class BaseModel:
     """Base model class, provides common database operation methods"""
 
     table_name = None
     primary_key = 'id'
 
+    @classmethod
+    def _identity_lookup(cls, key: Tuple, loader):
+        """Run loader once per unit of work for the given key"""
+        identity_map = current_identity_map()
+        if identity_map is None:
+            return loader()
+        return identity_map.get_or_load((cls.table_name,) + key, loader)
+
+    @classmethod
+    def _invalidate_identity_map(cls):
+        """Drop rows of this table remembered by the current unit of work"""
+        identity_map = current_identity_map()
+        if identity_map is not None:
+            identity_map.invalidate_table(cls.table_name)
+
     @classmethod
     def find_by_id(cls, id_value: int) -> Optional[Dict[str, Any]]:
         """Find record by ID"""
-        query = f"SELECT * FROM {cls.table_name} WHERE {cls.primary_key} = %s"
-        results = db.execute_query(query, (id_value,))
-        return results[0] if results else None
+        def load():
+            query = f"SELECT * FROM {cls.table_name} WHERE {cls.primary_key} = %s"
+            results = db.execute_query(query, (id_value,))
+            return results[0] if results else None
+
+        return cls._identity_lookup((cls.primary_key, id_value), load)
 
     @classmethod
     def find_all(cls, limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
-        """Find all records (with pagination)"""
+        """Find all records (with offset pagination; prefer find_page for deep pages)"""
         query = f"SELECT * FROM {cls.table_name} LIMIT %s OFFSET %s"
         return db.execute_query(query, (limit, offset))
 
+    @classmethod
+    def find_page(cls, cursor: Optional[str] = None, limit: int = 100,
+                  sort_column: Optional[str] = None,
+                  descending: bool = True) -> Dict[str, Any]:
+        """Find one page of records with keyset pagination"""
+        return cls._seek_page(f"SELECT * FROM {cls.table_name}", [], (),
+                              sort_column, cls.primary_key, cursor, limit, descending)
+
+    @classmethod
+    def _seek_page(cls, select_sql: str, conditions: List[str], params: Tuple,
+                   sort_column: Optional[str], pk_column: str, cursor: Optional[str],
+                   limit: int, descending: bool = True) -> Dict[str, Any]:
+        """Run a keyset (seek) paginated query ordered by (sort_column, pk_column)
+
+        Returns {'items': rows, 'next_cursor': str or None}. Pass next_cursor back
+        as cursor to fetch the following page; None means there are no more rows.
+        Columns may be qualified (e.g. 'ss.date_time'); the rows must expose the
+        unqualified names. With sort_column None (or equal to pk_column) the
+        query orders and seeks on pk_column alone.
+        """
+        if sort_column == pk_column:
+            sort_column = None
+        conditions = list(conditions)
+        params = tuple(params)
+        op = '<' if descending else '>'
+        direction = 'DESC' if descending else 'ASC'
+
+        if cursor:
+            values = decode_cursor(cursor)
+            if len(values) != (1 if sort_column is None else 2):
+                raise ValueError("Invalid pagination cursor")
+            if sort_column is None:
+                conditions.append(f"{pk_column} {op} %s")
+                params += (values[0],)
+            else:
+                sort_value, pk_value = values
+                conditions.append(f"({sort_column} {op} %s OR "
+                                  f"({sort_column} = %s AND {pk_column} {op} %s))")
+                params += (sort_value, sort_value, pk_value)
+
+        query = select_sql
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        if sort_column is None:
+            query += f" ORDER BY {pk_column} {direction}"
+        else:
+            query += f" ORDER BY {sort_column} {direction}, {pk_column} {direction}"
+        query += " LIMIT %s"
+
+        rows = db.execute_query(query, params + (limit + 1,))
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            pk_value = last[pk_column.split('.')[-1]]
+            if sort_column is None:
+                next_cursor = encode_cursor([pk_value])
+            else:
+                next_cursor = encode_cursor([last[sort_column.split('.')[-1]], pk_value])
+        return {'items': rows, 'next_cursor': next_cursor}
+
     @classmethod
     def find_by_condition(cls, conditions: Dict[str, Any], limit: int = 100) -> List[Dict[str, Any]]:
         """Find records by condition"""
@@ -122,6 +493,7 @@ class BaseModel:
         columns = ", ".join(data.keys())
         placeholders = ", ".join(["%s"] * len(data))
         query = f"INSERT INTO {cls.table_name} ({columns}) VALUES ({placeholders})"
+        cls._invalidate_identity_map()
         return db.execute_insert(query, tuple(data.values()))
 
     @classmethod
@@ -131,12 +503,14 @@ class BaseModel:
         set_sql = ", ".join(set_clauses)
         query = f"UPDATE {cls.table_name} SET {set_sql} WHERE {cls.primary_key} = %s"
         params = tuple(data.values()) + (id_value,)
+        cls._invalidate_identity_map()
         return db.execute_update(query, params)
 
     @classmethod
     def delete(cls, id_value: int) -> int:
         """Delete record"""
         query = f"DELETE FROM {cls.table_name} WHERE {cls.primary_key} = %s"
+        cls._invalidate_identity_map()
         return db.execute_update(query, (id_value,))
 
     @classmethod
@@ -0,0 +1,139 @@
+"""
+Komodo Hub - Geospatial Helpers
+Geohash encoding, great-circle distances and index-friendly prefix coverings
+"""
+
+import math
+from typing import List, Tuple
+
+# Mean Earth radius used for all distance calculations
+EARTH_RADIUS_KM = 6371.0088
+
+# Precision of the stored species_sightings.geohash (cells of roughly 4.8 m x 4.8 m)
+GEOHASH_PRECISION = 9
+
+# A bounding box is covered by at most this many geohash prefixes
+MAX_COVERING_CELLS = 32
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def validate_coordinates(latitude: float, longitude: float) -> Tuple[float, float]:
+    """Return (latitude, longitude) as floats, raising ValueError when out of range"""
+    latitude, longitude = float(latitude), float(longitude)
+    if not (math.isfinite(latitude) and -90.0 <= latitude <= 90.0):
+        raise ValueError(f"Latitude out of range: {latitude}")
+    if not (math.isfinite(longitude) and -180.0 <= longitude <= 180.0):
+        raise ValueError(f"Longitude out of range: {longitude}")
+    return latitude, longitude
+
+
+def encode(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Geohash of a point; nearby points share a prefix, so a prefix is a cell"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = bit_count = 0
+    even = True
+
+    while len(chars) < precision:
+        value, bounds = (longitude, lng_range) if even else (latitude, lat_range)
+        mid = (bounds[0] + bounds[1]) / 2
+        if value >= mid:
+            bits = bits * 2 + 1
+            bounds[0] = mid
+        else:
+            bits = bits * 2
+            bounds[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = bit_count = 0
+
+    return ''.join(chars)
+
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """(latitude degrees, longitude degrees) spanned by one cell of this precision"""
+    total_bits = 5 * precision
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance between two points in kilometres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _wrap_longitude(longitude: float) -> float:
+    return (longitude + 180.0) % 360.0 - 180.0
+
+
+def bounding_box(latitude: float, longitude: float,
+                 radius_km: float) -> Tuple[float, float, float, float]:
+    """(min_lat, min_lng, max_lat, max_lng) enclosing a circle
+
+    When the box crosses the antimeridian min_lng is greater than max_lng.
+    Circles reaching a pole span every longitude.
+    """
+    angular = radius_km / EARTH_RADIUS_KM
+    d_lat = math.degrees(angular)
+    min_lat, max_lat = latitude - d_lat, latitude + d_lat
+    if min_lat <= -90.0 or max_lat >= 90.0:
+        return max(min_lat, -90.0), -180.0, min(max_lat, 90.0), 180.0
+
+    ratio = math.sin(angular) / math.cos(math.radians(latitude))
+    if ratio >= 1.0:
+        return min_lat, -180.0, max_lat, 180.0
+    d_lng = math.degrees(math.asin(ratio))
+    if d_lng >= 180.0:
+        return min_lat, -180.0, max_lat, 180.0
+    return min_lat, _wrap_longitude(longitude - d_lng), max_lat, _wrap_longitude(longitude + d_lng)
+
+
+def _cell_span(low: float, high: float, origin: float, size: float, cells: int) -> Tuple[int, int]:
+    first = min(int(math.floor((low - origin) / size)), cells - 1)
+    last = min(int(math.floor((high - origin) / size)), cells - 1)
+    return max(first, 0), max(last, 0)
+
+
+def covering_prefixes(min_lat: float, min_lng: float, max_lat: float, max_lng: float,
+                      max_cells: int = MAX_COVERING_CELLS) -> List[str]:
+    """Geohash prefixes whose cells together cover the bounding box
+
+    Picks the finest precision needing at most max_cells cells, so each
+    prefix becomes one range scan on the geohash index. Returns [''] when
+    only the whole world fits (no index condition at all).
+    """
+    if min_lng <= max_lng:
+        lng_ranges = [(min_lng, max_lng)]
+    else:
+        lng_ranges = [(min_lng, 180.0), (-180.0, max_lng)]
+
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        lat_size, lng_size = cell_size(precision)
+        lat_cells = int(round(180.0 / lat_size))
+        lng_cells = int(round(360.0 / lng_size))
+        rows = _cell_span(min_lat, max_lat, -90.0, lat_size, lat_cells)
+        columns = [_cell_span(low, high, -180.0, lng_size, lng_cells) for low, high in lng_ranges]
+
+        count = (rows[1] - rows[0] + 1) * sum(last - first + 1 for first, last in columns)
+        if count > max_cells:
+            continue
+
+        prefixes = set()
+        for row in range(rows[0], rows[1] + 1):
+            center_lat = -90.0 + (row + 0.5) * lat_size
+            for first, last in columns:
+                for column in range(first, last + 1):
+                    center_lng = -180.0 + (column + 0.5) * lng_size
+                    prefixes.add(encode(center_lat, center_lng, precision))
+        return sorted(prefixes)
+
+    return ['']
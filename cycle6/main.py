@@ -12,6 +12,7 @@ from models.program_models import (Program, ProgramEnrollment, ContentLibrary,
 from models.analytics_models import AccessLog, BusinessAnalytics
 from services import (PermissionService, TeacherService, StudentService,
                       PrincipalService, PublicService)
+from snapshots import dashboard_snapshots
 
 
 class KomodoHub:
@@ -27,6 +28,8 @@ class KomodoHub:
         try:
             self.db.connect()
             print("✅ Database connected successfully")
+            # Dashboard snapshots are refreshed in the background from now on
+            dashboard_snapshots.start()
             return True
         except Exception as e:
             print(f"❌ Database connection failed: {e}")
@@ -34,6 +37,7 @@ class KomodoHub:
 
     def close(self):
         """Close database connection"""
+        dashboard_snapshots.stop(timeout=5)
         self.db.close()
         print("Database connection closed")
 
@@ -340,10 +344,11 @@ class KomodoHub:
         print("-" * 50)
 
         try:
-            # Generate dashboard data
-            dashboard = BusinessAnalytics.generate_dashboard_data()
+            # Read the latest snapshot produced by the background scheduler
+            snapshot = dashboard_snapshots.get()
+            dashboard = snapshot['data']
 
-            print(f"✅ Dashboard generated:")
+            print(f"✅ Dashboard snapshot v{snapshot['version']} ({snapshot['generated_at']}):")
             print(f"\n📈 User Demographics:")
             for user_type, count in dashboard['user_demographics'].items():
                 print(f"   - {user_type}: {count}")
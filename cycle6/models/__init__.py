@@ -6,8 +6,10 @@ All database models for the Komodo Hub system
 from .user_models import User, Organization, OrganizationMember, UserProfile
 from .class_models import Class, ClassEnrollment, Activity, Submission, Assessment
 from .program_models import (Program, ProgramEnrollment, ContentLibrary,
-                             SpeciesSighting, CreativeCanvas, Message, Note)
-from .analytics_models import AccessLog, BusinessAnalytics
+                             SpeciesSighting, TooManySightingsError, CreativeCanvas,
+                             Message, Note)
+from .analytics_models import (AccessLog, AccessLogRollup, DistinctSketch,
+                               BusinessAnalytics, DashboardSnapshot)
 
 __all__ = [
     # User models
@@ -28,13 +30,17 @@ __all__ = [
     'ProgramEnrollment',
     'ContentLibrary',
     'SpeciesSighting',
+    'TooManySightingsError',
     'CreativeCanvas',
     'Message',
     'Note',
 
     # Analytics models
     'AccessLog',
-    'BusinessAnalytics'
+    'AccessLogRollup',
+    'DistinctSketch',
+    'BusinessAnalytics',
+    'DashboardSnapshot'
 ]
 
 __version__ = '1.0.0'
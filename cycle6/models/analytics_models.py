@@ -3,9 +3,11 @@ Komodo Hub - Analytics and Log Models
 Analytics and Access Log models
 """
 
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterator, Tuple
 from datetime import datetime, date, timedelta
 from database import BaseModel, db
+from config import db_config
+from hll import HyperLogLog
 import json
 
 
@@ -49,49 +51,43 @@ class AccessLog(BaseModel):
         return db.execute_query(query, (action, limit))
 
     @classmethod
-    def get_logs_by_date_range(cls, start_date: datetime, end_date: datetime,
-                               user_id: Optional[int] = None) -> List[Dict[str, Any]]:
-        """Get logs by date range"""
+    def iter_logs_by_date_range(cls, start_date: datetime, end_date: datetime,
+                                user_id: Optional[int] = None,
+                                batch_size: Optional[int] = None) -> Iterator[Any]:
+        """Stream logs by date range without loading them all into memory"""
         if user_id:
             query = f"""
                 SELECT * FROM {cls.table_name} 
                 WHERE timestamp BETWEEN %s AND %s AND user_id = %s
                 ORDER BY timestamp DESC
             """
-            return db.execute_query(query, (start_date, end_date, user_id))
+            return db.iter_query(query, (start_date, end_date, user_id), batch_size)
         else:
             query = f"""
                 SELECT * FROM {cls.table_name} 
                 WHERE timestamp BETWEEN %s AND %s
                 ORDER BY timestamp DESC
             """
-            return db.execute_query(query, (start_date, end_date))
+            return db.iter_query(query, (start_date, end_date), batch_size)
 
     @classmethod
     def get_activity_summary(cls, days: int = 7) -> Dict[str, Any]:
-        """Get summary of activities in the past N days"""
-        start_date = datetime.now() - timedelta(days=days)
-
-        query = """
-                SELECT
-                    action, COUNT (*) as count, COUNT (DISTINCT user_id) as unique_users
-                FROM access_logs
-                WHERE timestamp >= %s
-                GROUP BY action
-                ORDER BY count DESC \
-                """
+        """Get summary of activities in the past N days (whole days including today, from rollups)
 
-        results = db.execute_query(query, (start_date,))
+        Reads the rollups as last refreshed by the dashboard snapshot job.
+        """
+        start_date = date.today() - timedelta(days=days - 1)
 
         return {
             'period_days': days,
             'start_date': start_date.isoformat(),
-            'activities': results
+            'activities': AccessLogRollup.get_action_summary(start_date)
         }
 
     @classmethod
-    def get_student_data_access_audit(cls, student_id: int) -> List[Dict[str, Any]]:
-        """Audit student data access (security compliance)"""
+    def iter_student_data_access_audit(cls, student_id: int,
+                                       batch_size: Optional[int] = None) -> Iterator[Any]:
+        """Stream the student data access audit trail (security compliance)"""
         query = """
                 SELECT al.*, u.username as accessor_name, u.user_type
                 FROM access_logs al
@@ -100,7 +96,337 @@ class AccessLog(BaseModel):
                   AND al.target_id = %s
                 ORDER BY al.timestamp DESC \
                 """
-        return db.execute_query(query, (student_id,))
+        return db.iter_query(query, (student_id,), batch_size)
+
+
+class AccessLogRollup(BaseModel):
+    """Incrementally maintained daily aggregates of access_logs
+
+    access_log_daily_counts holds event counts per (day, action, user_type) and
+    access_log_daily_users the distinct (day, action, user_id) triples. refresh()
+    folds in logs newer than the watermark stored in rollup_watermarks; each
+    chunk and its watermark advance commit in one transaction under a row lock,
+    so re-runs (or concurrent runs) never count a log twice.
+
+    log_id is allocated before a row commits, so a lower id can become visible
+    after a higher one (concurrent inserts, batched writers). The watermark
+    therefore never passes a log younger than db_config.rollup_safety_lag
+    seconds; such logs and everything after them wait for a later refresh.
+    The dashboard snapshot job runs refresh(); readers never do.
+    """
+
+    table_name = 'access_log_daily_counts'
+    primary_key = 'day'
+
+    WATERMARK_NAME = 'access_logs_daily'
+    ANONYMOUS = 'anonymous'
+
+    @classmethod
+    def refresh(cls, chunk_size: int = 50000, safety_lag: Optional[int] = None) -> int:
+        """Fold settled access logs into the rollups, returns number of logs processed"""
+        max_id = cls._settled_max_id(db_config.rollup_safety_lag if safety_lag is None else safety_lag)
+
+        processed = 0
+        while True:
+            with db.transaction():
+                db.execute_update(
+                    "INSERT IGNORE INTO rollup_watermarks (rollup_name, last_log_id) VALUES (%s, 0)",
+                    (cls.WATERMARK_NAME,)
+                )
+                rows = db.execute_query(
+                    "SELECT last_log_id FROM rollup_watermarks WHERE rollup_name = %s FOR UPDATE",
+                    (cls.WATERMARK_NAME,)
+                )
+                low = rows[0]['last_log_id']
+                if low >= max_id:
+                    break
+                high = min(low + chunk_size, max_id)
+
+                cls._fold_range(low, high)
+                db.execute_update(
+                    "UPDATE rollup_watermarks SET last_log_id = %s WHERE rollup_name = %s",
+                    (high, cls.WATERMARK_NAME)
+                )
+            processed += high - low
+
+        return processed
+
+    @classmethod
+    def _settled_max_id(cls, safety_lag: int) -> int:
+        """Highest log_id the watermark may advance to
+
+        Stops just before the first log past the watermark that is younger
+        than safety_lag seconds. Only logs past the watermark are scanned.
+        """
+        rows = db.execute_query(
+            "SELECT last_log_id FROM rollup_watermarks WHERE rollup_name = %s",
+            (cls.WATERMARK_NAME,)
+        )
+        watermark = rows[0]['last_log_id'] if rows else 0
+
+        result = db.execute_query("""
+            SELECT MIN(log_id) as first_recent
+            FROM access_logs
+            WHERE log_id > %s AND timestamp >= NOW() - INTERVAL %s SECOND
+        """, (watermark, safety_lag))
+        if result and result[0]['first_recent']:
+            return result[0]['first_recent'] - 1
+
+        result = db.execute_query(
+            "SELECT MAX(log_id) as max_id FROM access_logs WHERE log_id > %s", (watermark,)
+        )
+        return result[0]['max_id'] if result and result[0]['max_id'] else watermark
+
+    @classmethod
+    def _fold_range(cls, low: int, high: int):
+        """Add logs with low < log_id <= high to the rollup tables"""
+        db.execute_update("""
+            INSERT INTO access_log_daily_counts (day, action, user_type, event_count)
+            SELECT DATE(al.timestamp), al.action, COALESCE(u.user_type, %s), COUNT(*)
+            FROM access_logs al
+                     LEFT JOIN users u ON al.user_id = u.user_id
+            WHERE al.log_id > %s AND al.log_id <= %s
+            GROUP BY DATE(al.timestamp), al.action, COALESCE(u.user_type, %s)
+            ON DUPLICATE KEY UPDATE event_count = event_count + VALUES(event_count)
+        """, (cls.ANONYMOUS, low, high, cls.ANONYMOUS))
+
+        db.execute_update("""
+            INSERT IGNORE INTO access_log_daily_users (day, action, user_id, user_type)
+            SELECT DISTINCT DATE(al.timestamp), al.action, al.user_id, u.user_type
+            FROM access_logs al
+                     JOIN users u ON al.user_id = u.user_id
+            WHERE al.log_id > %s AND al.log_id <= %s
+        """, (low, high))
+
+    @classmethod
+    def get_daily_active_users(cls, day: date) -> int:
+        """Distinct users with any logged action on a day"""
+        query = "SELECT COUNT(DISTINCT user_id) as count FROM access_log_daily_users WHERE day = %s"
+        result = db.execute_query(query, (day,))
+        return result[0]['count'] if result else 0
+
+    @classmethod
+    def get_daily_active_users_by_type(cls, day: date) -> Dict[str, int]:
+        """Distinct active users on a day, per user type"""
+        query = """
+                SELECT user_type, COUNT(DISTINCT user_id) as count
+                FROM access_log_daily_users
+                WHERE day = %s
+                GROUP BY user_type \
+                """
+        return {row['user_type']: row['count'] for row in db.execute_query(query, (day,))}
+
+    @classmethod
+    def get_action_summary(cls, start_day: date,
+                           end_day: Optional[date] = None) -> List[Dict[str, Any]]:
+        """Event count and distinct users per action for days in [start_day, end_day]"""
+        end_day = end_day or date.today()
+        counts = db.execute_query("""
+            SELECT action, SUM(event_count) as count
+            FROM access_log_daily_counts
+            WHERE day BETWEEN %s AND %s
+            GROUP BY action
+            ORDER BY count DESC
+        """, (start_day, end_day))
+        users = db.execute_query("""
+            SELECT action, COUNT(DISTINCT user_id) as unique_users
+            FROM access_log_daily_users
+            WHERE day BETWEEN %s AND %s
+            GROUP BY action
+        """, (start_day, end_day))
+
+        unique_users = {row['action']: row['unique_users'] for row in users}
+        return [{
+            'action': row['action'],
+            'count': int(row['count']),
+            'unique_users': unique_users.get(row['action'], 0)
+        } for row in counts]
+
+    @classmethod
+    def get_daily_counts(cls, start_day: date, end_day: Optional[date] = None,
+                         action: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Per-day event counts by action and user type"""
+        query = """
+                SELECT day, action, user_type, event_count
+                FROM access_log_daily_counts
+                WHERE day BETWEEN %s AND %s \
+                """
+        params = [start_day, end_day or date.today()]
+        if action:
+            query += " AND action = %s"
+            params.append(action)
+        query += " ORDER BY day, action, user_type"
+        return db.execute_query(query, tuple(params))
+
+
+class DistinctSketch(BaseModel):
+    """Per-day HyperLogLog sketches stored in business_analytics
+
+    One row per (metric_type, day): recorded_at is the day at midnight,
+    metric_value the day's estimate and metric_data holds the serialized
+    sketch with the time it was built. A stored sketch is final once it was
+    built after the day ended plus a settle period (the rollup safety lag for
+    active users, SKETCH_SETTLE_DAYS for late-reported sightings); newer days
+    are computed on read and never stored. Merging the sketches of a window
+    gives its distinct count at a cost that depends on the number of days,
+    not on the number of rows.
+
+    Reads (estimate, estimate_windows) never write; refresh_stored() is run
+    by the dashboard snapshot job to store final sketches.
+    """
+
+    table_name = 'business_analytics'
+    primary_key = 'analytics_id'
+
+    PRECISION = 12
+
+    ACTIVE_USERS = 'active_users_sketch'
+    SIGHTING_REPORTERS = 'sighting_reporters_sketch'
+
+    # Query returning the distinct values of one day, given [day, next day)
+    SOURCES = {
+        ACTIVE_USERS: """
+            SELECT DISTINCT user_id as value
+            FROM access_log_daily_users
+            WHERE day >= DATE(%s) AND day < DATE(%s)
+        """,
+        SIGHTING_REPORTERS: """
+            SELECT reported_by as value
+            FROM species_sightings
+            WHERE date_time >= %s AND date_time < %s
+        """,
+    }
+
+    @classmethod
+    def _day_bounds(cls, day: date) -> Tuple[datetime, datetime]:
+        start = datetime.combine(day, datetime.min.time())
+        return start, start + timedelta(days=1)
+
+    @classmethod
+    def settled_at(cls, metric_type: str, day: date) -> datetime:
+        """Time after which a day's values no longer change"""
+        if metric_type == cls.ACTIVE_USERS:
+            settle = timedelta(seconds=db_config.rollup_safety_lag)
+        else:
+            settle = timedelta(days=db_config.sketch_settle_days)
+        return cls._day_bounds(day)[1] + settle
+
+    @classmethod
+    def compute_day(cls, metric_type: str, day: date) -> HyperLogLog:
+        """Compute the sketch of one day without storing it"""
+        sketch = HyperLogLog(cls.PRECISION)
+        for rows in db.iter_query(cls.SOURCES[metric_type], cls._day_bounds(day), 5000):
+            sketch.update(row['value'] for row in rows)
+        return sketch
+
+    @classmethod
+    def build_day(cls, metric_type: str, day: date) -> HyperLogLog:
+        """Compute and store the sketch of one day"""
+        built_at = datetime.now().replace(microsecond=0)
+        sketch = cls.compute_day(metric_type, day)
+        start = cls._day_bounds(day)[0]
+
+        with db.transaction():
+            db.execute_update(
+                f"DELETE FROM {cls.table_name} WHERE metric_type = %s AND recorded_at = %s",
+                (metric_type, start)
+            )
+            db.execute_insert(
+                f"""INSERT INTO {cls.table_name} (metric_type, metric_value, metric_data, recorded_at)
+                    VALUES (%s, %s, %s, %s)""",
+                (metric_type, sketch.count(),
+                 json.dumps({'day': day.isoformat(), 'precision': cls.PRECISION,
+                             'built_at': built_at.isoformat(), 'sketch': sketch.to_string()}),
+                 start)
+            )
+        return sketch
+
+    @classmethod
+    def invalidate_day(cls, metric_type: str, day: date) -> int:
+        """Drop a stored sketch whose day received new values (rebuilt on the next refresh)"""
+        return db.execute_update(
+            f"DELETE FROM {cls.table_name} WHERE metric_type = %s AND recorded_at = %s",
+            (metric_type, cls._day_bounds(day)[0])
+        )
+
+    @classmethod
+    def load_days(cls, metric_type: str, start_day: date,
+                  end_day: date) -> Dict[date, HyperLogLog]:
+        """Load the final stored sketches for days in [start_day, end_day]"""
+        query = f"""
+            SELECT recorded_at, metric_data FROM {cls.table_name}
+            WHERE metric_type = %s AND recorded_at >= %s AND recorded_at < %s
+        """
+        results = db.execute_query(query, (
+            metric_type,
+            cls._day_bounds(start_day)[0],
+            cls._day_bounds(end_day)[1]
+        ))
+
+        sketches = {}
+        for row in results:
+            data = row['metric_data']
+            data = json.loads(data) if isinstance(data, (str, bytes)) else data
+            day = row['recorded_at'].date()
+            # Sketches without built_at predate the marker and may be partial
+            built_at = data.get('built_at')
+            if not built_at or datetime.fromisoformat(built_at) < cls.settled_at(metric_type, day):
+                continue
+            sketches[day] = HyperLogLog.from_string(data['sketch'], data.get('precision', cls.PRECISION))
+        return sketches
+
+    @classmethod
+    def estimate_windows(cls, metric_type: str, windows: List[int],
+                         end_day: Optional[date] = None) -> Dict[int, int]:
+        """Estimated distinct counts for several windows of days ending at end_day
+
+        Each day without a final stored sketch is computed once and shared by
+        every window containing it.
+        """
+        today = date.today()
+        end_day = min(end_day or today, today)
+        start_day = end_day - timedelta(days=max(windows) - 1)
+
+        stored = cls.load_days(metric_type, start_day, end_day)
+        merged = {days: HyperLogLog(cls.PRECISION) for days in windows}
+        day = end_day
+        offset = 0
+        while day >= start_day:
+            sketch = stored.get(day)
+            if sketch is None:
+                sketch = cls.compute_day(metric_type, day)
+            for days, window in merged.items():
+                if offset < days:
+                    window.merge(sketch)
+            day -= timedelta(days=1)
+            offset += 1
+        return {days: window.count() for days, window in merged.items()}
+
+    @classmethod
+    def estimate(cls, metric_type: str, days: int,
+                 end_day: Optional[date] = None) -> int:
+        """Estimated distinct count over the `days` days ending at end_day (inclusive)"""
+        return cls.estimate_windows(metric_type, [days], end_day)[days]
+
+    @classmethod
+    def refresh_stored(cls, metric_type: str, days: Optional[int] = None) -> int:
+        """Store sketches for settled days that lack a final one, returns days built
+
+        Active-user sketches come from the rollups; refresh those first.
+        """
+        now = datetime.now()
+        end_day = date.today()
+        start_day = end_day - timedelta(days=(days or db_config.sketch_history_days) - 1)
+        stored = cls.load_days(metric_type, start_day, end_day)
+
+        built = 0
+        day = start_day
+        while day <= end_day:
+            if day not in stored and cls.settled_at(metric_type, day) <= now:
+                cls.build_day(metric_type, day)
+                built += 1
+            day += timedelta(days=1)
+        return built
 
 
 class BusinessAnalytics(BaseModel):
@@ -111,6 +437,7 @@ class BusinessAnalytics(BaseModel):
 
     # Metric type constants
     DAILY_ACTIVE_USERS = 'daily_active_users'
+    WEEKLY_ACTIVE_USERS = 'weekly_active_users'
     MONTHLY_ACTIVE_USERS = 'monthly_active_users'
     NEW_REGISTRATIONS = 'new_registrations'
     SUBSCRIPTION_REVENUE = 'subscription_revenue'
@@ -120,45 +447,159 @@ class BusinessAnalytics(BaseModel):
     SUBMISSION_RATE = 'submission_rate'
     ASSESSMENT_COMPLETION_RATE = 'assessment_completion_rate'
 
+    # Bucket resolutions kept in metric_buckets, with their width
+    RESOLUTIONS = {'hour': timedelta(hours=1), 'day': timedelta(days=1)}
+
     @classmethod
     def record_metric(cls, metric_type: str, metric_value: float,
                       metric_data: Optional[Dict] = None) -> int:
-        """Record business metric"""
+        """Record business metric
+
+        Besides the raw row, updates the hourly and daily min/max/avg buckets
+        and the metric_latest side table in the same transaction.
+        """
+        recorded_at = datetime.now().replace(microsecond=0)
         data = {
             'metric_type': metric_type,
-            'metric_value': metric_value
+            'metric_value': metric_value,
+            'recorded_at': recorded_at
         }
 
         if metric_data:
             data['metric_data'] = json.dumps(metric_data)
 
-        return cls.insert(data)
+        with db.transaction():
+            analytics_id = cls.insert(data)
+
+            db.execute_update("""
+                INSERT INTO metric_latest (metric_type, analytics_id, metric_value, metric_data, recorded_at)
+                VALUES (%s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE analytics_id = VALUES(analytics_id),
+                                        metric_value = VALUES(metric_value),
+                                        metric_data = VALUES(metric_data),
+                                        recorded_at = VALUES(recorded_at)
+            """, (metric_type, analytics_id, metric_value, data.get('metric_data'), recorded_at))
+
+            db.execute_many("""
+                INSERT INTO metric_buckets (metric_type, resolution, bucket_start, sample_count,
+                                            min_value, max_value, sum_value)
+                VALUES (%s, %s, %s, 1, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE sample_count = sample_count + 1,
+                                        min_value = LEAST(min_value, VALUES(min_value)),
+                                        max_value = GREATEST(max_value, VALUES(max_value)),
+                                        sum_value = sum_value + VALUES(sum_value)
+            """, [(metric_type, resolution, cls._bucket_start(recorded_at, resolution),
+                   metric_value, metric_value, metric_value)
+                  for resolution in cls.RESOLUTIONS])
+
+        return analytics_id
+
+    @staticmethod
+    def _bucket_start(moment: datetime, resolution: str) -> datetime:
+        if resolution == 'hour':
+            return moment.replace(minute=0, second=0, microsecond=0)
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    @classmethod
+    def choose_resolution(cls, days: float) -> str:
+        """Coarsest resolution that still gives a useful number of points"""
+        if days <= min(db_config.metric_raw_retention_days, 2):
+            return 'raw'
+        if days <= min(db_config.metric_hourly_retention_days, 14):
+            return 'hour'
+        return 'day'
 
     @classmethod
-    def get_metric_history(cls, metric_type: str, days: int = 30) -> List[Dict[str, Any]]:
-        """Get historical data for a metric"""
+    def get_metric_history(cls, metric_type: str, days: int = 30,
+                           resolution: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get historical data for a metric, newest first
+
+        The resolution ('raw', 'hour' or 'day') is picked from the window size
+        unless given. Bucketed points report the average as metric_value along
+        with min_value, max_value and sample_count.
+        """
         start_date = datetime.now() - timedelta(days=days)
+        resolution = resolution or cls.choose_resolution(days)
 
-        query = f"""
-            SELECT * FROM {cls.table_name}
-            WHERE metric_type = %s AND recorded_at >= %s
-            ORDER BY recorded_at DESC
+        if resolution == 'raw':
+            query = f"""
+                SELECT *, 'raw' as resolution FROM {cls.table_name}
+                WHERE metric_type = %s AND recorded_at >= %s
+                ORDER BY recorded_at DESC
+            """
+            return db.execute_query(query, (metric_type, start_date))
+
+        if resolution not in cls.RESOLUTIONS:
+            raise ValueError(f"Unknown resolution: {resolution}")
+
+        query = """
+            SELECT metric_type, resolution, bucket_start as recorded_at,
+                   sum_value / sample_count as metric_value,
+                   min_value, max_value, sample_count
+            FROM metric_buckets
+            WHERE metric_type = %s AND resolution = %s AND bucket_start >= %s
+            ORDER BY bucket_start DESC
         """
-        return db.execute_query(query, (metric_type, start_date))
+        return db.execute_query(query, (metric_type, resolution,
+                                        cls._bucket_start(start_date, resolution)))
 
     @classmethod
-    def get_latest_metrics(cls) -> Dict[str, Any]:
-        """Get the latest values of all metrics"""
-        query = """
-                SELECT ba1.*
-                FROM business_analytics ba1
-                         INNER JOIN (SELECT metric_type, MAX(recorded_at) as max_date \
-                                     FROM business_analytics \
-                                     GROUP BY metric_type) ba2 ON ba1.metric_type = ba2.metric_type
-                    AND ba1.recorded_at = ba2.max_date \
-                """
+    def downsample(cls, now: Optional[datetime] = None) -> Dict[str, int]:
+        """Apply retention: drop raw rows and hourly buckets past their horizon
 
-        results = db.execute_query(query)
+        Daily buckets are kept indefinitely. Sketch rows (DistinctSketch) live
+        in the same table but are not metric points and are left alone.
+        """
+        now = now or datetime.now()
+        raw_cutoff = now - timedelta(days=db_config.metric_raw_retention_days)
+        hour_cutoff = now - timedelta(days=db_config.metric_hourly_retention_days)
+
+        raw_deleted = db.execute_update(f"""
+            DELETE FROM {cls.table_name}
+            WHERE recorded_at < %s AND metric_type NOT IN (%s, %s)
+        """, (raw_cutoff, DistinctSketch.ACTIVE_USERS, DistinctSketch.SIGHTING_REPORTERS))
+        hours_deleted = db.execute_update(
+            "DELETE FROM metric_buckets WHERE resolution = 'hour' AND bucket_start < %s",
+            (hour_cutoff,)
+        )
+        return {'raw_deleted': raw_deleted, 'hour_buckets_deleted': hours_deleted}
+
+    @classmethod
+    def rebuild_metric_rollups(cls) -> None:
+        """Rebuild metric_buckets and metric_latest from the raw rows (one-off backfill)"""
+        excluded = (DistinctSketch.ACTIVE_USERS, DistinctSketch.SIGHTING_REPORTERS)
+        formats = {'hour': '%%Y-%%m-%%d %%H:00:00', 'day': '%%Y-%%m-%%d 00:00:00'}
+
+        with db.transaction():
+            for resolution, fmt in formats.items():
+                db.execute_update(f"""
+                    INSERT INTO metric_buckets (metric_type, resolution, bucket_start, sample_count,
+                                                min_value, max_value, sum_value)
+                    SELECT metric_type, %s, DATE_FORMAT(recorded_at, '{fmt}'), COUNT(*),
+                           MIN(metric_value), MAX(metric_value), SUM(metric_value)
+                    FROM {cls.table_name}
+                    WHERE metric_type NOT IN (%s, %s) AND metric_value IS NOT NULL
+                    GROUP BY metric_type, DATE_FORMAT(recorded_at, '{fmt}')
+                    ON DUPLICATE KEY UPDATE sample_count = VALUES(sample_count),
+                                            min_value = VALUES(min_value),
+                                            max_value = VALUES(max_value),
+                                            sum_value = VALUES(sum_value)
+                """, (resolution,) + excluded)
+
+            db.execute_update(f"""
+                REPLACE INTO metric_latest (metric_type, analytics_id, metric_value, metric_data, recorded_at)
+                SELECT ba.metric_type, ba.analytics_id, ba.metric_value, ba.metric_data, ba.recorded_at
+                FROM {cls.table_name} ba
+                         JOIN (SELECT metric_type, MAX(analytics_id) as analytics_id
+                               FROM {cls.table_name}
+                               WHERE metric_type NOT IN (%s, %s)
+                               GROUP BY metric_type) newest ON newest.analytics_id = ba.analytics_id
+            """, excluded)
+
+    @classmethod
+    def get_latest_metrics(cls) -> Dict[str, Any]:
+        """Get the latest values of all metrics (from the metric_latest side table)"""
+        results = db.execute_query("SELECT * FROM metric_latest")
 
         # Format as dict
         metrics = {}
@@ -173,24 +614,38 @@ class BusinessAnalytics(BaseModel):
         return metrics
 
     @classmethod
-    def calculate_daily_active_users(cls) -> int:
-        """Calculate number of daily active users"""
-        today = date.today()
-        query = """
-                SELECT COUNT(DISTINCT user_id) as count
-                FROM access_logs
-                WHERE DATE (timestamp) = %s \
-                """
-        result = db.execute_query(query, (today,))
-        count = result[0]['count'] if result else 0
+    def calculate_daily_active_users(cls, record: bool = True) -> int:
+        """Calculate number of daily active users (from the access log rollups)"""
+        count = AccessLogRollup.get_daily_active_users(date.today())
 
-        # Record metric
-        cls.record_metric(cls.DAILY_ACTIVE_USERS, count)
+        if record:
+            cls.record_metric(cls.DAILY_ACTIVE_USERS, count)
 
         return count
 
     @classmethod
-    def calculate_user_demographics(cls) -> Dict[str, int]:
+    def estimate_active_users(cls, days: int, end_day: Optional[date] = None) -> int:
+        """Approximate distinct active users over a window of days (HyperLogLog)"""
+        return DistinctSketch.estimate(DistinctSketch.ACTIVE_USERS, days, end_day)
+
+    @classmethod
+    def calculate_active_user_windows(cls, record: bool = True) -> Dict[str, int]:
+        """Approximate DAU / WAU / MAU from merged daily sketches"""
+        estimates = DistinctSketch.estimate_windows(DistinctSketch.ACTIVE_USERS, [1, 7, 30])
+        windows = {
+            cls.DAILY_ACTIVE_USERS: estimates[1],
+            cls.WEEKLY_ACTIVE_USERS: estimates[7],
+            cls.MONTHLY_ACTIVE_USERS: estimates[30],
+        }
+
+        if record:
+            for metric_type in (cls.WEEKLY_ACTIVE_USERS, cls.MONTHLY_ACTIVE_USERS):
+                cls.record_metric(metric_type, windows[metric_type], {'approximate': True})
+
+        return windows
+
+    @classmethod
+    def calculate_user_demographics(cls, record: bool = True) -> Dict[str, int]:
         """Calculate user demographics"""
         query = """
                 SELECT user_type, COUNT(*) as count
@@ -201,14 +656,14 @@ class BusinessAnalytics(BaseModel):
         results = db.execute_query(query)
         demographics = {row['user_type']: row['count'] for row in results}
 
-        # Record metric
-        total_users = sum(demographics.values())
-        cls.record_metric('total_users', total_users, demographics)
+        if record:
+            total_users = sum(demographics.values())
+            cls.record_metric('total_users', total_users, demographics)
 
         return demographics
 
     @classmethod
-    def calculate_program_popularity(cls) -> List[Dict[str, Any]]:
+    def calculate_program_popularity(cls, record: bool = True) -> List[Dict[str, Any]]:
         """Calculate program popularity"""
         query = """
                 SELECT p.program_id, \
@@ -224,8 +679,7 @@ class BusinessAnalytics(BaseModel):
 
         results = db.execute_query(query)
 
-        # Record metric
-        if results:
+        if record and results:
             top_program = results[0]
             cls.record_metric(
                 'most_popular_program',
@@ -240,7 +694,7 @@ class BusinessAnalytics(BaseModel):
         return results
 
     @classmethod
-    def calculate_subscription_statistics(cls) -> Dict[str, Any]:
+    def calculate_subscription_statistics(cls, record: bool = True) -> Dict[str, Any]:
         """Calculate subscription statistics"""
         query = """
                 SELECT org_type, \
@@ -267,13 +721,13 @@ class BusinessAnalytics(BaseModel):
             if status == 'active':
                 total_active += count
 
-        # Record metric
-        cls.record_metric('active_subscriptions', total_active, stats)
+        if record:
+            cls.record_metric('active_subscriptions', total_active, stats)
 
         return stats
 
     @classmethod
-    def calculate_content_statistics(cls) -> Dict[str, Any]:
+    def calculate_content_statistics(cls, record: bool = True) -> Dict[str, Any]:
         """Calculate content statistics"""
         query = """
                 SELECT content_type, \
@@ -309,22 +763,82 @@ class BusinessAnalytics(BaseModel):
 
             stats['total_count'] += count
 
-        # Record metric
-        cls.record_metric('total_content_items', stats['total_count'], stats)
+        if record:
+            cls.record_metric('total_content_items', stats['total_count'], stats)
 
         return stats
 
     @classmethod
-    def generate_dashboard_data(cls) -> Dict[str, Any]:
-        """Generate dashboard data (admin view)"""
+    def generate_dashboard_data(cls, record: bool = False) -> Dict[str, Any]:
+        """Generate dashboard data (admin view)
+
+        Runs every aggregate query. Readers should use the snapshot served by
+        snapshots.dashboard_snapshots; only the snapshot job passes record=True
+        to also store the computed metrics.
+        """
         dashboard = {
             'timestamp': datetime.now().isoformat(),
-            'user_demographics': cls.calculate_user_demographics(),
-            'subscription_stats': cls.calculate_subscription_statistics(),
-            'program_popularity': cls.calculate_program_popularity()[:10],  # Top 10
-            'content_stats': cls.calculate_content_statistics(),
-            'daily_active_users': cls.calculate_daily_active_users(),
+            'user_demographics': cls.calculate_user_demographics(record),
+            'subscription_stats': cls.calculate_subscription_statistics(record),
+            'program_popularity': cls.calculate_program_popularity(record)[:10],  # Top 10
+            'content_stats': cls.calculate_content_statistics(record),
+            'daily_active_users': cls.calculate_daily_active_users(record),
+            'active_users': cls.calculate_active_user_windows(record),
             'latest_metrics': cls.get_latest_metrics()
         }
 
         return dashboard
+
+
+class DashboardSnapshot(BaseModel):
+    """Precomputed admin dashboard, one row per refresh (snapshot_id is the version)"""
+
+    table_name = 'dashboard_snapshots'
+    primary_key = 'snapshot_id'
+
+    @classmethod
+    def save_snapshot(cls, data: Dict[str, Any]) -> int:
+        """Store a dashboard snapshot and return its version"""
+        return cls.insert({'snapshot_data': json.dumps(data, default=str)})
+
+    @classmethod
+    def get_latest(cls) -> Optional[Dict[str, Any]]:
+        """Get the newest stored snapshot"""
+        return cls.get_snapshot()
+
+    @classmethod
+    def get_snapshot(cls, version: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Get one stored snapshot (the newest when version is None)
+
+        age_seconds is measured by the database, on the clock that set
+        generated_at, so callers never compare it with the app's clock.
+        """
+        query = f"""
+            SELECT *, TIMESTAMPDIFF(MICROSECOND, generated_at, NOW(6)) / 1000000 as age_seconds
+            FROM {cls.table_name}"""
+        if version is None:
+            results = db.execute_query(query + " ORDER BY snapshot_id DESC LIMIT 1")
+        else:
+            results = db.execute_query(query + " WHERE snapshot_id = %s", (version,))
+        if not results:
+            return None
+
+        row = results[0]
+        data = row['snapshot_data']
+        return {
+            'version': row['snapshot_id'],
+            'generated_at': row['generated_at'],
+            'age_seconds': max(float(row['age_seconds']), 0.0),
+            'data': json.loads(data) if isinstance(data, (str, bytes)) else data
+        }
+
+    @classmethod
+    def purge_older_than(cls, keep: int = 100) -> int:
+        """Delete all but the newest `keep` snapshots"""
+        query = f"""
+            DELETE FROM {cls.table_name}
+            WHERE snapshot_id <= (SELECT snapshot_id FROM (
+                SELECT snapshot_id FROM {cls.table_name}
+                ORDER BY snapshot_id DESC LIMIT 1 OFFSET %s) s)
+        """
+        return db.execute_update(query, (keep,))
@@ -41,6 +41,24 @@ class Class(BaseModel):
                 """
         return db.execute_query(query, (teacher_id,))
 
+    @classmethod
+    def get_teacher_classes_with_counts(cls, teacher_id: int) -> List[Dict[str, Any]]:
+        """Get a teacher's classes with their active student count in one query"""
+        query = """
+                SELECT c.*, o.org_name, COALESCE(ec.student_count, 0) as student_count
+                FROM classes c
+                         JOIN organizations o ON c.org_id = o.org_id
+                         LEFT JOIN (SELECT ce.class_id, COUNT(*) as student_count
+                                    FROM class_enrollments ce
+                                             JOIN classes tc ON ce.class_id = tc.class_id
+                                    WHERE tc.teacher_id = %s \
+                                      AND ce.status = 'active'
+                                    GROUP BY ce.class_id) ec ON ec.class_id = c.class_id
+                WHERE c.teacher_id = %s
+                ORDER BY c.created_at DESC \
+                """
+        return db.execute_query(query, (teacher_id, teacher_id))
+
     @classmethod
     def get_organization_classes(cls, org_id: int) -> List[Dict[str, Any]]:
         """Get all classes in an organization"""
@@ -112,14 +130,18 @@ class ClassEnrollment(BaseModel):
     def update_status(cls, class_id: int, student_id: int, status: str) -> int:
         """Update enrollment status"""
         query = f"UPDATE {cls.table_name} SET status = %s WHERE class_id = %s AND student_id = %s"
+        cls._invalidate_identity_map()
         return db.execute_update(query, (status, class_id, student_id))
 
     @classmethod
     def check_enrollment(cls, class_id: int, student_id: int) -> bool:
         """Check if a student is enrolled in a class"""
-        query = f"SELECT COUNT(*) as count FROM {cls.table_name} WHERE class_id = %s AND student_id = %s"
-        result = db.execute_query(query, (class_id, student_id))
-        return result[0]['count'] > 0 if result else False
+        def load():
+            query = f"SELECT COUNT(*) as count FROM {cls.table_name} WHERE class_id = %s AND student_id = %s"
+            result = db.execute_query(query, (class_id, student_id))
+            return result[0]['count'] > 0 if result else False
+
+        return cls._identity_lookup(('enrolled', class_id, student_id), load)
 
 
 class Activity(BaseModel):
@@ -271,18 +293,45 @@ class Submission(BaseModel):
             return db.execute_query(query, (student_id,))
 
     @classmethod
-    def get_teacher_class_submissions(cls, teacher_id: int) -> List[Dict[str, Any]]:
-        """Get all submissions for all classes of a teacher"""
+    def get_teacher_class_submissions(cls, teacher_id: int,
+                                      status: Optional[str] = None,
+                                      limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Get submissions for all classes of a teacher (optionally by status, newest first)"""
         query = """
                 SELECT s.*, a.activity_name, u.username as student_name, c.class_name
                 FROM submissions s
                          JOIN activities a ON s.activity_id = a.activity_id
                          JOIN users u ON s.student_id = u.user_id
                          JOIN classes c ON a.class_id = c.class_id
-                WHERE c.teacher_id = %s
-                ORDER BY s.submission_date DESC \
+                WHERE c.teacher_id = %s \
                 """
-        return db.execute_query(query, (teacher_id,))
+        params = [teacher_id]
+        if status:
+            query += " AND s.status = %s"
+            params.append(status)
+        query += " ORDER BY s.submission_date DESC"
+        if limit is not None:
+            query += " LIMIT %s"
+            params.append(limit)
+        return db.execute_query(query, tuple(params))
+
+    @classmethod
+    def count_teacher_class_submissions(cls, teacher_id: int,
+                                        status: Optional[str] = None) -> int:
+        """Count submissions for all classes of a teacher"""
+        query = """
+                SELECT COUNT(*) as count
+                FROM submissions s
+                         JOIN activities a ON s.activity_id = a.activity_id
+                         JOIN classes c ON a.class_id = c.class_id
+                WHERE c.teacher_id = %s \
+                """
+        params = [teacher_id]
+        if status:
+            query += " AND s.status = %s"
+            params.append(status)
+        result = db.execute_query(query, tuple(params))
+        return result[0]['count'] if result else 0
 
     @classmethod
     def update_status(cls, submission_id: int, status: str) -> int:
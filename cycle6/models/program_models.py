@@ -3,9 +3,13 @@ Komodo Hub - Program and Content Models
 Program, Content Library, Species Sighting models
 """
 
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime, date
 from database import BaseModel, db
+from config import db_config
+import pymysql
+import search
+import geo
 
 
 class Program(BaseModel):
@@ -152,6 +156,9 @@ class ContentLibrary(BaseModel):
     VIDEO = 'video'
     EDUCATIONAL_MATERIAL = 'educational_material'
 
+    # In-process search index, built on demand when search_backend == 'memory'
+    search_index: Optional[search.InvertedIndex] = None
+
     @classmethod
     def create_content(cls, title: str, content_type: str, created_by: int,
                        content_data: Optional[str] = None,
@@ -198,10 +205,30 @@ class ContentLibrary(BaseModel):
                     """
             return db.execute_query(query, (limit,))
 
+    @classmethod
+    def get_public_content_page(cls, content_type: Optional[str] = None,
+                                cursor: Optional[str] = None,
+                                limit: int = 100) -> Dict[str, Any]:
+        """Get one page of public content, newest first (keyset pagination)"""
+        select_sql = """
+                     SELECT cl.*, u.username as author_name
+                     FROM content_library cl
+                              JOIN users u ON cl.created_by = u.user_id \
+                     """
+        conditions = ["cl.is_public = TRUE"]
+        params = ()
+        if content_type:
+            conditions.append("cl.content_type = %s")
+            params = (content_type,)
+        return cls._seek_page(select_sql, conditions, params, 'cl.created_at',
+                              'cl.content_id', cursor, limit)
+
     @classmethod
     def get_organization_library(cls, org_id: int,
-                                 include_private: bool = False) -> List[Dict[str, Any]]:
-        """Get organization library content"""
+                                 include_private: bool = False,
+                                 limit: Optional[int] = None,
+                                 offset: int = 0) -> List[Dict[str, Any]]:
+        """Get organization library content (optionally one page of it)"""
         if include_private:
             query = """
                     SELECT cl.*, u.username as author_name
@@ -220,8 +247,20 @@ class ContentLibrary(BaseModel):
                     ORDER BY cl.created_at DESC \
                     """
 
+        if limit is not None:
+            query += " LIMIT %s OFFSET %s"
+            return db.execute_query(query, (org_id, limit, offset))
         return db.execute_query(query, (org_id,))
 
+    @classmethod
+    def count_organization_library(cls, org_id: int, include_private: bool = False) -> int:
+        """Count organization library content"""
+        query = f"SELECT COUNT(*) as count FROM {cls.table_name} WHERE org_id = %s"
+        if not include_private:
+            query += " AND is_public = TRUE"
+        result = db.execute_query(query, (org_id,))
+        return result[0]['count'] if result else 0
+
     @classmethod
     def get_user_content(cls, user_id: int) -> List[Dict[str, Any]]:
         """Get content created by user"""
@@ -240,10 +279,122 @@ class ContentLibrary(BaseModel):
         """Update content visibility"""
         return cls.update(content_id, {'is_public': is_public})
 
+    @classmethod
+    def insert(cls, data: Dict[str, Any]) -> int:
+        """Insert content and keep the in-process search index in sync"""
+        content_id = super().insert(data)
+        cls._reindex(content_id)
+        return content_id
+
+    @classmethod
+    def update(cls, id_value: int, data: Dict[str, Any]) -> int:
+        """Update content and keep the in-process search index in sync"""
+        affected = super().update(id_value, data)
+        cls._reindex(id_value)
+        return affected
+
+    @classmethod
+    def delete(cls, id_value: int) -> int:
+        """Delete content and drop it from the in-process search index"""
+        affected = super().delete(id_value)
+        if cls.search_index is not None:
+            cls.search_index.remove(id_value)
+        return affected
+
+    @classmethod
+    def _index_row(cls, row: Dict[str, Any]):
+        created_at = row.get('created_at')
+        cls.search_index.add(row['content_id'], row['title'], row.get('content_data'),
+                             is_public=row['is_public'],
+                             sort_key=created_at.timestamp() if created_at else None)
+
+    @classmethod
+    def _reindex(cls, content_id: int):
+        if cls.search_index is None or not content_id:
+            return
+        row = cls.find_by_id(content_id)
+        if row:
+            cls._index_row(row)
+        else:
+            cls.search_index.remove(content_id)
+
+    @classmethod
+    def build_search_index(cls) -> search.InvertedIndex:
+        """(Re)build the in-process search index from the content table"""
+        index = cls.search_index if cls.search_index is not None else search.InvertedIndex()
+        index.clear()
+        cls.search_index = index
+        query = f"SELECT content_id, title, content_data, is_public, created_at FROM {cls.table_name}"
+        for row in db.execute_query(query):
+            cls._index_row(row)
+        return index
+
     @classmethod
     def search_content(cls, keyword: str, is_public_only: bool = True,
-                       limit: int = 100) -> List[Dict[str, Any]]:
-        """Search content"""
+                       limit: int = 100,
+                       boolean_mode: Optional[bool] = None) -> List[Dict[str, Any]]:
+        """Search content, most relevant first.
+
+        Uses the FULLTEXT index on (title, content_data) in natural-language mode,
+        or boolean mode when the keyword contains operators (+word -word word*).
+        Falls back to a substring search if the server rejects the query.
+        """
+        if boolean_mode is None:
+            boolean_mode = search.is_boolean_query(keyword)
+
+        if db_config.search_backend == 'memory':
+            return cls._search_memory(keyword, is_public_only, limit, boolean_mode)
+
+        # Keywords made only of tokens below the FULLTEXT minimum length never match
+        if not search.tokenize(keyword):
+            return cls._search_like(keyword, is_public_only, limit)
+
+        if boolean_mode:
+            keyword_query = search.build_boolean_query(keyword)
+            if not keyword_query:
+                return cls._search_like(keyword, is_public_only, limit)
+        else:
+            keyword_query = keyword
+
+        mode = 'IN BOOLEAN MODE' if boolean_mode else 'IN NATURAL LANGUAGE MODE'
+        query = f"""
+                SELECT cl.*, u.username as author_name,
+                       MATCH(cl.title, cl.content_data) AGAINST (%s {mode}) as relevance
+                FROM content_library cl
+                         JOIN users u ON cl.created_by = u.user_id
+                WHERE MATCH(cl.title, cl.content_data) AGAINST (%s {mode}) \
+                """
+        if is_public_only:
+            query += " AND cl.is_public = TRUE"
+        query += " ORDER BY relevance DESC, cl.created_at DESC LIMIT %s"
+        try:
+            return db.execute_query(query, (keyword_query, keyword_query, limit))
+        except pymysql.ProgrammingError:
+            return cls._search_like(keyword, is_public_only, limit)
+
+    @classmethod
+    def _search_memory(cls, keyword: str, is_public_only: bool, limit: int,
+                       boolean_mode: bool) -> List[Dict[str, Any]]:
+        """Search through the in-process inverted index"""
+        index = cls.search_index if cls.search_index is not None else cls.build_search_index()
+        content_ids = index.search(keyword, is_public_only, limit, boolean_mode)
+        if not content_ids:
+            return []
+
+        placeholders = ', '.join(['%s'] * len(content_ids))
+        query = f"""
+                SELECT cl.*, u.username as author_name
+                FROM content_library cl
+                         JOIN users u ON cl.created_by = u.user_id
+                WHERE cl.content_id IN ({placeholders}) \
+                """
+        rows = {row['content_id']: row for row in db.execute_query(query, tuple(content_ids))}
+        return [rows[content_id] for content_id in content_ids if content_id in rows]
+
+    @classmethod
+    def _search_like(cls, keyword: str, is_public_only: bool,
+                     limit: int) -> List[Dict[str, Any]]:
+        """Substring search, for keywords too short for the FULLTEXT index"""
         keyword_pattern = f"%{keyword}%"
 
         if is_public_only:
@@ -270,18 +421,35 @@ class ContentLibrary(BaseModel):
         return db.execute_query(query, (keyword_pattern, keyword_pattern, limit))
 
 
+class TooManySightingsError(ValueError):
+    """Raised when a radius holds more sightings than one search may read"""
+    pass
+
+
 class SpeciesSighting(BaseModel):
     """Species Sighting/Observation model"""
 
     table_name = 'species_sightings'
     primary_key = 'sighting_id'
 
+    # Candidates (id and coordinates only) read per radius search
+    MAX_RADIUS_CANDIDATES = 5000
+
+    # Nearest searches narrow a too-dense ring down to this radius before giving up
+    MIN_RADIUS_STEP_KM = 0.001
+
     @classmethod
     def create_sighting(cls, species_name: str, location: str,
                         date_time: datetime, reported_by: int,
                         description: Optional[str] = None,
-                        photo_path: Optional[str] = None) -> int:
-        """Create species sighting record"""
+                        photo_path: Optional[str] = None,
+                        latitude: Optional[float] = None,
+                        longitude: Optional[float] = None) -> int:
+        """Create species sighting record
+
+        Coordinates are optional but must be given together; they are stored
+        with their geohash so spatial queries can use idx_geohash.
+        """
         data = {
             'species_name': species_name,
             'location': location,
@@ -294,8 +462,22 @@ class SpeciesSighting(BaseModel):
             data['description'] = description
         if photo_path:
             data['photo_path'] = photo_path
-
-        return cls.insert(data)
+        if latitude is not None or longitude is not None:
+            if latitude is None or longitude is None:
+                raise ValueError("Latitude and longitude must be given together")
+            latitude, longitude = geo.validate_coordinates(latitude, longitude)
+            data['latitude'] = latitude
+            data['longitude'] = longitude
+            data['geohash'] = geo.encode(latitude, longitude)
+
+        sighting_id = cls.insert(data)
+
+        # A late report changes a day whose reporter sketch may already be final
+        from models.analytics_models import DistinctSketch
+        day = date_time.date() if isinstance(date_time, datetime) else date_time
+        if DistinctSketch.settled_at(DistinctSketch.SIGHTING_REPORTERS, day) <= datetime.now():
+            DistinctSketch.invalidate_day(DistinctSketch.SIGHTING_REPORTERS, day)
+        return sighting_id
 
     @classmethod
     def verify_sighting(cls, sighting_id: int) -> int:
@@ -326,6 +508,19 @@ class SpeciesSighting(BaseModel):
 
         return db.execute_query(query, (limit,))
 
+    @classmethod
+    def get_sightings_page(cls, verified_only: bool = False, cursor: Optional[str] = None,
+                           limit: int = 100) -> Dict[str, Any]:
+        """Get one page of sighting records, newest first (keyset pagination)"""
+        select_sql = """
+                     SELECT ss.*, u.username as reporter_name
+                     FROM species_sightings ss
+                              JOIN users u ON ss.reported_by = u.user_id \
+                     """
+        conditions = ["ss.verified = TRUE"] if verified_only else []
+        return cls._seek_page(select_sql, conditions, (), 'ss.date_time',
+                              'ss.sighting_id', cursor, limit)
+
     @classmethod
     def get_user_sightings(cls, user_id: int) -> List[Dict[str, Any]]:
         """Get user's sightings"""
@@ -358,8 +553,211 @@ class SpeciesSighting(BaseModel):
         return db.execute_query(query, (location_pattern,))
 
     @classmethod
-    def get_sighting_statistics(cls) -> Dict[str, Any]:
-        """Get sighting statistics"""
+    def _query_bbox(cls, min_lat: float, min_lng: float, max_lat: float, max_lng: float,
+                    verified_only: bool = False, order_by: Optional[str] = None,
+                    limit: Optional[int] = None,
+                    columns: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Sightings with coordinates inside a bounding box
+
+        The box is covered by a few geohash prefixes, each a range scan on
+        idx_geohash; the latitude/longitude conditions then trim the cells
+        to the exact box. min_lng > max_lng means the box crosses the
+        antimeridian. With columns only those sighting columns are read
+        (no reporter join).
+        """
+        conditions = ["ss.latitude BETWEEN %s AND %s"]
+        params: List[Any] = [min_lat, max_lat]
+        if min_lng <= max_lng:
+            conditions.append("ss.longitude BETWEEN %s AND %s")
+        else:
+            conditions.append("(ss.longitude >= %s OR ss.longitude <= %s)")
+        params.extend([min_lng, max_lng])
+
+        prefixes = geo.covering_prefixes(min_lat, min_lng, max_lat, max_lng)
+        if prefixes != ['']:
+            conditions.append("(" + " OR ".join(["ss.geohash LIKE %s"] * len(prefixes)) + ")")
+            params.extend(prefix + '%' for prefix in prefixes)
+        if verified_only:
+            conditions.append("ss.verified = TRUE")
+
+        if columns:
+            query = f"""
+                SELECT {columns}
+                FROM species_sightings ss
+                WHERE {' AND '.join(conditions)}"""
+        else:
+            query = f"""
+                SELECT ss.*, u.username as reporter_name
+                FROM species_sightings ss
+                         JOIN users u ON ss.reported_by = u.user_id
+                WHERE {' AND '.join(conditions)}"""
+        if order_by:
+            query += f" ORDER BY {order_by}"
+        if limit is not None:
+            query += " LIMIT %s"
+            params.append(limit)
+        return db.execute_query(query, tuple(params))
+
+    @classmethod
+    def get_sightings_in_bbox(cls, min_lat: float, min_lng: float, max_lat: float,
+                              max_lng: float, verified_only: bool = False,
+                              limit: int = 500) -> List[Dict[str, Any]]:
+        """Get sightings inside a bounding box, newest first"""
+        min_lat, min_lng = geo.validate_coordinates(min_lat, min_lng)
+        max_lat, max_lng = geo.validate_coordinates(max_lat, max_lng)
+        return cls._query_bbox(min_lat, min_lng, max_lat, max_lng, verified_only,
+                               order_by='ss.date_time DESC', limit=limit)
+
+    @classmethod
+    def _radius_candidates(cls, latitude: float, longitude: float, radius_km: float,
+                           verified_only: bool = False) -> Tuple[List[Tuple[float, int]], bool]:
+        """(distance_km, sighting_id) of sightings inside the circle, nearest first
+
+        Reads only ids and coordinates of the enclosing bounding box. When
+        the box holds more than MAX_RADIUS_CANDIDATES rows the flag is True
+        and the hits are an arbitrary subset that must not be used.
+        """
+        rows = cls._query_bbox(*geo.bounding_box(latitude, longitude, radius_km),
+                               verified_only=verified_only,
+                               limit=cls.MAX_RADIUS_CANDIDATES + 1,
+                               columns='ss.sighting_id, ss.latitude, ss.longitude')
+        if len(rows) > cls.MAX_RADIUS_CANDIDATES:
+            return [], True
+        hits = []
+        for row in rows:
+            distance = geo.haversine_km(latitude, longitude,
+                                        float(row['latitude']), float(row['longitude']))
+            if distance <= radius_km:
+                hits.append((distance, row['sighting_id']))
+        hits.sort()
+        return hits, False
+
+    @classmethod
+    def _nearest_hits(cls, latitude: float, longitude: float, n: int, verified_only: bool,
+                      initial_radius_km: float, max_radius_km: float) -> List[Tuple[float, int]]:
+        """(distance_km, sighting_id) of the n nearest sightings within max_radius_km
+
+        The radius doubles until a ring holds n sightings. A ring too dense
+        to read whole is bisected against the last sparse one, so the answer
+        always comes from a complete ring.
+        """
+        low, high = 0.0, None
+        radius = min(initial_radius_km, max_radius_km)
+        while True:
+            hits, capped = cls._radius_candidates(latitude, longitude, radius, verified_only)
+            if capped:
+                high = radius
+            elif len(hits) >= n or radius >= max_radius_km:
+                return hits[:n]
+            else:
+                low = radius
+
+            if high is None:
+                radius = min(radius * 2, max_radius_km)
+            elif high - low <= cls.MIN_RADIUS_STEP_KM:
+                raise TooManySightingsError(
+                    f"More than {cls.MAX_RADIUS_CANDIDATES} sightings within "
+                    f"{high:.3f} km of ({latitude}, {longitude})"
+                )
+            else:
+                radius = (low + high) / 2
+
+    @classmethod
+    def _with_distances(cls, hits: List[Tuple[float, int]]) -> List[Dict[str, Any]]:
+        """Full sighting rows (with reporter_name and distance_km) in the order of hits"""
+        if not hits:
+            return []
+        placeholders = ', '.join(['%s'] * len(hits))
+        rows = db.execute_query(f"""
+                SELECT ss.*, u.username as reporter_name
+                FROM species_sightings ss
+                         JOIN users u ON ss.reported_by = u.user_id
+                WHERE ss.sighting_id IN ({placeholders})""",
+                                tuple(sighting_id for _, sighting_id in hits))
+        by_id = {row['sighting_id']: row for row in rows}
+        results = []
+        for distance, sighting_id in hits:
+            row = by_id.get(sighting_id)
+            if row is not None:
+                row['distance_km'] = distance
+                results.append(row)
+        return results
+
+    @classmethod
+    def get_sightings_within_radius(cls, latitude: float, longitude: float, radius_km: float,
+                                    verified_only: bool = False,
+                                    limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Get sightings within radius_km of a point, nearest first
+
+        Candidates come from the enclosing bounding box (ids and coordinates
+        only); those inside the circle are ranked by great-circle distance
+        and only the kept ones are read in full, with a distance_km each.
+        When the box holds more than MAX_RADIUS_CANDIDATES sightings, a
+        limited search returns the nearest `limit` found in a smaller ring;
+        an unlimited one raises TooManySightingsError.
+        """
+        latitude, longitude = geo.validate_coordinates(latitude, longitude)
+        if not radius_km > 0:
+            raise ValueError(f"Radius must be positive: {radius_km}")
+        if limit is not None and limit <= 0:
+            return []
+        hits, capped = cls._radius_candidates(latitude, longitude, radius_km, verified_only)
+        if capped:
+            if limit is None:
+                raise TooManySightingsError(
+                    f"More than {cls.MAX_RADIUS_CANDIDATES} sightings within "
+                    f"{radius_km} km; pass a limit or a smaller radius"
+                )
+            hits = cls._nearest_hits(latitude, longitude, limit, verified_only,
+                                     radius_km / 2, radius_km)
+        return cls._with_distances(hits[:limit] if limit is not None else hits)
+
+    @classmethod
+    def get_nearest_sightings(cls, latitude: float, longitude: float, n: int = 10,
+                              verified_only: bool = False, initial_radius_km: float = 1.0,
+                              max_radius_km: float = 1000.0) -> List[Dict[str, Any]]:
+        """Get the n sightings nearest to a point (up to max_radius_km away)
+
+        Searches a radius that doubles until it holds n sightings, so dense
+        areas are answered from a few small index ranges. Each ring reads
+        only candidate ids and coordinates; full rows are fetched once for
+        the n kept. A ring with more than MAX_RADIUS_CANDIDATES sightings is
+        narrowed instead of being read partially.
+        """
+        latitude, longitude = geo.validate_coordinates(latitude, longitude)
+        if not (initial_radius_km > 0 and max_radius_km > 0):
+            raise ValueError("Search radii must be positive")
+        if n <= 0:
+            return []
+        return cls._with_distances(cls._nearest_hits(latitude, longitude, n, verified_only,
+                                                     initial_radius_km, max_radius_km))
+
+    @classmethod
+    def estimate_unique_reporters(cls, days: int = 90) -> int:
+        """Approximate distinct reporters over the last N days (HyperLogLog)"""
+        from models.analytics_models import DistinctSketch
+        return DistinctSketch.estimate(DistinctSketch.SIGHTING_REPORTERS, days)
+
+    @classmethod
+    def get_sighting_statistics(cls, reporter_days: Optional[int] = None) -> Dict[str, Any]:
+        """Get sighting statistics
+
+        With reporter_days, unique_reporters is a HyperLogLog estimate over that
+        many days instead of an exact all-time COUNT(DISTINCT reported_by).
+        """
+        if reporter_days:
+            query = """
+                    SELECT COUNT(*)                                         as total_sightings, \
+                           COUNT(DISTINCT species_name)                     as unique_species, \
+                           SUM(CASE WHEN verified = TRUE THEN 1 ELSE 0 END) as verified_count
+                    FROM species_sightings \
+                    """
+            result = db.execute_query(query)
+            stats = result[0] if result else {}
+            stats['unique_reporters'] = cls.estimate_unique_reporters(reporter_days)
+            stats['unique_reporters_days'] = reporter_days
+            return stats
+
         query = """
                 SELECT COUNT(*)                                         as total_sightings, \
                        COUNT(DISTINCT species_name)                     as unique_species, \
@@ -421,6 +819,116 @@ class CreativeCanvas(BaseModel):
         return db.execute_query(query, (program_id,))
 
 
+class Conversation(BaseModel):
+    """Conversation thread between two users
+
+    Each unordered pair of users has one row (user_low < user_high) and every
+    message stores its conversation_id, so a thread is one range of the
+    (conversation_id, message_id) index. conversation_members keeps each
+    participant's unread count and last message time for the thread list.
+    """
+
+    table_name = 'conversations'
+    primary_key = 'conversation_id'
+
+    @staticmethod
+    def pair(user_id1: int, user_id2: int) -> Tuple[int, int]:
+        """Canonical (low, high) order of a user pair"""
+        return (user_id1, user_id2) if user_id1 <= user_id2 else (user_id2, user_id1)
+
+    @classmethod
+    def get_or_create(cls, user_id1: int, user_id2: int) -> int:
+        """Get the pair's conversation id, creating the conversation if needed"""
+        # LAST_INSERT_ID(expr) makes the existing id the insert id on duplicates
+        return db.execute_insert(f"""
+            INSERT INTO {cls.table_name} (user_low, user_high) VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE conversation_id = LAST_INSERT_ID(conversation_id)
+        """, cls.pair(user_id1, user_id2))
+
+    @classmethod
+    def get_between(cls, user_id1: int, user_id2: int) -> Optional[Dict[str, Any]]:
+        """Get the conversation of two users, if they have exchanged messages"""
+        rows = db.execute_query(
+            f"SELECT * FROM {cls.table_name} WHERE user_low = %s AND user_high = %s",
+            cls.pair(user_id1, user_id2)
+        )
+        return rows[0] if rows else None
+
+    @classmethod
+    def is_member(cls, conversation_id: int, user_id: int) -> bool:
+        """Check whether the user takes part in the conversation"""
+        rows = db.execute_query(
+            "SELECT 1 FROM conversation_members WHERE conversation_id = %s AND user_id = %s",
+            (conversation_id, user_id)
+        )
+        return bool(rows)
+
+    @classmethod
+    def record_message(cls, conversation_id: int, message_id: int,
+                       sender_id: int, recipient_id: int):
+        """Move the thread's last message and bump the recipient's unread count
+
+        Call inside the transaction that inserted the message.
+        """
+        db.execute_update(f"""
+            UPDATE {cls.table_name} SET last_message_id = %s, last_message_at = NOW()
+            WHERE conversation_id = %s
+        """, (message_id, conversation_id))
+        db.execute_update("""
+            INSERT INTO conversation_members (conversation_id, user_id, unread_count, last_message_at)
+            VALUES (%s, %s, 0, NOW()), (%s, %s, 1, NOW())
+            ON DUPLICATE KEY UPDATE unread_count = unread_count + VALUES(unread_count),
+                                    last_message_at = VALUES(last_message_at)
+        """, (conversation_id, sender_id, conversation_id, recipient_id))
+
+    @classmethod
+    def adjust_unread(cls, conversation_id: int, user_id: int, delta: int):
+        """Change one participant's unread count in a conversation"""
+        db.execute_update("""
+            UPDATE conversation_members SET unread_count = GREATEST(unread_count + %s, 0)
+            WHERE conversation_id = %s AND user_id = %s
+        """, (delta, conversation_id, user_id))
+
+    @classmethod
+    def get_user_conversations(cls, user_id: int, cursor: Optional[str] = None,
+                               limit: int = 20) -> Dict[str, Any]:
+        """Get one page of the user's conversations, most recent first
+
+        Each row has the other participant, the last message and the user's
+        unread count. Returns {'items', 'next_cursor'}.
+        """
+        select_sql = """
+                     SELECT cm.conversation_id, cm.last_message_at, cm.unread_count,
+                            other.user_id AS other_user_id, other.username AS other_username,
+                            m.message_id AS last_message_id, m.sender_id AS last_sender_id,
+                            m.message_text AS last_message_text
+                     FROM conversation_members cm
+                              JOIN conversations c ON c.conversation_id = cm.conversation_id
+                              JOIN users other
+                                   ON other.user_id = IF(c.user_low = cm.user_id, c.user_high, c.user_low)
+                              LEFT JOIN messages m ON m.message_id = c.last_message_id \
+                     """
+        return cls._seek_page(select_sql, ["cm.user_id = %s"], (user_id,),
+                              'cm.last_message_at', 'cm.conversation_id', cursor, limit)
+
+    @classmethod
+    def mark_read(cls, conversation_id: int, user_id: int) -> int:
+        """Mark every message the user received in the conversation as read"""
+        Message._invalidate_identity_map()
+        with db.transaction():
+            changed = db.execute_update("""
+                UPDATE messages SET read_at = NOW()
+                WHERE conversation_id = %s AND recipient_id = %s AND read_at IS NULL
+            """, (conversation_id, user_id))
+            db.execute_update("""
+                UPDATE conversation_members SET unread_count = 0
+                WHERE conversation_id = %s AND user_id = %s
+            """, (conversation_id, user_id))
+            if changed:
+                Message._adjust_unread(user_id, -changed)
+        return changed
+
+
 class Message(BaseModel):
     """Message model"""
 
@@ -436,29 +944,108 @@ class Message(BaseModel):
             'message_text': message_text
         }
 
-        return cls.insert(data)
+        with db.transaction():
+            data['conversation_id'] = Conversation.get_or_create(sender_id, recipient_id)
+            message_id = cls.insert(data)
+            Conversation.record_message(data['conversation_id'], message_id,
+                                        sender_id, recipient_id)
+            cls._adjust_unread(recipient_id, 1)
+        return message_id
+
+    @classmethod
+    def _adjust_unread(cls, user_id: int, delta: int):
+        """Change a user's maintained unread counter (user_message_counters)"""
+        db.execute_update("""
+            INSERT INTO user_message_counters (user_id, unread_count)
+            VALUES (%s, GREATEST(%s, 0))
+            ON DUPLICATE KEY UPDATE unread_count = GREATEST(unread_count + %s, 0)
+        """, (user_id, delta, delta))
 
     @classmethod
     def mark_as_read(cls, message_id: int) -> int:
         """Mark message as read"""
-        query = f"UPDATE {cls.table_name} SET read_at = NOW() WHERE message_id = %s"
-        return db.execute_update(query, (message_id,))
+        cls._invalidate_identity_map()
+        with db.transaction():
+            rows = db.execute_query(
+                f"SELECT recipient_id, conversation_id FROM {cls.table_name} WHERE message_id = %s FOR UPDATE",
+                (message_id,)
+            )
+            query = f"UPDATE {cls.table_name} SET read_at = NOW() WHERE message_id = %s AND read_at IS NULL"
+            changed = db.execute_update(query, (message_id,))
+            if changed:
+                cls._adjust_unread(rows[0]['recipient_id'], -changed)
+                Conversation.adjust_unread(rows[0]['conversation_id'], rows[0]['recipient_id'], -changed)
+        return changed
+
+    @classmethod
+    def mark_all_read(cls, user_id: int) -> int:
+        """Mark all of a user's unread messages as read"""
+        cls._invalidate_identity_map()
+        with db.transaction():
+            changed = db.execute_update(
+                f"UPDATE {cls.table_name} SET read_at = NOW() WHERE recipient_id = %s AND read_at IS NULL",
+                (user_id,)
+            )
+            if changed:
+                cls._adjust_unread(user_id, -changed)
+                db.execute_update(
+                    "UPDATE conversation_members SET unread_count = 0 WHERE user_id = %s AND unread_count > 0",
+                    (user_id,)
+                )
+        return changed
+
+    @classmethod
+    def get_unread_count(cls, user_id: int) -> int:
+        """Get the number of unread messages (maintained counter, no scan)"""
+        rows = db.execute_query(
+            "SELECT unread_count FROM user_message_counters WHERE user_id = %s", (user_id,)
+        )
+        return rows[0]['unread_count'] if rows else 0
+
+    @classmethod
+    def _with_usernames(cls, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Add sender_name/recipient_name with one lookup for the participants"""
+        user_ids = {m['sender_id'] for m in messages} | {m['recipient_id'] for m in messages}
+        if not user_ids:
+            return messages
+        placeholders = ', '.join(['%s'] * len(user_ids))
+        names = {row['user_id']: row['username'] for row in db.execute_query(
+            f"SELECT user_id, username FROM users WHERE user_id IN ({placeholders})",
+            tuple(user_ids)
+        )}
+        for message in messages:
+            message['sender_name'] = names.get(message['sender_id'])
+            message['recipient_name'] = names.get(message['recipient_id'])
+        return messages
 
     @classmethod
     def get_conversation(cls, user_id1: int, user_id2: int) -> List[Dict[str, Any]]:
-        """Get conversation between two users"""
-        query = """
-                SELECT m.*,
-                       u1.username as sender_name,
-                       u2.username as recipient_name
-                FROM messages m
-                         JOIN users u1 ON m.sender_id = u1.user_id
-                         JOIN users u2 ON m.recipient_id = u2.user_id
-                WHERE (m.sender_id = %s AND m.recipient_id = %s)
-                   OR (m.sender_id = %s AND m.recipient_id = %s)
-                ORDER BY m.sent_at ASC \
+        """Get conversation between two users (whole history, oldest first)"""
+        conversation = Conversation.get_between(user_id1, user_id2)
+        if not conversation:
+            return []
+        query = f"""
+                SELECT m.* FROM {cls.table_name} m
+                WHERE m.conversation_id = %s
+                ORDER BY m.message_id ASC \
                 """
-        return db.execute_query(query, (user_id1, user_id2, user_id2, user_id1))
+        return cls._with_usernames(db.execute_query(query, (conversation['conversation_id'],)))
+
+    @classmethod
+    def get_conversation_page(cls, conversation_id: int, cursor: Optional[str] = None,
+                              limit: int = 50) -> Dict[str, Any]:
+        """Get one page of a thread, starting from the newest messages
+
+        The first page holds the latest `limit` messages; next_cursor pages
+        backwards through older ones. Items in a page are oldest first, ready
+        to display. Returns {'items', 'next_cursor'}.
+        """
+        page = cls._seek_page(f"SELECT m.* FROM {cls.table_name} m",
+                              ["m.conversation_id = %s"], (conversation_id,),
+                              None, 'm.message_id', cursor, limit)
+        page['items'].reverse()
+        cls._with_usernames(page['items'])
+        return page
 
     @classmethod
     def get_user_messages(cls, user_id: int, unread_only: bool = False) -> List[Dict[str, Any]]:
@@ -483,6 +1070,22 @@ class Message(BaseModel):
 
         return db.execute_query(query, (user_id,))
 
+    @classmethod
+    def get_user_messages_page(cls, user_id: int, unread_only: bool = False,
+                               cursor: Optional[str] = None,
+                               limit: int = 50) -> Dict[str, Any]:
+        """Get one page of user's messages, newest first (keyset pagination)"""
+        select_sql = """
+                     SELECT m.*, u.username as sender_name
+                     FROM messages m
+                              JOIN users u ON m.sender_id = u.user_id \
+                     """
+        conditions = ["m.recipient_id = %s"]
+        if unread_only:
+            conditions.append("m.read_at IS NULL")
+        return cls._seek_page(select_sql, conditions, (user_id,), 'm.sent_at',
+                              'm.message_id', cursor, limit)
+
     @classmethod
     def get_sent_messages(cls, user_id: int) -> List[Dict[str, Any]]:
         """Get messages sent by user"""
@@ -76,6 +76,7 @@ class User(BaseModel):
     def update_last_login(cls, user_id: int):
         """Update last login time"""
         query = f"UPDATE {cls.table_name} SET last_login = NOW() WHERE user_id = %s"
+        cls._invalidate_identity_map()
         db.execute_update(query, (user_id,))
 
     @classmethod
@@ -181,6 +182,40 @@ class Organization(BaseModel):
                     """
             return db.execute_query(query, (org_id,))
 
+    @classmethod
+    def get_public_members(cls, org_id: int, limit: int = 50,
+                           offset: int = 0) -> List[Dict[str, Any]]:
+        """Get a page of organization members that have a public profile
+
+        The profile columns come from the same join (profile_id, avatar_path,
+        color_scheme, bio), so no per-member profile lookup is needed.
+        """
+        query = """
+                SELECT u.user_id, u.username, om.role, om.joined_date,
+                       up.profile_id, up.avatar_path, up.color_scheme, up.bio, up.is_public
+                FROM organization_members om
+                         JOIN users u ON om.user_id = u.user_id
+                         JOIN user_profiles up ON up.user_id = om.user_id
+                WHERE om.org_id = %s \
+                  AND up.is_public = TRUE
+                ORDER BY om.joined_date, om.user_id
+                    LIMIT %s OFFSET %s \
+                """
+        return db.execute_query(query, (org_id, limit, offset))
+
+    @classmethod
+    def count_public_members(cls, org_id: int) -> int:
+        """Count organization members that have a public profile"""
+        query = """
+                SELECT COUNT(*) as count
+                FROM organization_members om
+                         JOIN user_profiles up ON up.user_id = om.user_id
+                WHERE om.org_id = %s \
+                  AND up.is_public = TRUE \
+                """
+        result = db.execute_query(query, (org_id,))
+        return result[0]['count'] if result else 0
+
     @classmethod
     def get_subscription_statistics(cls) -> Dict[str, Any]:
         """Get subscription statistics"""
@@ -250,6 +285,7 @@ class OrganizationMember(BaseModel):
                 WHERE org_id = %s \
                   AND user_id = %s \
                 """
+        cls._invalidate_identity_map()
         db.execute_update(query, (access_code, org_id, user_id))
 
         return access_code
@@ -264,14 +300,18 @@ class OrganizationMember(BaseModel):
     @classmethod
     def get_member_role(cls, org_id: int, user_id: int) -> Optional[str]:
         """Get user's role in the organization"""
-        query = f"SELECT role FROM {cls.table_name} WHERE org_id = %s AND user_id = %s"
-        results = db.execute_query(query, (org_id, user_id))
-        return results[0]['role'] if results else None
+        def load():
+            query = f"SELECT role FROM {cls.table_name} WHERE org_id = %s AND user_id = %s"
+            results = db.execute_query(query, (org_id, user_id))
+            return results[0]['role'] if results else None
+
+        return cls._identity_lookup(('role', org_id, user_id), load)
 
     @classmethod
     def remove_member(cls, org_id: int, user_id: int) -> int:
         """Remove organization member"""
         query = f"DELETE FROM {cls.table_name} WHERE org_id = %s AND user_id = %s"
+        cls._invalidate_identity_map()
         return db.execute_update(query, (org_id, user_id))
 
 
@@ -314,6 +354,7 @@ class UserProfile(BaseModel):
         query_parts = [f"{key} = %s" for key in data.keys()]
         query = f"UPDATE {cls.table_name} SET {', '.join(query_parts)} WHERE user_id = %s"
         params = tuple(data.values()) + (user_id,)
+        cls._invalidate_identity_map()
         return db.execute_update(query, params)
 
     @classmethod
@@ -0,0 +1,187 @@
+"""
+Komodo Hub - Search Helpers
+Full-text query building and an in-process inverted index fallback
+"""
+
+import bisect
+import math
+import re
+import threading
+from collections import defaultdict
+from typing import Optional, List, Dict, Any, Tuple
+
+# Tokens shorter than this are ignored (matches InnoDB's innodb_ft_min_token_size)
+MIN_TOKEN_SIZE = 3
+
+# Relevance weight of a title hit relative to a body hit
+TITLE_WEIGHT = 3.0
+
+# Operators honoured in keywords: a leading +required / -excluded on a term or a
+# trailing prefix* wildcard. Other boolean-mode syntax (< > ( ) ~ " @) is stripped.
+_BOOLEAN_OPERATORS = re.compile(r'(?:^|\s)[+\-]\w|\w\*(?=\s|$)', re.UNICODE)
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Split text into lower-cased searchable tokens"""
+    if not text:
+        return []
+    return [t for t in _TOKEN.findall(text.lower()) if len(t) >= MIN_TOKEN_SIZE]
+
+
+def is_boolean_query(keyword: str) -> bool:
+    """Whether the keyword uses boolean-mode operators (+required -excluded prefix*)
+
+    Hyphens or quotes inside ordinary text (komodo-dragon, an email address)
+    do not count.
+    """
+    return bool(_BOOLEAN_OPERATORS.search(keyword))
+
+
+def build_boolean_query(keyword: str) -> str:
+    """Rewrite a keyword into a boolean-mode query that is always valid syntax
+
+    Every term keeps its leading + or - (applied to each word in the term)
+    and a trailing *; any other operator character only separates words.
+    Returns '' when no word is long enough for the FULLTEXT index.
+    """
+    terms = []
+    for part in keyword.split():
+        prefix = part[0] if part[0] in '+-' else ''
+        tokens = tokenize(part)
+        if not tokens:
+            continue
+        if part.endswith('*'):
+            tokens[-1] += '*'
+        terms.extend(prefix + token for token in tokens)
+    return ' '.join(terms)
+
+
+def parse_boolean_query(keyword: str) -> Tuple[List[str], List[str], List[str]]:
+    """Split a boolean-mode keyword into (required, optional, excluded) tokens
+
+    A term ending in * keeps the * on its last token (a prefix match).
+    """
+    required, optional, excluded = [], [], []
+    for part in keyword.split():
+        prefix = part[0]
+        tokens = tokenize(part)
+        if tokens and part.endswith('*'):
+            tokens[-1] += '*'
+        if prefix == '+':
+            required.extend(tokens)
+        elif prefix == '-':
+            excluded.extend(tokens)
+        else:
+            optional.extend(tokens)
+    return required, optional, excluded
+
+
+class InvertedIndex:
+    """Thread-safe in-memory inverted index over content title and body.
+
+    Used when the database has no FULLTEXT index (e.g. test environments).
+    Ranking is TF-IDF with title hits weighted by TITLE_WEIGHT. A sorted
+    vocabulary answers prefix* terms with a bisect range scan.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+        self._vocabulary: List[str] = []
+        self._doc_terms: Dict[int, List[str]] = {}
+        self._doc_meta: Dict[int, Dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    def add(self, doc_id: int, title: Optional[str], body: Optional[str],
+            is_public: bool = False, sort_key: Any = None):
+        """Index (or re-index) a document"""
+        weights: Dict[str, float] = defaultdict(float)
+        for token in tokenize(title):
+            weights[token] += TITLE_WEIGHT
+        for token in tokenize(body):
+            weights[token] += 1.0
+
+        with self._lock:
+            self._remove_postings(doc_id)
+            for token, weight in weights.items():
+                if token not in self._postings:
+                    bisect.insort(self._vocabulary, token)
+                self._postings[token][doc_id] = weight
+            self._doc_terms[doc_id] = list(weights)
+            self._doc_meta[doc_id] = {'is_public': bool(is_public), 'sort_key': sort_key}
+
+    def remove(self, doc_id: int):
+        """Remove a document from the index"""
+        with self._lock:
+            self._remove_postings(doc_id)
+            self._doc_meta.pop(doc_id, None)
+
+    def _remove_postings(self, doc_id: int):
+        for token in self._doc_terms.pop(doc_id, []):
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[token]
+                    del self._vocabulary[bisect.bisect_left(self._vocabulary, token)]
+
+    def clear(self):
+        """Drop every document"""
+        with self._lock:
+            self._postings.clear()
+            self._vocabulary.clear()
+            self._doc_terms.clear()
+            self._doc_meta.clear()
+
+    def _term_postings(self, term: str) -> Dict[int, float]:
+        """Postings of a token, or the summed postings of every token with a prefix*"""
+        if not term.endswith('*'):
+            return self._postings.get(term, {})
+        prefix = term[:-1]
+        merged: Dict[int, float] = defaultdict(float)
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        for token in self._vocabulary[start:]:
+            if not token.startswith(prefix):
+                break
+            for doc_id, weight in self._postings[token].items():
+                merged[doc_id] += weight
+        return merged
+
+    def search(self, keyword: str, is_public_only: bool = True,
+               limit: int = 100, boolean_mode: Optional[bool] = None) -> List[int]:
+        """Return matching document IDs, most relevant first"""
+        if boolean_mode is None:
+            boolean_mode = is_boolean_query(keyword)
+        if boolean_mode:
+            required, optional, excluded = parse_boolean_query(keyword)
+        else:
+            required, optional, excluded = [], tokenize(keyword), []
+
+        with self._lock:
+            total = len(self._doc_terms) or 1
+            scores: Dict[int, float] = defaultdict(float)
+            postings_by_term = {term: self._term_postings(term)
+                                for term in required + optional + excluded}
+            for token in required + optional:
+                postings = postings_by_term[token]
+                if not postings:
+                    continue
+                idf = math.log(1 + total / len(postings))
+                for doc_id, weight in postings.items():
+                    scores[doc_id] += weight * idf
+
+            candidates = set(scores)
+            for token in required:
+                candidates &= set(postings_by_term[token])
+            for token in excluded:
+                candidates -= set(postings_by_term[token])
+            if is_public_only:
+                candidates = {d for d in candidates if self._doc_meta[d]['is_public']}
+
+            ranked = sorted(candidates,
+                            key=lambda d: (scores[d], self._doc_meta[d]['sort_key'] or 0, d),
+                            reverse=True)
+        return ranked[:limit]
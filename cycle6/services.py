@@ -4,11 +4,12 @@ Service layer with business logic and permission checks
 """
 
 from typing import Optional, List, Dict, Any
-from database import db
+from database import db, unit_of_work
 from models.user_models import User, Organization, OrganizationMember
 from models.class_models import Class, ClassEnrollment, Assessment
-from models.program_models import ContentLibrary, SpeciesSighting
+from models.program_models import ContentLibrary, SpeciesSighting, Conversation, Message
 from models.analytics_models import AccessLog
+from snapshots import dashboard_snapshots
 
 
 class PermissionError(Exception):
@@ -17,7 +18,11 @@ class PermissionError(Exception):
 
 
 class PermissionService:
-    """Permission management service"""
+    """Permission management service
+
+    Checks look users and memberships up through the models, so inside a
+    unit_of_work() repeated checks for the same user reuse the loaded rows.
+    """
 
     @staticmethod
     def is_admin(user_id: int) -> bool:
@@ -152,37 +157,38 @@ class TeacherService:
     """Teacher service"""
 
     @staticmethod
+    @unit_of_work()
     def get_teacher_dashboard(teacher_id: int) -> Dict[str, Any]:
         """Get teacher dashboard data"""
         if not PermissionService.is_teacher(teacher_id):
             raise PermissionError("User is not a teacher")
 
-        # Get teacher's classes
-        classes = Class.get_teacher_classes(teacher_id)
+        # Get teacher's classes with per-class student counts
+        classes = Class.get_teacher_classes_with_counts(teacher_id)
 
-        # Get pending submissions
+        # Get pending submissions (count and latest 10)
         from models.class_models import Submission
-        pending_submissions = Submission.get_teacher_class_submissions(teacher_id)
-        pending_submissions = [s for s in pending_submissions if s['status'] == 'submitted']
+        pending_count = Submission.count_teacher_class_submissions(
+            teacher_id, Submission.STATUS_SUBMITTED)
+        recent_submissions = Submission.get_teacher_class_submissions(
+            teacher_id, Submission.STATUS_SUBMITTED, limit=10)
 
         # Statistics
-        total_students = 0
-        for cls in classes:
-            students = Class.get_class_students(cls['class_id'])
-            total_students += len(students)
+        total_students = sum(cls['student_count'] for cls in classes)
 
         dashboard = {
             'teacher_id': teacher_id,
             'total_classes': len(classes),
             'total_students': total_students,
-            'pending_submissions': len(pending_submissions),
+            'pending_submissions': pending_count,
             'classes': classes,
-            'recent_submissions': pending_submissions[:10]
+            'recent_submissions': recent_submissions
         }
 
         return dashboard
 
     @staticmethod
+    @unit_of_work()
     def grade_submission(teacher_id: int, submission_id: int,
                          grade: str, feedback: Optional[str] = None) -> int:
         """Teacher grades assignment"""
@@ -220,6 +226,7 @@ class StudentService:
     """Student service"""
 
     @staticmethod
+    @unit_of_work()
     def get_student_dashboard(student_id: int) -> Dict[str, Any]:
         """Get student dashboard data"""
         if not PermissionService.is_student(student_id):
@@ -252,6 +259,7 @@ class StudentService:
         return dashboard
 
     @staticmethod
+    @unit_of_work()
     def submit_assignment(student_id: int, activity_id: int,
                           submission_data: Optional[str] = None,
                           submission_file_path: Optional[str] = None) -> int:
@@ -283,6 +291,7 @@ class PrincipalService:
     """Principal service"""
 
     @staticmethod
+    @unit_of_work()
     def get_school_dashboard(principal_id: int, org_id: int) -> Dict[str, Any]:
         """Get school dashboard data"""
         if not PermissionService.is_principal(principal_id, org_id):
@@ -318,6 +327,7 @@ class PrincipalService:
         return dashboard
 
     @staticmethod
+    @unit_of_work()
     def generate_student_access_code(principal_id: int, org_id: int,
                                      student_id: int) -> str:
         """Generate access code for student"""
@@ -349,8 +359,11 @@ class PublicService:
         return ContentLibrary.get_public_content(content_type, limit)
 
     @staticmethod
-    def get_community_library(community_id: int) -> Dict[str, Any]:
-        """Get community library (public access)"""
+    @unit_of_work()
+    def get_community_library(community_id: int, page: int = 1,
+                              per_page: int = 50,
+                              member_page: Optional[int] = None) -> Dict[str, Any]:
+        """Get community library (public access), one page of content and members"""
         org = Organization.find_by_id(community_id)
         if not org or org['org_type'] != Organization.COMMUNITY:
             raise ValueError("Invalid community organization")
@@ -358,28 +371,46 @@ class PublicService:
         if not org['is_public']:
             raise PermissionError("This community is not public")
 
+        page = max(page, 1)
+        member_page = max(member_page or page, 1)
+        per_page = max(min(per_page, 200), 1)
+
         # Get community content
-        content = ContentLibrary.get_organization_library(community_id, include_private=False)
-
-        # Get community members (public profiles)
-        from models.user_models import UserProfile
-        members = Organization.get_organization_members(community_id)
-
-        public_members = []
-        for member in members:
-            profile = UserProfile.get_by_user_id(member['user_id'])
-            if profile and profile['is_public']:
-                public_members.append({
-                    'user_id': member['user_id'],
-                    'username': member['username'],
-                    'role': member['role'],
-                    'profile': profile
-                })
+        content = ContentLibrary.get_organization_library(
+            community_id, include_private=False,
+            limit=per_page, offset=(page - 1) * per_page)
+        content_total = ContentLibrary.count_organization_library(community_id)
+
+        # Get community members together with their public profiles (one query)
+        members = Organization.get_public_members(
+            community_id, limit=per_page, offset=(member_page - 1) * per_page)
+        member_total = Organization.count_public_members(community_id)
+
+        public_members = [{
+            'user_id': member['user_id'],
+            'username': member['username'],
+            'role': member['role'],
+            'profile': {
+                'profile_id': member['profile_id'],
+                'user_id': member['user_id'],
+                'avatar_path': member['avatar_path'],
+                'color_scheme': member['color_scheme'],
+                'bio': member['bio'],
+                'is_public': member['is_public']
+            }
+        } for member in members]
 
         return {
             'organization': org,
             'content': content,
-            'members': public_members
+            'members': public_members,
+            'pagination': {
+                'per_page': per_page,
+                'content_page': page,
+                'content_total': content_total,
+                'member_page': member_page,
+                'member_total': member_total
+            }
         }
 
     @staticmethod
@@ -395,3 +426,60 @@ class PublicService:
             sightings = SpeciesSighting.get_all_sightings(verified_only=verified_only)
 
         return sightings
+
+
+class MessagingService:
+    """Messaging service: conversation list and thread reads"""
+
+    @staticmethod
+    def send_message(sender_id: int, recipient_id: int, message_text: str) -> int:
+        """Send a message, filing it under the pair's conversation"""
+        if not User.find_by_id(recipient_id):
+            raise ValueError("Recipient does not exist")
+        return Message.send_message(sender_id, recipient_id, message_text)
+
+    @staticmethod
+    def get_conversations(user_id: int, cursor: Optional[str] = None,
+                          limit: int = 20) -> Dict[str, Any]:
+        """Get the user's conversations with last message and unread count"""
+        page = Conversation.get_user_conversations(user_id, cursor, limit)
+        return {
+            'conversations': page['items'],
+            'next_cursor': page['next_cursor'],
+            'unread_total': Message.get_unread_count(user_id)
+        }
+
+    @staticmethod
+    def get_thread(user_id: int, conversation_id: int, cursor: Optional[str] = None,
+                   limit: int = 50, mark_read: bool = True) -> Dict[str, Any]:
+        """Get a page of a conversation (newest page first)
+
+        Opening the latest page marks the user's received messages read.
+        """
+        if not Conversation.is_member(conversation_id, user_id):
+            raise PermissionError("User is not part of this conversation")
+
+        page = Message.get_conversation_page(conversation_id, cursor, limit)
+        if mark_read and cursor is None:
+            Conversation.mark_read(conversation_id, user_id)
+        return {
+            'conversation_id': conversation_id,
+            'messages': page['items'],
+            'next_cursor': page['next_cursor']
+        }
+
+
+class AdminService:
+    """Administrator service"""
+
+    @staticmethod
+    def get_admin_dashboard(admin_id: int) -> Dict[str, Any]:
+        """Get the business analytics dashboard from the latest snapshot
+
+        The result carries 'version', 'generated_at', 'age_seconds' and 'stale'
+        next to the dashboard 'data'; no aggregate queries run on this path.
+        """
+        if not PermissionService.is_admin(admin_id):
+            raise PermissionError("User is not an administrator")
+
+        return dashboard_snapshots.get()
@@ -0,0 +1,131 @@
+"""
+Komodo Hub - Dashboard Snapshot Engine
+Computes the admin dashboard on a schedule and serves reads from the snapshot
+"""
+
+import logging
+import threading
+import time
+from typing import Optional, Dict, Any
+
+from config import db_config
+from models.analytics_models import (AccessLogRollup, BusinessAnalytics, DashboardSnapshot,
+                                     DistinctSketch)
+
+logger = logging.getLogger(__name__)
+
+
+class DashboardSnapshotEngine:
+    """Scheduled, versioned cache of BusinessAnalytics.generate_dashboard_data
+
+    refresh() is the only place the aggregate queries run and the only place
+    metric rows are written. Each refresh is stored in dashboard_snapshots, so
+    every process serves the same version. get() returns the newest snapshot
+    with its age; it never recomputes unless no snapshot exists at all.
+    """
+
+    def __init__(self, interval: float = 300, max_age: Optional[float] = None,
+                 keep: int = 100):
+        self.interval = interval
+        self.max_age = max_age if max_age is not None else interval * 2
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.RLock()
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._loaded_at = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_error: Optional[str] = None
+
+    def refresh(self) -> Dict[str, Any]:
+        """Compute a new snapshot, record its metrics and publish it"""
+        with self._refresh_lock:
+            # The only writer of the rollups; dashboard reads use them as they are
+            AccessLogRollup.refresh()
+            for metric_type in (DistinctSketch.ACTIVE_USERS, DistinctSketch.SIGHTING_REPORTERS):
+                DistinctSketch.refresh_stored(metric_type)
+            data = BusinessAnalytics.generate_dashboard_data(record=True)
+            version = DashboardSnapshot.save_snapshot(data)
+            # generated_at and its age come back from the database's clock
+            stored = DashboardSnapshot.get_snapshot(version)
+            DashboardSnapshot.purge_older_than(self.keep)
+            BusinessAnalytics.downsample()
+            snapshot = {'version': version, 'generated_at': stored['generated_at'],
+                        'age_seconds': stored['age_seconds'], 'data': data}
+            self._publish(snapshot)
+            logger.info(f"Dashboard snapshot {version} generated")
+            return snapshot
+
+    def _publish(self, snapshot: Dict[str, Any]):
+        now = time.monotonic()
+        # Ages are measured by the database when loaded, then advanced on this
+        # process's monotonic clock, so no two wall clocks are ever compared
+        snapshot = dict(snapshot)
+        snapshot['born_at'] = now - snapshot.pop('age_seconds')
+        with self._lock:
+            if self._snapshot is None or snapshot['version'] >= self._snapshot['version']:
+                self._snapshot = snapshot
+            self._loaded_at = now
+
+    def get(self) -> Dict[str, Any]:
+        """Get the current dashboard snapshot
+
+        Returns {'version', 'generated_at', 'age_seconds', 'stale', 'data'}.
+        The in-process copy is re-read from the database once per interval to
+        pick up snapshots produced by another process's scheduler.
+        """
+        with self._lock:
+            snapshot = self._snapshot
+            expired = time.monotonic() - self._loaded_at >= self.interval
+
+        if snapshot is None or expired:
+            stored = DashboardSnapshot.get_latest()
+            if stored:
+                self._publish(stored)
+            elif snapshot is None:
+                # Nothing generated yet: wait for a refresh already in progress
+                # (e.g. the scheduler's first run) rather than starting another
+                with self._refresh_lock:
+                    if self._snapshot is None:
+                        self.refresh()
+            with self._lock:
+                snapshot = self._snapshot
+
+        age = time.monotonic() - snapshot['born_at']
+        return {
+            'version': snapshot['version'],
+            'generated_at': snapshot['generated_at'].isoformat(),
+            'age_seconds': max(age, 0.0),
+            'stale': age > self.max_age,
+            'data': snapshot['data']
+        }
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+                self.last_error = None
+            except Exception as e:
+                # Keep serving the previous snapshot; it will show up as stale
+                self.last_error = str(e)
+                logger.error(f"Dashboard snapshot refresh failed: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Start refreshing in a background thread every interval seconds"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='dashboard-snapshots', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop the background refresh thread"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+# Global dashboard snapshot engine
+dashboard_snapshots = DashboardSnapshotEngine(interval=db_config.dashboard_snapshot_interval)
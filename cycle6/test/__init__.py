@@ -0,0 +1 @@
+# Test package initialization
\ No newline at end of file
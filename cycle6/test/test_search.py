@@ -0,0 +1,39 @@
+"""
+Search helper tests
+"""
+import unittest
+from search import InvertedIndex, parse_boolean_query
+
+
+class TestInvertedIndex(unittest.TestCase):
+    """Test the in-process fallback index"""
+
+    def setUp(self):
+        """Index a few public documents"""
+        self.index = InvertedIndex()
+        self.index.add(1, 'Komodo dragons', 'Dragons of Komodo island', is_public=True)
+        self.index.add(2, 'Dragonfly', 'Wings over the river', is_public=True)
+        self.index.add(3, 'Orangutan', 'Forest canopy', is_public=True)
+
+    def test_parse_keeps_prefix_wildcard(self):
+        """Test a trailing * stays on the term's last token"""
+        self.assertEqual(parse_boolean_query('+komo* -dragonfly drag*'),
+                         (['komo*'], ['drag*'], ['dragonfly']))
+
+    def test_prefix_terms_match(self):
+        """Test prefix* terms match every token they start, like FULLTEXT boolean mode"""
+        self.assertEqual(self.index.search('komo*'), [1])
+        self.assertEqual(sorted(self.index.search('dragon*')), [1, 2])
+        self.assertEqual(self.index.search('drag* -dragonfly'), [1])
+        self.assertEqual(self.index.search('+drag* +wings'), [2])
+        self.assertEqual(self.index.search('dragon'), [])
+
+    def test_removed_tokens_leave_vocabulary(self):
+        """Test prefix matches stop once the documents are removed"""
+        self.index.remove(1)
+        self.index.remove(2)
+        self.assertEqual(self.index.search('drag*'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+"""
+Species sighting geospatial search tests
+"""
+import unittest
+from unittest.mock import patch
+from models.program_models import SpeciesSighting, TooManySightingsError
+
+
+class FakeSightingsDB:
+    """Answers the candidate and full-row sighting queries from a list of points"""
+
+    def __init__(self, points):
+        self.points = points
+        self.candidate_queries = 0
+
+    def execute_query(self, query, params=()):
+        if 'IN (' in query:
+            return [{'sighting_id': sighting_id, 'reporter_name': 'ranger'} for sighting_id in params]
+        self.candidate_queries += 1
+        min_lat, max_lat, min_lng, max_lng = params[:4]
+        rows = [{'sighting_id': sighting_id, 'latitude': lat, 'longitude': lng}
+                for sighting_id, (lat, lng) in self.points.items()
+                if min_lat <= lat <= max_lat and min_lng <= lng <= max_lng]
+        return rows[:params[-1]]
+
+
+class TestRadiusSearch(unittest.TestCase):
+    """Test radius and nearest searches over capped candidate rings"""
+
+    def setUp(self):
+        """Three sightings near Komodo village and a dense cluster ~1.5 km away"""
+        points = {}
+        for i in range(20):
+            points[100 + i] = (-8.5635, 119.4893 + i * 0.00001)
+        points.update({1: (-8.55, 119.4900), 2: (-8.5505, 119.4900), 3: (-8.5510, 119.4900)})
+        self.db = FakeSightingsDB(points)
+        patcher = patch('models.program_models.db', self.db)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cap = patch.object(SpeciesSighting, 'MAX_RADIUS_CANDIDATES', 5)
+        cap.start()
+        self.addCleanup(cap.stop)
+
+    def test_capped_ring_narrowed(self):
+        """Test a ring over the cap is narrowed, never answered from a partial read"""
+        results = SpeciesSighting.get_nearest_sightings(-8.55, 119.49, n=3,
+                                                        initial_radius_km=2.0)
+
+        self.assertEqual([r['sighting_id'] for r in results], [1, 2, 3])
+        self.assertGreater(self.db.candidate_queries, 1)
+        self.assertEqual(results[0]['distance_km'], 0.0)
+
+    def test_within_radius_reports_truncation(self):
+        """Test an unlimited radius search over the cap raises, a limited one narrows"""
+        with self.assertRaises(TooManySightingsError):
+            SpeciesSighting.get_sightings_within_radius(-8.55, 119.49, 2.0)
+
+        results = SpeciesSighting.get_sightings_within_radius(-8.55, 119.49, 2.0, limit=2)
+        self.assertEqual([r['sighting_id'] for r in results], [1, 2])
+
+    def test_invalid_radius_rejected(self):
+        """Test non-positive radii are rejected"""
+        for radius in (0, -1, float('nan')):
+            with self.assertRaises(ValueError):
+                SpeciesSighting.get_sightings_within_radius(-8.55, 119.49, radius)
+
+
+if __name__ == '__main__':
+    unittest.main()
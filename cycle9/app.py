@@ -1,30 +1,87 @@
 # app.py (Frontend code)
-from flask import Flask, render_template, request, redirect, url_for, session, flash
+from flask import Flask, render_template, request, redirect, url_for, session, flash, g
 import pymysql
 import hashlib
 import os
 import json
+import queue
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 from dotenv import load_dotenv
 
-app = Flask(__name__)
-app.secret_key = os.urandom(24)  # For session management
 load_dotenv()
+app = Flask(__name__)
+# Must be the same in every worker and across restarts, or sessions break
+app.secret_key = os.environ.get('SECRET_KEY')
+if not app.secret_key:
+    app.logger.warning("SECRET_KEY is not set; using a random key, sessions will not survive a restart")
+    app.secret_key = os.urandom(24)
 
 
 # Database connection configuration (keep consistent with backend)
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': 'mysql',
+    'database': 'komodo',
+    'charset': 'utf8mb4',
+    'cursorclass': pymysql.cursors.DictCursor,
+    'autocommit': True
+}
+
+
+class ConnectionPool:
+    """Small thread-safe pool of open connections shared by all requests"""
+
+    def __init__(self, max_size: int = 10, timeout: float = 30, ping_after: float = 60):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    def acquire(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise pymysql.err.OperationalError(2013, "Timed out waiting for a database connection")
+        try:
+            conn, last_used = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+        if conn is not None:
+            # Connections idle for a while may have been closed by the server
+            try:
+                if time.monotonic() - last_used > self.ping_after:
+                    conn.ping(reconnect=True)
+                return conn
+            except pymysql.Error:
+                conn.close()
+        try:
+            return pymysql.connect(**DB_CONFIG)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn, broken: bool = False):
+        try:
+            if broken or not conn.open:
+                conn.close()
+            else:
+                self._idle.put((conn, time.monotonic()))
+        except pymysql.Error:
+            pass
+        finally:
+            self._slots.release()
+
+
+pool = ConnectionPool()
+
+
 class Database:
-    def __init__(self):
-        self.conn = pymysql.connect(
-            host='localhost',
-            user='root',
-            password='mysql',
-            database='komodo',
-            charset='utf8mb4',
-            cursorclass=pymysql.cursors.DictCursor,
-            autocommit=True
-        )
+    def __init__(self, conn):
+        self.conn = conn
         self.cursor = self.conn.cursor()
 
     def execute(self, query: str, params=None):
@@ -37,9 +94,35 @@ class Database:
     def commit(self):
         self.conn.commit()
 
+    @contextmanager
+    def transaction(self):
+        """Run the enclosed statements as one transaction (rolled back on error)"""
+        self.conn.begin()
+        try:
+            yield self
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+
     def close(self):
         self.cursor.close()
-        self.conn.close()
+
+
+def get_db() -> Database:
+    """Get the request's database handle, checking a connection out on first use"""
+    if 'db' not in g:
+        g.db = Database(pool.acquire())
+    return g.db
+
+
+@app.teardown_appcontext
+def release_db(exception=None):
+    """Return the request's connection to the pool"""
+    db = g.pop('db', None)
+    if db is not None:
+        db.close()
+        pool.release(db.conn, broken=isinstance(exception, pymysql.err.OperationalError))
 
 
 # Utility functions (keep consistent with backend)
@@ -48,19 +131,17 @@ def hash_password(password: str) -> str:
 
 
 def log_access(user_id: Optional[int], action: str, target_type: Optional[str] = None, target_id: Optional[int] = None):
-    db = Database()
+    db = get_db()
     ip = request.remote_addr
     db.execute("""
                INSERT INTO access_logs (user_id, action, target_type, target_id, ip_address)
                VALUES (%s, %s, %s, %s, %s)
                """, (user_id, action, target_type, target_id, ip))
-    db.close()
 
 
 def require_role(user_id: int, allowed_roles: List[str]) -> bool:
-    db = Database()
+    db = get_db()
     row = db.execute("SELECT user_type FROM users WHERE user_id = %s", (user_id,))
-    db.close()
     if not row or row[0]['user_type'] not in allowed_roles:
         return False
     return True
@@ -77,9 +158,8 @@ def login():
         password = request.form['password']
         hashed = hash_password(password)
 
-        db = Database()
+        db = get_db()
         row = db.execute("SELECT * FROM users WHERE email = %s AND password = %s", (email, hashed))
-        db.close()
 
         if row:
             user = row[0]
@@ -88,9 +168,8 @@ def login():
             session['user_type'] = user['user_type']
 
             # Update last login time
-            db = Database()
+            db = get_db()
             db.execute("UPDATE users SET last_login = NOW() WHERE user_id = %s", (user['user_id'],))
-            db.close()
 
             log_access(user['user_id'], "login")
             flash(f"Login successful! Welcome {user['username']} ({user['user_type']})")
@@ -115,7 +194,7 @@ def register():
         image = request.form['avatar'] or '1'
 
         try:
-            db = Database()
+            db = get_db()
             db.execute("""
                        INSERT INTO users (user_image, username, email, password, user_type)
                        VALUES (%s, %s, %s, %s, %s)
@@ -123,7 +202,6 @@ def register():
 
             user_id = db.cursor.lastrowid
             db.execute("INSERT INTO user_profiles (user_id) VALUES (%s)", (user_id,))
-            db.close()
 
             log_access(None, "register", "user", user_id)
             flash("Registration successful! Please login")
@@ -167,7 +245,7 @@ def create_organization():
         profile = request.form['profile']
         is_public = request.form.get('is_public') == 'on'
 
-        db = Database()
+        db = get_db()
         db.execute("""
                    INSERT INTO organizations (org_type, org_name, org_profile, is_public)
                    VALUES (%s, %s, %s, %s)
@@ -181,7 +259,6 @@ def create_organization():
                    INSERT INTO organization_members (org_id, user_id, role, joined_date)
                    VALUES (%s, %s, %s, CURDATE())
                    """, (org_id, session['user_id'], role))
-        db.close()
 
         log_access(session['user_id'], "create_organization", "organization", org_id)
         flash("Organization created successfully!")
@@ -199,17 +276,15 @@ def join_organization():
         org_id = int(request.form['org_id'])
         code = request.form['code'] or None
 
-        db = Database()
+        db = get_db()
         row = db.execute("SELECT * FROM organizations WHERE org_id = %s", (org_id,))
 
         if not row:
-            db.close()
             flash("Organization does not exist!")
             return render_template('join_organization.html')
 
         org = row[0]
         if not org['is_public'] and code is None:
-            db.close()
             flash("Access code required!")
             return render_template('join_organization.html')
 
@@ -222,12 +297,10 @@ def join_organization():
                        INSERT INTO organization_members (org_id, user_id, role, access_code, joined_date)
                        VALUES (%s, %s, %s, %s, CURDATE())
                        """, (org_id, session['user_id'], role, code))
-            db.close()
             log_access(session['user_id'], "join_organization", "organization", org_id)
             flash("Successfully joined!")
             return redirect(url_for('main_menu'))
         except pymysql.err.IntegrityError:
-            db.close()
             flash("Already joined or invalid code!")
 
     return render_template('join_organization.html')
@@ -243,7 +316,7 @@ def create_class():
         flash("Insufficient permissions!")
         return redirect(url_for('main_menu'))
 
-    db = Database()
+    db = get_db()
     org_rows = db.execute("""
                           SELECT om.org_id, o.org_name
                           FROM organization_members om
@@ -251,7 +324,6 @@ def create_class():
                           WHERE om.user_id = %s
                             AND o.org_type = 'school'
                           """, (session['user_id'],))
-    db.close()
 
     if not org_rows:
         flash("You are not in any school organization!")
@@ -262,14 +334,13 @@ def create_class():
         name = request.form['name']
         syllabus = request.form['syllabus']
 
-        db = Database()
+        db = get_db()
         db.execute("""
                    INSERT INTO classes (org_id, teacher_id, class_name, syllabus)
                    VALUES (%s, %s, %s, %s)
                    """, (org_id, session['user_id'], name, syllabus))
 
         class_id = db.cursor.lastrowid
-        db.close()
         log_access(session['user_id'], "create_class", "class", class_id)
         flash("Course created successfully!")
         return redirect(url_for('main_menu'))
@@ -285,27 +356,24 @@ def enroll_class():
     if request.method == 'POST':
         class_id = int(request.form['class_id'])
 
-        db = Database()
+        db = get_db()
         try:
             db.execute("""
                        INSERT INTO class_enrollments (class_id, student_id, enrollment_date)
                        VALUES (%s, %s, CURDATE())
                        """, (class_id, session['user_id']))
-            db.close()
             log_access(session['user_id'], "enroll_class", "class", class_id)
             flash("Successfully enrolled!")
         except pymysql.err.IntegrityError:
-            db.close()
             flash("Already enrolled in this course!")
 
     # Get available course list
-    db = Database()
+    db = get_db()
     classes = db.execute("""
                          SELECT c.class_id, c.class_name, o.org_name
                          FROM classes c
                                   JOIN organizations o ON c.org_id = o.org_id
                          """)
-    db.close()
 
     return render_template('enroll_class.html', classes=classes)
 
@@ -325,14 +393,13 @@ def create_program():
         desc = request.form['description']
         ptype = request.form['program_type']
 
-        db = Database()
+        db = get_db()
         db.execute("""
                    INSERT INTO programs (program_name, description, program_type)
                    VALUES (%s, %s, %s)
                    """, (name, desc, ptype))
 
         pid = db.cursor.lastrowid
-        db.close()
         log_access(session['user_id'], "create_program", "program", pid)
         flash("Program created successfully!")
         return redirect(url_for('main_menu'))
@@ -347,7 +414,7 @@ def enroll_program():
         return redirect(url_for('login'))
 
     # Get available programs list
-    db = Database()
+    db = get_db()
     programs = db.execute("SELECT program_id, program_name FROM programs")
 
     # Get organizations the user belongs to
@@ -357,19 +424,17 @@ def enroll_program():
                                JOIN organizations o ON om.org_id = o.org_id
                       WHERE om.user_id = %s
                       """, (session['user_id'],))
-    db.close()
 
     if request.method == 'POST':
         pid = int(request.form['program_id'])
         is_org = request.form.get('is_org') == 'on'
         org_id = int(request.form['org_id']) if is_org else None
 
-        db = Database()
+        db = get_db()
         db.execute("""
                    INSERT INTO program_enrollments (program_id, user_id, org_id, enrollment_date)
                    VALUES (%s, %s, %s, CURDATE())
                    """, (pid, session['user_id'] if not is_org else None, org_id))
-        db.close()
 
         log_access(session['user_id'], "enroll_program", "program", pid)
         flash("Successfully enrolled!")
@@ -388,7 +453,7 @@ def create_activity():
         return redirect(url_for('main_menu'))
 
     # Get programs list
-    db = Database()
+    db = get_db()
     programs = db.execute("SELECT program_id, program_name FROM programs")
 
     # Get courses created by user
@@ -397,7 +462,6 @@ def create_activity():
                          FROM classes
                          WHERE teacher_id = %s
                          """, (session['user_id'],))
-    db.close()
 
     if request.method == 'POST':
         pid = int(request.form['program_id'])
@@ -406,14 +470,13 @@ def create_activity():
         atype = request.form['activity_type']
         desc = request.form['description']
 
-        db = Database()
+        db = get_db()
         db.execute("""
                    INSERT INTO activities (program_id, class_id, activity_name, activity_type, description, created_by)
                    VALUES (%s, %s, %s, %s, %s, %s)
                    """, (pid, class_id, name, atype, desc, session['user_id']))
 
         aid = db.cursor.lastrowid
-        db.close()
         log_access(session['user_id'], "create_activity", "activity", aid)
         flash("Activity created successfully!")
         return redirect(url_for('main_menu'))
@@ -432,14 +495,13 @@ def upload_content():
         return redirect(url_for('login'))
 
     # Get organizations the user belongs to
-    db = Database()
+    db = get_db()
     orgs = db.execute("""
                       SELECT org_id, org_name
                       FROM organization_members om
                                JOIN organizations o ON om.org_id = o.org_id
                       WHERE om.user_id = %s
                       """, (session['user_id'],))
-    db.close()
 
     if request.method == 'POST':
         title = request.form['title']
@@ -448,14 +510,13 @@ def upload_content():
         org_id = int(request.form['org_id']) if request.form['org_id'] else None
         is_public = request.form.get('is_public') == 'on'
 
-        db = Database()
+        db = get_db()
         db.execute("""
                    INSERT INTO content_library (title, content_type, content_data, created_by, org_id, is_public)
                    VALUES (%s, %s, %s, %s, %s, %s)
                    """, (title, ctype, data, session['user_id'], org_id, is_public))
 
         cid = db.cursor.lastrowid
-        db.close()
         log_access(session['user_id'], "upload_content", "content", cid)
         flash("Upload successful!")
         return redirect(url_for('main_menu'))
@@ -481,7 +542,7 @@ def report_sighting():
         desc = request.form['description']
         photo = request.form['photo'] or None
 
-        db = Database()
+        db = get_db()
         db.execute("""
                    INSERT INTO species_sightings (species_name, location, date_time, description, photo_path,
                                                   reported_by)
@@ -489,7 +550,6 @@ def report_sighting():
                    """, (species, location, dt, desc, photo, session['user_id']))
 
         sid = db.cursor.lastrowid
-        db.close()
         log_access(session['user_id'], "report_sighting", "sighting", sid)
         flash("Sighting reported successfully!")
         return redirect(url_for('main_menu'))
@@ -504,27 +564,25 @@ def submit_assignment():
         return redirect(url_for('login'))
 
     # Get activities the user can submit
-    db = Database()
+    db = get_db()
     activities = db.execute("""
                             SELECT a.activity_id, a.activity_name, p.program_name
                             FROM activities a
                                      JOIN programs p ON a.program_id = p.program_id
                             """)
-    db.close()
 
     if request.method == 'POST':
         aid = int(request.form['activity_id'])
         data = request.form['submission']
         file_path = request.form['file_path'] or None
 
-        db = Database()
+        db = get_db()
         db.execute("""
                    INSERT INTO submissions (activity_id, student_id, submission_data, submission_file_path)
                    VALUES (%s, %s, %s, %s)
                    """, (aid, session['user_id'], data, file_path))
 
         sid = db.cursor.lastrowid
-        db.close()
         log_access(session['user_id'], "submit_assignment", "submission", sid)
         flash("Submission successful!")
         return redirect(url_for('main_menu'))
@@ -542,7 +600,7 @@ def grade_submission():
         return redirect(url_for('main_menu'))
 
     # Get submissions to be graded
-    db = Database()
+    db = get_db()
     submissions = db.execute("""
                              SELECT s.submission_id,
                                     s.activity_id,
@@ -555,21 +613,19 @@ def grade_submission():
                                       JOIN users u ON s.student_id = u.user_id
                              WHERE s.status != 'graded' AND a.created_by = %s
                              """, (session['user_id'],))
-    db.close()
 
     if request.method == 'POST':
         sub_id = int(request.form['submission_id'])
         grade = request.form['grade']
         feedback = request.form['feedback']
 
-        db = Database()
+        db = get_db()
         db.execute("""
                    INSERT INTO assessments (submission_id, teacher_id, grade, feedback)
                    VALUES (%s, %s, %s, %s)
                    """, (sub_id, session['user_id'], grade, feedback))
 
         db.execute("UPDATE submissions SET status = 'graded' WHERE submission_id = %s", (sub_id,))
-        db.close()
         log_access(session['user_id'], "grade_submission", "submission", sub_id)
         flash("Grading completed!")
         return redirect(url_for('main_menu'))
@@ -584,20 +640,45 @@ def send_message():
         return redirect(url_for('login'))
 
     # Get user list (for choosing recipient)
-    db = Database()
+    db = get_db()
     users = db.execute("SELECT user_id, username, email FROM users WHERE user_id != %s", (session['user_id'],))
-    db.close()
 
     if request.method == 'POST':
         recipient_id = int(request.form['recipient_id'])
         text = request.form['message']
 
-        db = Database()
-        db.execute("""
-                   INSERT INTO messages (sender_id, recipient_id, message_text)
-                   VALUES (%s, %s, %s)
-                   """, (session['user_id'], recipient_id, text))
-        db.close()
+        db = get_db()
+        sender_id = session['user_id']
+        # Messages are filed under the pair's conversation and the thread and unread
+        # counters are maintained with every message (as in the backend)
+        with db.transaction():
+            db.execute("""
+                       INSERT INTO conversations (user_low, user_high)
+                       VALUES (%s, %s)
+                       ON DUPLICATE KEY UPDATE conversation_id = LAST_INSERT_ID(conversation_id)
+                       """, (min(sender_id, recipient_id), max(sender_id, recipient_id)))
+            conversation_id = db.cursor.lastrowid
+            db.execute("""
+                       INSERT INTO messages (sender_id, recipient_id, message_text, conversation_id)
+                       VALUES (%s, %s, %s, %s)
+                       """, (sender_id, recipient_id, text, conversation_id))
+            message_id = db.cursor.lastrowid
+            db.execute("""
+                       UPDATE conversations
+                       SET last_message_id = %s, last_message_at = NOW()
+                       WHERE conversation_id = %s
+                       """, (message_id, conversation_id))
+            db.execute("""
+                       INSERT INTO conversation_members (conversation_id, user_id, unread_count, last_message_at)
+                       VALUES (%s, %s, 0, NOW()), (%s, %s, 1, NOW())
+                       ON DUPLICATE KEY UPDATE unread_count = unread_count + VALUES(unread_count),
+                                               last_message_at = VALUES(last_message_at)
+                       """, (conversation_id, sender_id, conversation_id, recipient_id))
+            db.execute("""
+                       INSERT INTO user_message_counters (user_id, unread_count)
+                       VALUES (%s, 1)
+                       ON DUPLICATE KEY UPDATE unread_count = unread_count + 1
+                       """, (recipient_id,))
 
         log_access(session['user_id'], "send_message", "message")
         flash("Message sent successfully!")
@@ -613,21 +694,19 @@ def save_canvas():
         return redirect(url_for('login'))
 
     # Get program list
-    db = Database()
+    db = get_db()
     programs = db.execute("SELECT program_id, program_name FROM programs")
-    db.close()
 
     if request.method == 'POST':
         pid = int(request.form['program_id'])
         assets = request.form['assets']
 
-        db = Database()
+        db = get_db()
         db.execute("""
                    INSERT INTO creative_canvas (user_id, program_id, assets)
                    VALUES (%s, %s, %s) ON DUPLICATE KEY
                    UPDATE assets = %s, updated_at = NOW()
                    """, (session['user_id'], pid, assets, assets))
-        db.close()
 
         flash("Canvas saved successfully!")
         return redirect(url_for('main_menu'))
@@ -650,12 +729,11 @@ def record_analytics():
         value = float(request.form['value'])
         data = request.form['data'] or None
 
-        db = Database()
+        db = get_db()
         db.execute("""
                    INSERT INTO business_analytics (metric_type, metric_value, metric_data)
                    VALUES (%s, %s, %s)
                    """, (mtype, value, data))
-        db.close()
 
         flash("Recorded successfully!")
         return redirect(url_for('main_menu'))
@@ -686,7 +764,7 @@ def user_center():
         os.makedirs(avatar_dir)
 
     # 3. Get user's basic information (join users and user_profiles tables)
-    db = Database()
+    db = get_db()
     user_info = db.execute("""
                            SELECT u.user_id,
                                   u.username,
@@ -720,7 +798,6 @@ def user_center():
                                    WHERE m.recipient_id = %s
                                    ORDER BY m.sent_at DESC
                                    """, (session['user_id'],))
-    db.close()
 
     # 6. Pass data to frontend page
     return render_template('user_center.html',
@@ -8,6 +8,7 @@ from datetime import datetime, date
 import json
 
 from config import Config
+from utils.partitions import initial_partitions_sql
 
 def get_connection():
     """获取数据库连接"""
@@ -96,7 +97,8 @@ def create_tables():
                     FOREIGN KEY (org_id) REFERENCES organizations(org_id) ON DELETE CASCADE,
                     FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
                     UNIQUE KEY unique_org_user (org_id, user_id),
-                    INDEX idx_role (role)
+                    INDEX idx_role (role),
+                    INDEX idx_org_membership (org_id, membership_id)
                 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
             """)
             print("✓ 创建 organization_members 表")
@@ -203,12 +205,15 @@ def create_tables():
                     FOREIGN KEY (org_id) REFERENCES organizations(org_id) ON DELETE CASCADE,
                     INDEX idx_content_type (content_type),
                     INDEX idx_org (org_id),
-                    INDEX idx_public (is_public)
+                    INDEX idx_public (is_public),
+                    INDEX idx_public_created (is_public, created_at),
+                    FULLTEXT INDEX ft_title_content (title, content_data)
                 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
             """)
             print("✓ 创建 content_library 表")
             
             # 10. Species_Sightings 表
+            # 坐标可选；SPATIAL 索引要求 NOT NULL 列，故以 geohash 前缀索引做范围/邻近查询
             cursor.execute("""
                 CREATE TABLE species_sightings (
                     sighting_id INT PRIMARY KEY AUTO_INCREMENT,
@@ -219,11 +224,17 @@ def create_tables():
                     photo_path VARCHAR(500),
                     reported_by INT NOT NULL,
                     verified BOOLEAN DEFAULT FALSE,
+                    latitude DECIMAL(9,6) NULL,
+                    longitude DECIMAL(9,6) NULL,
+                    geohash CHAR(9) CHARACTER SET ascii NULL,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     FOREIGN KEY (reported_by) REFERENCES users(user_id) ON DELETE CASCADE,
                     INDEX idx_species (species_name),
                     INDEX idx_reporter (reported_by),
-                    INDEX idx_verified (verified)
+                    INDEX idx_verified (verified),
+                    INDEX idx_date_time (date_time),
+                    INDEX idx_verified_date (verified, date_time),
+                    INDEX idx_geohash (geohash)
                 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
             """)
             print("✓ 创建 species_sightings 表")
@@ -265,22 +276,67 @@ def create_tables():
             print("✓ 创建 assessments 表")
             
             # 13. Messages 表
+            # 会话：每对用户一行（user_low < user_high）
+            cursor.execute("""
+                CREATE TABLE conversations (
+                    conversation_id INT PRIMARY KEY AUTO_INCREMENT,
+                    user_low INT NOT NULL,
+                    user_high INT NOT NULL,
+                    last_message_id INT NULL,
+                    last_message_at TIMESTAMP NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (user_low) REFERENCES users(user_id) ON DELETE CASCADE,
+                    FOREIGN KEY (user_high) REFERENCES users(user_id) ON DELETE CASCADE,
+                    UNIQUE KEY unique_pair (user_low, user_high)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+            """)
+            print("✓ 创建 conversations 表")
+
             cursor.execute("""
                 CREATE TABLE messages (
                     message_id INT PRIMARY KEY AUTO_INCREMENT,
+                    conversation_id INT NULL,
                     sender_id INT NOT NULL,
                     recipient_id INT NOT NULL,
                     message_text TEXT NOT NULL,
                     sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     read_at TIMESTAMP NULL,
+                    FOREIGN KEY (conversation_id) REFERENCES conversations(conversation_id) ON DELETE CASCADE,
                     FOREIGN KEY (sender_id) REFERENCES users(user_id) ON DELETE CASCADE,
                     FOREIGN KEY (recipient_id) REFERENCES users(user_id) ON DELETE CASCADE,
                     INDEX idx_sender (sender_id),
                     INDEX idx_recipient (recipient_id),
-                    INDEX idx_read (read_at)
+                    INDEX idx_recipient_sent (recipient_id, sent_at),
+                    INDEX idx_recipient_read (recipient_id, read_at),
+                    INDEX idx_conversation (conversation_id, message_id)
                 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
             """)
             print("✓ 创建 messages 表")
+
+            # 会话成员：每个参与者的未读数与最后消息时间（会话列表按此排序）
+            cursor.execute("""
+                CREATE TABLE conversation_members (
+                    conversation_id INT NOT NULL,
+                    user_id INT NOT NULL,
+                    unread_count INT NOT NULL DEFAULT 0,
+                    last_message_at TIMESTAMP NULL,
+                    PRIMARY KEY (conversation_id, user_id),
+                    FOREIGN KEY (conversation_id) REFERENCES conversations(conversation_id) ON DELETE CASCADE,
+                    FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
+                    INDEX idx_user_recent (user_id, last_message_at)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+            """)
+            print("✓ 创建 conversation_members 表")
+
+            # 每个用户的未读消息计数（随发送/已读同步维护）
+            cursor.execute("""
+                CREATE TABLE user_message_counters (
+                    user_id INT PRIMARY KEY,
+                    unread_count INT NOT NULL DEFAULT 0,
+                    FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+            """)
+            print("✓ 创建 user_message_counters 表")
             
             # 14. Notes 表
             cursor.execute("""
@@ -331,21 +387,23 @@ def create_tables():
             """)
             print("✓ 创建 creative_canvas 表")
             
-            # 17. Access_Logs 表
-            cursor.execute("""
+            # 17. Access_Logs 表（按月 RANGE 分区，由 manage_partitions.py 维护）
+            # 分区表不支持外键，且分区列必须包含在主键中
+            cursor.execute(f"""
                 CREATE TABLE access_logs (
-                    log_id BIGINT PRIMARY KEY AUTO_INCREMENT,
+                    log_id BIGINT NOT NULL AUTO_INCREMENT,
                     user_id INT,
                     action VARCHAR(200) NOT NULL,
                     target_type VARCHAR(50),
                     target_id INT,
-                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
                     ip_address VARCHAR(45),
-                    FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE SET NULL,
+                    PRIMARY KEY (log_id, timestamp),
                     INDEX idx_user (user_id),
                     INDEX idx_timestamp (timestamp),
                     INDEX idx_action (action)
                 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+                {initial_partitions_sql(date.today(), Config.ACCESS_LOG_PARTITIONS_AHEAD)}
             """)
             print("✓ 创建 access_logs 表")
             
@@ -358,11 +416,72 @@ def create_tables():
                     metric_data JSON,
                     recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     INDEX idx_metric_type (metric_type),
-                    INDEX idx_recorded_at (recorded_at)
+                    INDEX idx_recorded_at (recorded_at),
+                    INDEX idx_metric_recorded (metric_type, recorded_at)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+            """)
+            cursor.execute("""
+                CREATE TABLE metric_buckets (
+                    metric_type VARCHAR(100) NOT NULL,
+                    resolution ENUM('hour', 'day') NOT NULL,
+                    bucket_start DATETIME NOT NULL,
+                    sample_count INT NOT NULL,
+                    min_value DECIMAL(15,2),
+                    max_value DECIMAL(15,2),
+                    sum_value DECIMAL(20,2),
+                    PRIMARY KEY (metric_type, resolution, bucket_start)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+            """)
+            cursor.execute("""
+                CREATE TABLE metric_latest (
+                    metric_type VARCHAR(100) PRIMARY KEY,
+                    analytics_id INT NOT NULL,
+                    metric_value DECIMAL(15,2),
+                    metric_data JSON,
+                    recorded_at TIMESTAMP NOT NULL
                 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
             """)
             print("✓ 创建 business_analytics 表")
             
+            # 19. Dashboard_Snapshots 表
+            cursor.execute("""
+                CREATE TABLE dashboard_snapshots (
+                    snapshot_id INT PRIMARY KEY AUTO_INCREMENT,
+                    snapshot_data JSON NOT NULL,
+                    generated_at TIMESTAMP(3) DEFAULT CURRENT_TIMESTAMP(3)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+            """)
+            print("✓ 创建 dashboard_snapshots 表")
+            
+            # 20. Access log rollup 表
+            cursor.execute("""
+                CREATE TABLE access_log_daily_counts (
+                    day DATE NOT NULL,
+                    action VARCHAR(200) NOT NULL,
+                    user_type VARCHAR(50) NOT NULL,
+                    event_count INT NOT NULL DEFAULT 0,
+                    PRIMARY KEY (day, action, user_type)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+            """)
+            cursor.execute("""
+                CREATE TABLE access_log_daily_users (
+                    day DATE NOT NULL,
+                    action VARCHAR(200) NOT NULL,
+                    user_id INT NOT NULL,
+                    user_type VARCHAR(50),
+                    PRIMARY KEY (day, action, user_id),
+                    INDEX idx_day_user (day, user_id)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+            """)
+            cursor.execute("""
+                CREATE TABLE rollup_watermarks (
+                    rollup_name VARCHAR(100) PRIMARY KEY,
+                    last_log_id BIGINT NOT NULL DEFAULT 0,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+            """)
+            print("✓ 创建 access log rollup 表")
+            
         connection.commit()
         print("\n✓ 所有表创建成功！")
     finally:
@@ -636,21 +755,22 @@ def insert_initial_data():
                 ('Javan Rhinoceros', 'Ujung Kulon National Park, Sector A',
                  datetime(2024, 3, 15, 8, 30), 
                  'Observed adult rhino near water source, appeared healthy',
-                 '/photos/rhino_sighting_001.jpg', 6, True),
+                 '/photos/rhino_sighting_001.jpg', 6, True, -6.750800, 105.333900, 'qqfcsgjc9'),
                 ('Bali Myna', 'Bali Barat National Park',
                  datetime(2024, 3, 10, 14, 15),
                  'Pair of Bali Mynas spotted in nesting area',
-                 '/photos/myna_sighting_001.jpg', 12, True),
+                 '/photos/myna_sighting_001.jpg', 12, True, -8.155200, 114.499500, 'qw93t7rux'),
                 ('Sumatran Tiger', 'Leuser Ecosystem',
                  datetime(2024, 2, 28, 6, 45),
                  'Tiger tracks and signs observed during patrol',
-                 None, 13, False),
+                 None, 13, False, 3.750000, 97.166700, 'w0tj74dtk'),
             ]
             
             cursor.executemany("""
                 INSERT INTO species_sightings (species_name, location, date_time, 
-                                              description, photo_path, reported_by, verified)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                                              description, photo_path, reported_by, verified,
+                                              latitude, longitude, geohash)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
             """, species_sightings_data)
             print(f"✓ 插入 {len(species_sightings_data)} 个物种目击记录")
             
@@ -693,6 +813,41 @@ def insert_initial_data():
                 INSERT INTO messages (sender_id, recipient_id, message_text)
                 VALUES (%s, %s, %s)
             """, messages_data)
+            # 按用户对归入会话
+            cursor.execute("""
+                INSERT INTO conversations (user_low, user_high)
+                SELECT DISTINCT LEAST(sender_id, recipient_id), GREATEST(sender_id, recipient_id)
+                FROM messages
+            """)
+            cursor.execute("""
+                UPDATE messages m
+                JOIN conversations c ON c.user_low = LEAST(m.sender_id, m.recipient_id)
+                                    AND c.user_high = GREATEST(m.sender_id, m.recipient_id)
+                SET m.conversation_id = c.conversation_id
+            """)
+            cursor.execute("""
+                UPDATE conversations c
+                JOIN (SELECT conversation_id, MAX(message_id) AS last_id
+                      FROM messages GROUP BY conversation_id) t ON t.conversation_id = c.conversation_id
+                JOIN messages m ON m.message_id = t.last_id
+                SET c.last_message_id = m.message_id, c.last_message_at = m.sent_at
+            """)
+            cursor.execute("""
+                INSERT INTO conversation_members (conversation_id, user_id, unread_count, last_message_at)
+                SELECT c.conversation_id, u.user_id,
+                       (SELECT COUNT(*) FROM messages m
+                        WHERE m.conversation_id = c.conversation_id
+                          AND m.recipient_id = u.user_id AND m.read_at IS NULL),
+                       c.last_message_at
+                FROM conversations c
+                JOIN users u ON u.user_id IN (c.user_low, c.user_high)
+            """)
+            cursor.execute("""
+                INSERT INTO user_message_counters (user_id, unread_count)
+                SELECT recipient_id, COUNT(*) FROM messages
+                WHERE read_at IS NULL
+                GROUP BY recipient_id
+            """)
             print(f"✓ 插入 {len(messages_data)} 条消息")
             
             # 15. 插入笔记
@@ -740,6 +895,25 @@ def insert_initial_data():
             """, analytics_data)
             print(f"✓ 插入 {len(analytics_data)} 条业务分析数据")
             
+            # 初始化指标汇总表（最新值与按小时/按天的分桶）
+            for resolution, fmt in (('hour', '%Y-%m-%d %H:00:00'), ('day', '%Y-%m-%d 00:00:00')):
+                cursor.execute(f"""
+                    INSERT INTO metric_buckets (metric_type, resolution, bucket_start, sample_count,
+                                                min_value, max_value, sum_value)
+                    SELECT metric_type, '{resolution}', DATE_FORMAT(recorded_at, '{fmt}'), COUNT(*),
+                           MIN(metric_value), MAX(metric_value), SUM(metric_value)
+                    FROM business_analytics
+                    GROUP BY metric_type, DATE_FORMAT(recorded_at, '{fmt}')
+                """)
+            cursor.execute("""
+                INSERT INTO metric_latest (metric_type, analytics_id, metric_value, metric_data, recorded_at)
+                SELECT ba.metric_type, ba.analytics_id, ba.metric_value, ba.metric_data, ba.recorded_at
+                FROM business_analytics ba
+                JOIN (SELECT metric_type, MAX(analytics_id) AS analytics_id
+                      FROM business_analytics GROUP BY metric_type) newest
+                  ON newest.analytics_id = ba.analytics_id
+            """)
+            
         connection.commit()
         print("\n✓ 所有初始数据插入成功！")
         